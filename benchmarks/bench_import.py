@@ -0,0 +1,108 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Import cost of the game modules, each measured in a fresh interpreter so
+# nothing is already cached in sys.modules. Also checks that importing the
+# game leaves the display, mixer and font subsystems untouched, and that it
+# neither writes files nor prints, even when the definitions cache is stale.
+#
+#   python benchmarks/bench_import.py [--runs N] [--budget MS]
+#
+# Exits non-zero if battle_engine takes longer than the budget to import.
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+MODULES = ["battle_engine", "cpu_ai", "matchup_sim", "exact_solver", "monsoon_rumble"]
+
+TIME_IMPORT = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+CHECK_SIDE_EFFECTS = """
+import pygame, monsoon_rumble
+print(pygame.display.get_init(), bool(pygame.mixer.get_init()), pygame.font.get_init())
+"""
+
+# Counts the files opened for writing or replaced during the import, and what
+# it printed. marshal.load fails so every cache read looks stale.
+CHECK_IMPORT_WRITES = """
+import builtins, contextlib, io, marshal, os
+writes = []
+real_open, real_replace, real_makedirs = builtins.open, os.replace, os.makedirs
+
+def open(file, mode="r", *args, **kwargs):
+    if any(c in mode for c in "wax+"):
+        writes.append(file)
+    return real_open(file, mode, *args, **kwargs)
+
+def replace(src, dst, *args, **kwargs):
+    writes.append(dst)
+    return real_replace(src, dst, *args, **kwargs)
+
+def makedirs(name, *args, **kwargs):
+    writes.append(name)
+    return real_makedirs(name, *args, **kwargs)
+
+def stale(f):
+    raise ValueError("stale cache")
+
+builtins.open, os.replace, os.makedirs, marshal.load = open, replace, makedirs, stale
+output = io.StringIO()
+with contextlib.redirect_stdout(output):
+    import monsoon_rumble
+print(len(writes), len(output.getvalue()))
+"""
+
+
+def run(code):
+    env = dict(os.environ, PYTHONPATH=SRC, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    # Measure with cached bytecode, as an installed game would run
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def import_times(module, runs):
+    # The first run compiles and caches the bytecode
+    run(TIME_IMPORT.format(module=module))
+    return [float(run(TIME_IMPORT.format(module=module))) * 1000 for _ in range(runs)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of the game modules.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=25.0, help="max median import time of battle_engine in ms")
+    args = parser.parse_args()
+
+    medians = {}
+    print(f"{'module':<16}{'median ms':>11}{'min ms':>9}{'max ms':>9}")
+    for module in MODULES:
+        times = import_times(module, args.runs)
+        medians[module] = statistics.median(times)
+        print(f"{module:<16}{medians[module]:>11.2f}{min(times):>9.2f}{max(times):>9.2f}")
+
+    display, mixer, font = run(CHECK_SIDE_EFFECTS).split()
+    print(f"after import monsoon_rumble: display={display} mixer={mixer} font={font}")
+    writes, printed = map(int, run(CHECK_IMPORT_WRITES).split())
+    print(f"with a stale cache: {writes} files written, {printed} characters printed")
+
+    failed = False
+    if "True" in (display, mixer, font):
+        print("FAIL: importing monsoon_rumble initialized a pygame subsystem")
+        failed = True
+    if writes or printed:
+        print("FAIL: importing monsoon_rumble wrote files or printed")
+        failed = True
+    if medians["battle_engine"] > args.budget:
+        print(f"FAIL: battle_engine imports in {medians['battle_engine']:.2f} ms, budget {args.budget:.2f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import argparse
+import asyncio
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+# Load generator for src/battle_server.py. Runs --concurrency simulated
+# players spread over --connections sockets. Each player starts sessions one
+# after another and submits a random move that still has PP each round,
+# until --sessions battles have been played. It reports finished sessions per
+# second and the latency of every move (submit to TURN), with percentiles.
+#
+#   python benchmarks/bench_server.py --spawn --sessions 5000 --concurrency 1000
+#   python benchmarks/bench_server.py --port 7878 --ai normal --think 0.5
+#   python benchmarks/bench_server.py --spawn --pvp
+#
+# --spawn starts a server on a free port for the run. In --pvp mode players
+# are matched with each other, so a move's latency includes waiting for the
+# other side's move. Each PvP player has its own connection, like a real
+# client: the server never matches a connection with itself, so players
+# sharing one could be left waiting for each other at the end of a run.
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from battle_engine import ROSTER, FLAGS, OVER  # noqa: E402
+from battle_server import (BattleClient, ServerError, AI_POLICIES, DEFAULT_HOST, DEFAULT_PORT, MATCH,  # noqa: E402
+                           RANDOM)
+
+CONNECT_TIMEOUT = 10.0
+
+
+class Load:
+    def __init__(self, sessions):
+        self.remaining = sessions
+        self.finished = 0
+        self.turns = 0
+        self.latencies = []
+        self.errors = 0
+        self.open = 0
+        self.peak_open = 0
+
+    def take(self):
+        # Claims the next session to play, False when they're all claimed
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+
+def choose_move(state, side, species, rng):
+    moves = len(ROSTER[species][3])
+    usable = [slot for slot in range(moves) if state.pp(side, slot) > 0]
+    return rng.choice(usable) if usable else 0
+
+
+async def play_session(client, load, rng, ai, pvp, think):
+    species = rng.randrange(len(ROSTER))
+    session_id, side, player, opponent, state = await client.new_session(species, MATCH if pvp else RANDOM, ai)
+    load.open += 1
+    load.peak_open = max(load.peak_open, load.open)
+    try:
+        while not state[FLAGS] & OVER:
+            if think:
+                await asyncio.sleep(rng.uniform(0, think))
+            move = choose_move(state, side, species, rng)
+            start = time.perf_counter()
+            _, _, state = await client.move(session_id, move)
+            load.latencies.append(time.perf_counter() - start)
+            load.turns += 1
+    finally:
+        load.open -= 1
+    return side
+
+
+async def player(client, load, seed, ai, pvp, think):
+    rng = random.Random(seed)
+    while load.take():
+        try:
+            side = await play_session(client, load, rng, ai, pvp, think)
+        except ServerError:
+            load.errors += 1
+            continue
+        # A PvP session is played by two players, count it once
+        if not pvp or side == 0:
+            load.finished += 1
+
+
+async def run_load(args, host, port):
+    clients = []
+    deadline = time.monotonic() + CONNECT_TIMEOUT
+    while len(clients) < args.connections:
+        try:
+            clients.append(await BattleClient.connect(host, port, args.unix))
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+    # A PvP session has two players, so there are twice as many to claim
+    load = Load(args.sessions * 2 if args.pvp else args.sessions)
+    start = time.perf_counter()
+    await asyncio.gather(*(player(clients[i % len(clients)], load, args.seed * 100_003 + i, args.ai, args.pvp,
+                                  args.think) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+    return load, elapsed
+
+
+def percentile(values, p):
+    # Nearest rank on an already sorted list
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def print_report(load, elapsed):
+    latencies = sorted(load.latencies)
+    print(f"{load.finished:,} sessions, {load.turns:,} moves in {elapsed:.2f} s "
+          f"(peak {load.peak_open:,} open, {load.errors} errors)")
+    print(f"{load.finished / elapsed:,.1f} sessions/s, {load.turns / elapsed:,.0f} moves/s")
+    print("move latency " + "  ".join(f"p{p} {percentile(latencies, p) * 1000:.2f} ms" for p in (50, 95, 99))
+          + f"  max {latencies[-1] * 1000 if latencies else 0:.2f} ms")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind((DEFAULT_HOST, 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the battle server.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="connect to a Unix socket instead of TCP")
+    parser.add_argument("--spawn", action="store_true", help="start a server for the run")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="CPU search workers of a spawned server")
+    parser.add_argument("-n", "--sessions", type=int, default=2000, help="battles to play")
+    parser.add_argument("-c", "--concurrency", type=int, default=500, help="players at once")
+    parser.add_argument("--connections", type=int, default=8, help="sockets the CPU players share")
+    parser.add_argument("--ai", choices=AI_POLICIES, default="greedy", help="CPU opponent")
+    parser.add_argument("--pvp", action="store_true", help="match players with each other instead of the CPU")
+    parser.add_argument("--think", type=float, default=0.0, metavar="SECONDS", help="longest pause before a move")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.pvp:
+        args.connections = args.concurrency
+
+    server = None
+    if args.spawn:
+        command = [sys.executable, os.path.join(ROOT, "src", "battle_server.py"), "--workers", str(args.workers)]
+        if args.unix:
+            command += ["--unix", args.unix]
+        else:
+            args.port = free_port()
+            command += ["--host", args.host, "--port", str(args.port)]
+        server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL)
+    try:
+        load, elapsed = asyncio.run(run_load(args, args.host, args.port))
+    except OSError as e:
+        raise SystemExit(f"Server connection failed: {e}")
+    finally:
+        if server is not None:
+            # SIGINT lets the server remove its socket and save its replays
+            server.send_signal(signal.SIGINT)
+            server.wait()
+    mode = "PvP" if args.pvp else f"{args.ai} CPU"
+    print(f"{mode}, {args.concurrency} players on {args.connections} connections")
+    print_report(load, elapsed)
+
+
+if __name__ == "__main__":
+    main()
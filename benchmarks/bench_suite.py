@@ -0,0 +1,292 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+
+# Benchmarks for the engine, AI, rendering and asset loading hot paths. Runs
+# headless on SDL's dummy video and audio drivers. Every case reports seconds
+# per operation (best and median of several repeats); lower is better.
+#
+#   python benchmarks/bench_suite.py run --save benchmarks/baselines/main.json
+#   python benchmarks/bench_suite.py run --compare benchmarks/baselines/main.json
+#   python benchmarks/bench_suite.py compare OLD.json NEW.json --threshold 0.1
+#
+# compare (and run --compare) exits non-zero when a case's best time got
+# slower than the baseline by more than the threshold.
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+DEFAULT_THRESHOLD = 0.10
+REPEAT = 5
+CASES = {}
+
+
+def case(name, number, repeat=REPEAT):
+    # Registers a setup function that returns the callable to time
+    def register(setup):
+        CASES[name] = (setup, number, repeat)
+        return setup
+    return register
+
+
+def fighters():
+    from battle_engine import make_roster
+    roster = make_roster()
+    return roster, [(a, b) for a in roster for b in roster]
+
+
+@case("calculate_damage", 200_000)
+def bench_calculate_damage():
+    from battle_engine import calculate_damage
+    _, pairs = fighters()
+    args = itertools.cycle([(a, move, b) for a, b in pairs for move in a.moves])
+    return lambda: calculate_damage(*next(args))
+
+
+@case("choose_best_move", 100_000)
+def bench_choose_best_move():
+    from battle_engine import choose_best_move
+    _, pairs = fighters()
+    args = itertools.cycle(pairs)
+    return lambda: choose_best_move(*next(args))
+
+
+@case("monsoons_attack", 50_000)
+def bench_monsoons_attack():
+    # One attack with the target's hp and the move's PP topped up first
+    from battle_engine import ROSTER
+    from monsoon_rumble import Monsoons
+    attacker, target = Monsoons(*ROSTER[0]), Monsoons(*ROSTER[5])
+    move = attacker.moves[0]
+    rng = random.Random(0)
+
+    def attack():
+        target.hp = target.max_hp
+        move.pp = move.max_pp
+        attacker.attack(0, target, rng)
+    return attack
+
+
+@case("headless_battle", 2_000)
+def bench_headless_battle():
+    from battle_engine import simulate
+    _, pairs = fighters()
+    pairs = itertools.cycle(pairs)
+    rng = random.Random(0)
+    return lambda: simulate(*next(pairs), rng)
+
+
+@case("cpu_ai_normal_move", 200)
+def bench_cpu_ai():
+    # Fixed depth, so the time measures the search and not the budget
+    import math
+    from battle_engine import make_fighter
+    from cpu_ai import CpuPlayer
+    cpu, player = make_fighter("Pseye"), make_fighter("Thyladon")
+    ai = CpuPlayer("normal", time_budget=math.inf)
+
+    def choose():
+        ai.generation += 1
+        ai.choose_move(cpu, player)
+    return choose
+
+
+def battle_screen():
+    import pygame
+    from battle_engine import ROSTER
+    from monsoon_rumble import Monsoons, battle_move_buttons, SCREEN_WIDTH, SCREEN_HEIGHT
+    pygame.display.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    player, opponent = Monsoons(*ROSTER[0]), Monsoons(*ROSTER[3])
+    log = ["Battle Start!", "Voltail used Shock! It dealt 61 damage."]
+    return screen, player, opponent, log, battle_move_buttons(player)
+
+
+@case("draw_battle_ui", 500)
+def bench_draw_battle_ui():
+    from monsoon_rumble import draw_battle_ui
+    screen, player, opponent, log, buttons = battle_screen()
+    return lambda: draw_battle_ui(screen, player, opponent, log, buttons)
+
+
+@case("battle_renderer_hp_tick", 500)
+def bench_battle_renderer():
+    # Dirty-rect frame where only one health bar moves
+    from monsoon_rumble import BattleRenderer
+    screen, player, opponent, log, buttons = battle_screen()
+    renderer = BattleRenderer(screen)
+    hp = itertools.cycle(range(1, opponent.max_hp))
+
+    def frame():
+        opponent.display_hp = next(hp)
+        renderer.draw(player, opponent, log, buttons, update=False)
+    return frame
+
+
+@case("particle_effect_frame", 300)
+def bench_particle_frame():
+    # Update and draw of three Fire bursts as they play out, restarted when done
+    from battle_engine import Battle, PLAYER
+    from monsoon_rumble import BattleRenderer, get_particles, emit_move_effect
+    screen, player, opponent, log, buttons = battle_screen()
+    renderer = BattleRenderer(screen)
+    battle = Battle(player, opponent, random.Random(0))
+    particles = get_particles()
+    particles.seed(0)
+
+    def frame():
+        if not particles.active:
+            for _ in range(3):
+                emit_move_effect(battle, PLAYER, [("move", player.name, "Ember")])
+        particles.update(1 / 60)
+        renderer.draw(player, opponent, log, buttons, update=False, effects=particles)
+    return frame
+
+
+@case("sprite_atlas_warm_load", 200)
+def bench_atlas_warm():
+    from sprite_atlas import load_atlas
+    load_atlas()
+    return load_atlas
+
+
+@case("sprite_atlas_cold_build", 3)
+def bench_atlas_cold():
+    from sprite_atlas import build_atlas, source_files, SPRITE_FOLDER
+    sources = source_files(SPRITE_FOLDER)
+    path = os.path.join(tempfile.mkdtemp(), "atlas.bin")
+    return lambda: build_atlas(sources, path)
+
+
+@case("sound_decode", 20)
+def bench_sound_decode():
+    from audio import SoundCache, SOUND_FOLDER, init_mixer
+    init_mixer()
+    path = os.path.join(SOUND_FOLDER, "ember.wav")
+    return lambda: SoundCache().get(path, 0.3)
+
+
+@case("import_battle_engine", 1, repeat=7)
+def bench_import_engine():
+    from bench_import import run, TIME_IMPORT
+    code = TIME_IMPORT.format(module="battle_engine")
+    run(code)
+    return lambda: run(code)
+
+
+@case("import_monsoon_rumble", 1, repeat=5)
+def bench_import_game():
+    from bench_import import run, TIME_IMPORT
+    code = TIME_IMPORT.format(module="monsoon_rumble")
+    run(code)
+    return lambda: run(code)
+
+
+def run_case(name):
+    setup, number, repeat = CASES[name]
+    fn = setup()
+    if name.startswith("import_"):
+        # These report the import time measured inside the child process
+        times = sorted(float(fn()) for _ in range(repeat))
+    else:
+        fn()
+        times = sorted(t / number for t in timeit.Timer(fn).repeat(repeat, number))
+    return {"best": times[0], "median": times[len(times) // 2], "number": number, "repeat": repeat}
+
+
+def run_suite(names):
+    import pygame
+    import numpy
+    results = {}
+    for name in names:
+        results[name] = run_case(name)
+        print(f"{name:<28}{format_time(results[name]['best']):>12}{format_time(results[name]['median']):>12}")
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "pygame": pygame.version.ver,
+        "numpy": numpy.__version__,
+        "results": results,
+    }
+
+
+def format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def compare(base, new, threshold=DEFAULT_THRESHOLD):
+    # Prints both runs side by side, returns the names that regressed
+    regressions = []
+    print(f"{'case':<28}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, result in new["results"].items():
+        old = base["results"].get(name)
+        if old is None:
+            print(f"{name:<28}{'-':>12}{format_time(result['best']):>12}{'new':>9}")
+            continue
+        change = result["best"] / old["best"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28}{format_time(old['best']):>12}{format_time(result['best']):>12}{change * 100:>+8.1f}%{flag}")
+    if base.get("machine") != new.get("machine") or base.get("python") != new.get("python"):
+        print("Note: the runs are from different machines or Python versions")
+    return regressions
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Engine, AI, rendering and asset loading benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run the benchmarks")
+    run.add_argument("cases", nargs="*", help="case names or prefixes, all by default")
+    run.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    run.add_argument("--compare", metavar="BASELINE", help="compare against a saved baseline")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown, 0.1 = 10%%")
+    diff = commands.add_parser("compare", help="compare two saved runs")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown, 0.1 = 10%%")
+    commands.add_parser("list", help="list the benchmark cases")
+    args = parser.parse_args()
+    if args.command == "list":
+        print("\n".join(CASES))
+        return
+    if args.command == "compare":
+        regressions = compare(load(args.baseline), load(args.current), args.threshold)
+    else:
+        names = [name for name in CASES if not args.cases or any(name.startswith(c) for c in args.cases)]
+        print(f"{'case':<28}{'best':>12}{'median':>12}")
+        current = run_suite(names)
+        if args.save:
+            os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+            with open(args.save, "w") as f:
+                json.dump(current, f, indent=2)
+        regressions = compare(load(args.compare), current, args.threshold) if args.compare else []
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold * 100:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import random
+
+# Frame-delta driven animation tracks. The main loop calls
+# Timeline.update(dt) once per frame with the elapsed seconds, nothing in here
+# ever sleeps, so the window keeps pumping events and animation speed does not
+# depend on the frame rate.
+#
+# Every track has advance(dt), which returns None while the track is still
+# running, or the part of dt it didn't need once it finishes so the next
+# track in a Sequence can use it.
+
+
+def linear(t):
+    return t
+
+
+def ease_out(t):
+    return 1 - (1 - t) * (1 - t)
+
+
+class Track:
+    def start(self):
+        pass
+
+    def advance(self, dt):
+        return dt
+
+
+class Wait(Track):
+    def __init__(self, duration):
+        self.duration = duration
+
+    def start(self):
+        self.elapsed = 0.0
+
+    def advance(self, dt):
+        self.elapsed += dt
+        if self.elapsed < self.duration:
+            return None
+        return self.elapsed - self.duration
+
+
+class Call(Track):
+    # Runs fn once. If fn returns a Track, that track plays in its place,
+    # which is how a sequence can branch on the game state at that moment.
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+    def start(self):
+        self.inner = None
+        self.called = False
+
+    def advance(self, dt):
+        if not self.called:
+            self.called = True
+            self.inner = self.fn(*self.args)
+            if self.inner is not None:
+                self.inner.start()
+        if self.inner is None:
+            return dt
+        return self.inner.advance(dt)
+
+
+class Tween(Track):
+    # Interpolates from start to end over duration and hands each value to
+    # setter. start/end may be callables, read when the track starts.
+    def __init__(self, duration, setter, start, end, ease=linear):
+        self.duration = duration
+        self.setter = setter
+        self.start_value = start
+        self.end_value = end
+        self.ease = ease
+
+    def start(self):
+        self.elapsed = 0.0
+        self.a = self.start_value() if callable(self.start_value) else self.start_value
+        self.b = self.end_value() if callable(self.end_value) else self.end_value
+
+    def advance(self, dt):
+        self.elapsed += dt
+        if self.duration <= 0 or self.elapsed >= self.duration:
+            self.setter(self.b)
+            return self.elapsed - self.duration if self.duration > 0 else dt
+        t = self.ease(self.elapsed / self.duration)
+        self.setter(self.a + (self.b - self.a) * t)
+        return None
+
+
+class Shake(Track):
+    # Random offset on a [x, y] list, re-rolled every interval, zeroed at the end
+    def __init__(self, offset, duration=0.25, amplitude=5, interval=0.05):
+        self.offset = offset
+        self.duration = duration
+        self.amplitude = amplitude
+        self.interval = interval
+
+    def start(self):
+        self.elapsed = 0.0
+        self.next_roll = 0.0
+
+    def advance(self, dt):
+        self.elapsed += dt
+        if self.elapsed >= self.duration:
+            self.offset[0] = self.offset[1] = 0
+            return self.elapsed - self.duration
+        if self.elapsed >= self.next_roll:
+            self.offset[0] = random.randint(-self.amplitude, self.amplitude)
+            self.offset[1] = random.randint(-self.amplitude, self.amplitude)
+            self.next_roll += self.interval
+        return None
+
+
+class Sequence(Track):
+    def __init__(self, *tracks):
+        self.tracks = list(tracks)
+
+    def start(self):
+        self.index = 0
+        if self.tracks:
+            self.tracks[0].start()
+
+    def advance(self, dt):
+        while self.index < len(self.tracks):
+            left = self.tracks[self.index].advance(dt)
+            if left is None:
+                return None
+            dt = left
+            self.index += 1
+            if self.index < len(self.tracks):
+                self.tracks[self.index].start()
+        return dt
+
+
+class Parallel(Track):
+    def __init__(self, *tracks):
+        self.tracks = list(tracks)
+
+    def start(self):
+        self.running = list(self.tracks)
+        for track in self.running:
+            track.start()
+
+    def advance(self, dt):
+        # Leftover is whatever the last track to finish didn't use
+        still = []
+        leftover = dt
+        for track in self.running:
+            left = track.advance(dt)
+            if left is None:
+                still.append(track)
+            else:
+                leftover = min(leftover, left)
+        self.running = still
+        return None if still else leftover
+
+
+class Timeline:
+    # Tracks played on a timeline run in parallel with each other
+    def __init__(self):
+        self.tracks = []
+
+    def play(self, track):
+        track.start()
+        self.tracks.append(track)
+        return track
+
+    def update(self, dt):
+        self.tracks = [track for track in self.tracks if track.advance(dt) is None]
+
+    def clear(self):
+        self.tracks = []
+
+    @property
+    def active(self):
+        return bool(self.tracks)
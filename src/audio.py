@@ -0,0 +1,208 @@
+import os
+from collections import OrderedDict
+
+import pygame
+
+# All game audio goes through one AudioManager. It owns a fixed pool of mixer
+# channels: a new sound takes a free channel, or steals the one playing the
+# lowest-priority, oldest sound if that is no more important than itself, and
+# is dropped otherwise. The same sound requested twice in one frame only
+# plays once. Decoded sounds live in a single LRU cache capped in bytes of
+# PCM, shared by every SoundBank and filled on first play. Nothing here opens
+# the audio device until something actually plays.
+
+# Paths are relative to the game folder, not the working directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOUND_FOLDER = os.path.join(ROOT, "assets", "sounds")
+CRY_FOLDER = os.path.join(ROOT, "assets", "cries")
+CHANNEL_COUNT = 8
+SOUND_CACHE_BYTES = 8 * 1024 * 1024
+# Small mixer buffer so sounds start on the frame they are triggered
+MIXER_BUFFER = 512
+
+PRIORITY_MOVE = 1
+PRIORITY_FAINT = 2
+PRIORITY_CRY = 3
+
+_mixer_ready = None
+
+
+def init_mixer():
+    # True once the mixer is open, False if there is no audio device
+    global _mixer_ready
+    if _mixer_ready is None:
+        try:
+            if not pygame.mixer.get_init():
+                pygame.mixer.init(buffer=MIXER_BUFFER)
+            _mixer_ready = True
+        except pygame.error:
+            print("Warning: audio unavailable, sounds are disabled.")
+            _mixer_ready = False
+    return _mixer_ready
+
+
+def sound_bytes(sound):
+    frequency, size, channels = pygame.mixer.get_init()
+    return int(sound.get_length() * frequency) * channels * (abs(size) // 8)
+
+
+class SoundCache:
+    def __init__(self, max_bytes=SOUND_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._sounds = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, path, volume):
+        entry = self._sounds.get(path)
+        if entry is not None:
+            self._sounds.move_to_end(path)
+            self.stats["hits"] += 1
+            return entry[0]
+        self.stats["misses"] += 1
+        sound = pygame.mixer.Sound(path)
+        sound.set_volume(volume)
+        size = sound_bytes(sound)
+        self._sounds[path] = (sound, size)
+        self.bytes += size
+        self.evict()
+        return sound
+
+    def evict(self):
+        # Freeing a sound stops it, so anything still playing is skipped, and
+        # the newest entry always stays
+        for path in list(self._sounds)[:-1]:
+            if self.bytes <= self.max_bytes:
+                break
+            sound, size = self._sounds[path]
+            if sound.get_num_channels():
+                continue
+            del self._sounds[path]
+            self.bytes -= size
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        self._sounds.clear()
+        self.bytes = 0
+
+
+_cache = SoundCache()
+
+
+def sound_name(fname):
+    return os.path.splitext(fname)[0].replace("_", " ").title()
+
+
+def cry_name(fname):
+    return os.path.splitext(fname)[0].capitalize()
+
+
+class SoundBank:
+    # Maps sound names to files in one folder, listed on first use
+    def __init__(self, folder, volume, naming=sound_name, warn_missing=False, cache=None):
+        self.folder = folder
+        self.volume = volume
+        self.naming = naming
+        self.warn_missing = warn_missing
+        self.cache = cache or _cache
+        self._paths = None
+
+    def paths(self):
+        if self._paths is None:
+            self._paths = {}
+            if not os.path.exists(self.folder):
+                if self.warn_missing:
+                    print(f"Warning: {os.path.basename(self.folder)} folder not found.")
+                return self._paths
+            for fname in sorted(os.listdir(self.folder)):
+                if fname.endswith(".wav"):
+                    self._paths[self.naming(fname)] = os.path.join(self.folder, fname)
+        return self._paths
+
+    def __contains__(self, name):
+        return name in self.paths()
+
+    def get(self, name):
+        # Decoded sound for name, or None if there is no such file or no audio
+        path = self.paths().get(name)
+        if path is None or not init_mixer():
+            return None
+        try:
+            return self.cache.get(path, self.volume)
+        except pygame.error:
+            print(f"Failed to load sound: {os.path.basename(path)}")
+            # Don't retry a broken file on every play
+            del self._paths[name]
+            return None
+
+
+class AudioManager:
+    def __init__(self, channel_count=CHANNEL_COUNT):
+        self.channel_count = channel_count
+        self.channels = None
+        # per channel: (priority, order started), for picking a voice to steal
+        self.playing = []
+        self.order = 0
+        self.frame_requests = set()
+        # Offline tools set this so nothing opens the audio device
+        self.muted = False
+        self.stats = {"played": 0, "deduped": 0, "stolen": 0, "dropped": 0}
+
+    def open(self):
+        if self.channels is None:
+            if not init_mixer():
+                return False
+            pygame.mixer.set_num_channels(self.channel_count)
+            # Reserved so a bare Sound.play() elsewhere can't take a pool channel
+            pygame.mixer.set_reserved(self.channel_count)
+            self.channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+            self.playing = [(0, 0)] * self.channel_count
+        return True
+
+    def play(self, bank, name, priority=PRIORITY_MOVE):
+        if self.muted:
+            return None
+        key = (bank.folder, name)
+        if key in self.frame_requests:
+            self.stats["deduped"] += 1
+            return None
+        self.frame_requests.add(key)
+        if name not in bank or not self.open():
+            return None
+        sound = bank.get(name)
+        if sound is None:
+            return None
+        index = self.pick_channel(priority)
+        if index is None:
+            self.stats["dropped"] += 1
+            return None
+        self.order += 1
+        self.playing[index] = (priority, self.order)
+        channel = self.channels[index]
+        channel.play(sound)
+        self.stats["played"] += 1
+        return channel
+
+    def pick_channel(self, priority):
+        victim = None
+        for index, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                return index
+            if self.playing[index][0] <= priority and (victim is None or self.playing[index] < self.playing[victim]):
+                victim = index
+        if victim is not None:
+            self.stats["stolen"] += 1
+        return victim
+
+    def end_frame(self):
+        self.frame_requests.clear()
+
+    def stop(self):
+        if self.channels is not None:
+            for channel in self.channels:
+                channel.stop()
+
+
+sounds = SoundBank(SOUND_FOLDER, 0.3, warn_missing=True)
+cries = SoundBank(CRY_FOLDER, 0.18, naming=cry_name)
+audio = AudioManager()
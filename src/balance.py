@@ -0,0 +1,404 @@
+import argparse
+import copy
+import hashlib
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from battle_engine import DATA_PATH, read_definitions, apply_definitions, make_roster
+from matchup_sim import simulate_matrix
+
+# Stat balancing. Searches species hp/attack/defense and move power/PP for a
+# roster whose matchup matrix sits near a target spread: every species wins
+# about half its battles overall, no single matchup is further than `spread`
+# from even, battles rarely end in draws, and the numbers move as little as
+# they need to.
+#
+# A candidate is a vector of integers, one per tunable number. It is scored
+# with matchup_sim's lockstep NumPy battles on a process pool, using the same
+# seed for every candidate so differences between them aren't sampling noise.
+# Results are cached by vector, so the search never simulates a candidate
+# twice. The checkpoint only holds the search state, rewritten every round;
+# the cache goes into a log next to it that each round appends its new
+# results to, so saving costs the round's results rather than all of them.
+#
+# The search is a parallel pattern search: every round tries each number one
+# step up and down (all on the pool at once), plus all the improving steps
+# together, and keeps the best. When nothing improves the steps are halved;
+# it stops when the smallest steps can't improve either.
+#
+#   python src/balance.py --battles 2000 --workers 32
+#   python src/balance.py --resume            # carry on from the checkpoint
+
+BALANCE_FOLDER = "balance"
+CHECKPOINT_PATH = os.path.join(BALANCE_FOLDER, "checkpoint.json")
+OUTPUT_PATH = os.path.join(BALANCE_FOLDER, "monsoons.json")
+
+# (smallest step, lowest value, highest value) per kind of number
+STAT_RANGES = {"hp": (10, 20, 400), "attack": (5, 10, 250), "defense": (5, 10, 250)}
+POWER_RANGE = (5, 5, 150)
+HEAL_RANGE = (5, -100, -5)
+PP_RANGE = (1, 1, 40)
+# Search starts with steps this many times the smallest one
+START_STEP = 8
+
+DEFAULT_SPREAD = 0.15
+DRAW_WEIGHT = 0.1
+DRIFT_WEIGHT = 0.01
+
+
+class ParameterSpace:
+    # The tunable numbers of a definitions file. Status moves (power 0) only
+    # get their PP tuned, so a move never changes between hurting and healing.
+    def __init__(self, data):
+        self.data = data
+        # (label, path into data, step, low, high)
+        self.params = []
+        for i, species in enumerate(data["species"]):
+            for stat, (step, low, high) in STAT_RANGES.items():
+                self.params.append((f"{species['name']} {stat}", ("species", i, "stats", stat), step, low, high))
+        for name, move in data["moves"].items():
+            if move["power"] > 0:
+                self.params.append((f"{name} power", ("moves", name, "power"), *POWER_RANGE))
+            elif move["power"] < 0:
+                self.params.append((f"{name} power", ("moves", name, "power"), *HEAL_RANGE))
+            self.params.append((f"{name} pp", ("moves", name, "pp"), *PP_RANGE))
+        self.steps = [param[2] for param in self.params]
+        self.low = np.array([param[3] for param in self.params])
+        self.high = np.array([param[4] for param in self.params])
+
+    def __len__(self):
+        return len(self.params)
+
+    def lookup(self, data, path):
+        for key in path[:-1]:
+            data = data[key]
+        return data, path[-1]
+
+    def current(self):
+        # The numbers as the definitions have them
+        values = []
+        for label, path, step, low, high in self.params:
+            container, key = self.lookup(self.data, path)
+            values.append(container[key])
+        return tuple(values)
+
+    def start(self):
+        # Where the search begins: the current numbers, clipped into range
+        return tuple(self.clip(i, value) for i, value in enumerate(self.current()))
+
+    def out_of_range(self):
+        # (label, value, low, high) for each current number start() clips
+        return [(label, value, low, high) for (label, path, step, low, high), value in zip(self.params, self.current())
+                if not low <= value <= high]
+
+    def clip(self, index, value):
+        return int(min(max(value, self.low[index]), self.high[index]))
+
+    def build(self, vector):
+        data = copy.deepcopy(self.data)
+        for (label, path, step, low, high), value in zip(self.params, vector):
+            container, key = self.lookup(data, path)
+            container[key] = value
+        return data
+
+
+def definitions_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+_worker = None
+
+
+def init_worker(data, battles, seed):
+    global _worker
+    # Ctrl-C stops the search in the main process; workers finish their task
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker = (ParameterSpace(data), battles, seed)
+
+
+def evaluate(vector):
+    # (wins, draws) matrices for one candidate, run in a pool worker. Each
+    # candidate is applied like a definitions reload, so only the damage
+    # table entries of the numbers that differ from the last one are rebuilt.
+    space, battles, seed = _worker
+    apply_definitions(space.build(vector), "candidate")
+    result = simulate_matrix(battles, seed, roster=make_roster())
+    return result["wins"].tolist(), result["draws"].tolist()
+
+
+def matchup_scores(wins, draws, battles):
+    # score[a, b]: how often a beats b over both seats, draws counting half
+    wins, draws = np.asarray(wins, float), np.asarray(draws, float)
+    as_player = (wins + 0.5 * draws) / battles
+    as_opponent = 1 - (wins.T + 0.5 * draws.T) / battles
+    return (as_player + as_opponent) / 2
+
+
+class Objective:
+    def __init__(self, space, battles, spread=DEFAULT_SPREAD, draw_weight=DRAW_WEIGHT, drift_weight=DRIFT_WEIGHT):
+        self.space = space
+        self.battles = battles
+        self.spread = spread
+        self.draw_weight = draw_weight
+        self.drift_weight = drift_weight
+        self.origin = np.array(space.current(), float)
+        self.scale = (space.high - space.low).astype(float)
+
+    def terms(self, result, vector):
+        wins, draws = result
+        score = matchup_scores(wins, draws, self.battles)
+        count = len(score)
+        others = ~np.eye(count, dtype=bool)
+        strength = (score.sum(axis=1) - 0.5) / (count - 1)
+        return {
+            "balance": float(np.mean((strength - 0.5) ** 2)),
+            "outliers": float(np.mean(np.maximum(0, np.abs(score[others] - 0.5) - self.spread) ** 2)),
+            "draws": float(np.asarray(draws, float)[others].sum() / (self.battles * count * (count - 1))),
+            "drift": float(np.mean(((np.array(vector) - self.origin) / self.scale) ** 2)),
+        }
+
+    def __call__(self, result, vector):
+        # Lower is better
+        t = self.terms(result, vector)
+        return t["balance"] + t["outliers"] + self.draw_weight * t["draws"] + self.drift_weight * t["drift"]
+
+    def settings(self):
+        return {"battles": self.battles, "spread": self.spread, "draw_weight": self.draw_weight,
+                "drift_weight": self.drift_weight}
+
+
+class Balancer:
+    def __init__(self, space, objective, seed, pool):
+        self.space = space
+        self.objective = objective
+        self.seed = seed
+        self.pool = pool
+        self.cache = {}
+        # Cached vectors not in the cache log yet, and the log they go to
+        self.unsaved = []
+        self.cache_log = None
+        self.vector = space.start()
+        self.steps = [step * START_STEP for step in space.steps]
+        self.round = 0
+        self.evaluations = 0
+        self.done = False
+
+    def settings(self):
+        # Cached results are only valid for the same definitions and battles
+        return dict(self.objective.settings(), seed=self.seed, definitions=definitions_hash(self.space.data))
+
+    def results(self, vectors):
+        # Simulates the vectors that aren't cached yet, all at once
+        missing = list(dict.fromkeys(v for v in vectors if v not in self.cache))
+        for vector, result in zip(missing, self.pool.map(evaluate, missing)):
+            self.cache[vector] = result
+        self.unsaved.extend(missing)
+        self.evaluations += len(missing)
+        return [self.cache[v] for v in vectors]
+
+    def fitness(self, vector):
+        return self.objective(self.results([vector])[0], vector)
+
+    def neighbours(self):
+        moves = []
+        for i, step in enumerate(self.steps):
+            for sign in (1, -1):
+                value = self.space.clip(i, self.vector[i] + sign * step)
+                if value != self.vector[i]:
+                    moves.append((i, value))
+        return moves
+
+    def step(self):
+        # One round; returns (fitness, how many parameters changed)
+        current = self.fitness(self.vector)
+        moves = self.neighbours()
+        candidates = []
+        for i, value in moves:
+            vector = list(self.vector)
+            vector[i] = value
+            candidates.append(tuple(vector))
+        scores = [self.objective(result, vector) for result, vector in zip(self.results(candidates), candidates)]
+
+        # Every improving step at once, taking the better direction per number
+        best_per_param = {}
+        for (i, value), score in zip(moves, scores):
+            if score < current and (i not in best_per_param or score < best_per_param[i][1]):
+                best_per_param[i] = (value, score)
+        options = list(zip(scores, candidates))
+        if len(best_per_param) > 1:
+            combined = list(self.vector)
+            for i, (value, score) in best_per_param.items():
+                combined[i] = value
+            combined = tuple(combined)
+            options.append((self.fitness(combined), combined))
+
+        self.round += 1
+        best_score, best = min(options, default=(current, self.vector))
+        if best_score < current:
+            changed = sum(a != b for a, b in zip(best, self.vector))
+            self.vector = best
+            return best_score, changed
+        smallest = self.space.steps
+        if all(step == low for step, low in zip(self.steps, smallest)):
+            self.done = True
+        self.steps = [max(low, step // 2) for step, low in zip(self.steps, smallest)]
+        return current, 0
+
+    def save(self, path):
+        # Appends the new results to the cache log, then replaces the
+        # checkpoint. A log this balancer didn't start or load is rewritten
+        # whole, headed by the settings its results belong to.
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        log_path = path + ".cache"
+        if self.cache_log != log_path:
+            tmp_path = log_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(json.dumps(self.settings()) + "\n")
+                f.writelines(cache_line(vector, self.cache[vector]) for vector in self.cache)
+            os.replace(tmp_path, log_path)
+            self.cache_log = log_path
+        else:
+            with open(log_path, "a") as f:
+                f.writelines(cache_line(vector, self.cache[vector]) for vector in self.unsaved)
+        self.unsaved = []
+
+        state = {
+            "settings": self.settings(),
+            "vector": list(self.vector),
+            "steps": self.steps,
+            "round": self.round,
+            "evaluations": self.evaluations,
+            "done": self.done,
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        with open(path) as f:
+            state = json.load(f)
+        if state["settings"] != self.settings():
+            raise ValueError(f"{path} was made with different definitions or settings")
+        self.vector = tuple(state["vector"])
+        self.steps = state["steps"]
+        self.round = state["round"]
+        self.evaluations = state["evaluations"]
+        self.done = state["done"]
+
+        log_path = path + ".cache"
+        self.cache = {}
+        self.unsaved = []
+        with open(log_path) as f:
+            if json.loads(f.readline() or "null") != self.settings():
+                raise ValueError(f"{log_path} was made with different definitions or settings")
+            self.cache_log = log_path
+            for line in f:
+                try:
+                    vector, wins, draws = json.loads(line)
+                except ValueError:
+                    # A save cut short; the next one rewrites the log
+                    self.cache_log = None
+                    break
+                self.cache[tuple(vector)] = (wins, draws)
+
+
+def cache_line(vector, result):
+    wins, draws = result
+    return json.dumps([list(vector), wins, draws]) + "\n"
+
+
+def format_definitions(data):
+    # The layout of data/monsoons.json: one type, move or species per line
+    def block(items, last):
+        return [f"    {item}" + ("," if i < last else "") for i, item in enumerate(items)]
+    types, moves = data["types"], data["moves"]
+    lines = ["{", '  "types": {']
+    lines += block([f"{json.dumps(t)}: {json.dumps(chart)}" for t, chart in types.items()], len(types) - 1)
+    lines += ["  },", '  "moves": {']
+    lines += block([f"{json.dumps(name)}: {json.dumps(move)}" for name, move in moves.items()], len(moves) - 1)
+    lines += ["  },", '  "species": [']
+    lines += block([json.dumps(species) for species in data["species"]], len(data["species"]) - 1)
+    lines += ["  ]", "}"]
+    return "\n".join(lines) + "\n"
+
+
+def print_summary(balancer, vector, title):
+    objective = balancer.objective
+    result = balancer.results([vector])[0]
+    score = matchup_scores(*result, objective.battles)
+    names = [species["name"] for species in balancer.space.data["species"]]
+    count = len(names)
+    strength = (score.sum(axis=1) - 0.5) / (count - 1)
+    others = ~np.eye(count, dtype=bool)
+    worst = np.unravel_index(np.argmax(np.where(others, score, 0)), score.shape)
+    terms = objective.terms(result, vector)
+    print(f"{title}: fitness {objective(result, vector):.5f}  "
+          + "  ".join(f"{name} {value:.5f}" for name, value in terms.items()))
+    print("  win rate  " + "  ".join(f"{name} {rate:.2f}" for name, rate in zip(names, strength)))
+    print(f"  most lopsided matchup: {names[worst[0]]} beats {names[worst[1]]} {score[worst]:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune species stats and move power/PP toward a balanced matchup matrix.")
+    parser.add_argument("--data", default=DATA_PATH, help="definitions file to start from")
+    parser.add_argument("-n", "--battles", type=int, default=2000, help="battles per pair for each candidate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spread", type=float, default=DEFAULT_SPREAD, help="allowed distance of a matchup from 50%%")
+    parser.add_argument("--draw-weight", type=float, default=DRAW_WEIGHT)
+    parser.add_argument("--drift-weight", type=float, default=DRIFT_WEIGHT, help="cost of moving away from the start")
+    parser.add_argument("--rounds", type=int, default=1000, help="stop after this many rounds")
+    parser.add_argument("--hours", type=float, default=None, help="stop after this much time")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint")
+    parser.add_argument("-o", "--out", default=OUTPUT_PATH, help="where to write the balanced definitions")
+    args = parser.parse_args()
+
+    data, _, _ = read_definitions(args.data)
+    space = ParameterSpace(data)
+    for label, value, low, high in space.out_of_range():
+        print(f"Warning: {label} {value} is outside {low} to {high}, the search starts it at "
+              f"{min(max(value, low), high)}")
+    objective = Objective(space, args.battles, args.spread, args.draw_weight, args.drift_weight)
+    start = time.perf_counter()
+    deadline = start + args.hours * 3600 if args.hours else None
+    with ProcessPoolExecutor(args.workers, initializer=init_worker, initargs=(data, args.battles, args.seed)) as pool:
+        balancer = Balancer(space, objective, args.seed, pool)
+        if args.resume:
+            try:
+                balancer.load(args.checkpoint)
+            except (OSError, ValueError) as e:
+                raise SystemExit(f"Can't resume: {e}")
+            print(f"Resuming at round {balancer.round} with {len(balancer.cache):,} cached results")
+        print(f"{len(space)} parameters, {args.battles} battles per pair on {args.workers} workers")
+        print_summary(balancer, space.current(), "start")
+        try:
+            while not balancer.done and balancer.round < args.rounds:
+                if deadline and time.perf_counter() > deadline:
+                    break
+                fitness, changed = balancer.step()
+                balancer.save(args.checkpoint)
+                print(f"round {balancer.round}: fitness {fitness:.5f}, {changed} changed, "
+                      f"largest step {max(balancer.steps)}, {balancer.evaluations:,} simulated "
+                      f"({time.perf_counter() - start:.0f}s)")
+        except KeyboardInterrupt:
+            print("Stopped, the checkpoint has the last finished round")
+        print_summary(balancer, balancer.vector, "end")
+
+    for (label, *_), before, after in zip(space.params, space.current(), balancer.vector):
+        if before != after:
+            print(f"  {label}: {before} -> {after}")
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        f.write(format_definitions(space.build(balancer.vector)))
+    print(f"Balanced definitions written to {args.out}" + ("" if balancer.done else " (search not finished)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,794 @@
+import marshal
+import os
+import random
+import sys
+from array import array
+
+# Battle core: no pygame in here so battles can run headless.
+# The engine never plays sounds itself, every action returns a list of
+# events that the UI turns into sounds and animations.
+
+PLAYER = 0
+OPPONENT = 1
+MAX_TURNS = 200
+
+CRIT_CHANCE = 0.1
+CRIT_MULTIPLIER = 1.5
+PARALYSIS_CHANCE = 0.25
+CONFUSION_CHANCE = 0.5
+CONFUSION_DAMAGE = 10
+
+# Status bitflags for compact battle states
+PARALYZED = 1
+CONFUSED = 2
+STATUS_BITS = {"Paralyzed": PARALYZED, "Confused": CONFUSED}
+STATUS_NAMES = {bit: name for name, bit in STATUS_BITS.items()}
+STATUS_MESSAGES = {"Paralyzed": "is paralyzed!", "Confused": "became confused!"}
+
+# Types, moves and species come from the definitions file (see
+# load_definitions). These objects are filled in place, so modules that
+# imported them see every reload.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(ROOT, "data", "monsoons.json")
+DEFINITIONS_CACHE_PATH = os.path.join(ROOT, "assets", ".cache", "definitions.bin")
+TABLE_CACHE_PATH = os.path.join(ROOT, "assets", ".cache", "damage_tables.bin")
+
+TYPES = []
+TYPE_EFFECTIVENESS = {}
+
+# Classes
+class Move:
+    def __init__(self, name, type, power, pp, effect=0):
+        self.name = name
+        self.type = type
+        self.power = power
+        self.max_pp = pp
+        self.pp = pp
+        # Status bit the move inflicts on its target, 0 for none
+        self.effect = effect
+        self.id = None
+        # DamageTables this move's fighter was built with, None for none
+        self.tables = None
+
+MOVES = {}
+
+# Roster: (name, types, stats, moves)
+ROSTER = []
+
+
+# Interned ids. Names keep their id for the life of the process, so ids held
+# by fighters stay valid when the tables are rebuilt.
+TYPE_IDS = {}
+MOVE_IDS = {}
+SPECIES_IDS = {}
+
+_definitions_version = 0
+_tables = None
+# Move and species names edited since the tables were built, or None when
+# everything has to be rebuilt
+_changed = None
+# The definitions file in effect: path, (mtime, size), content hash and the
+# parsed data. The hash is None for definitions applied without one.
+_source = {"path": None, "stat": None, "hash": None, "data": None}
+# (entry, cache path) of a definitions cache write left for the first
+# get_tables(), so importing the engine never writes files or prints
+_pending_cache = None
+
+# Parsed definitions cache: DEFINITIONS_MAGIC, then a marshal dump of the
+# file's path, (mtime, size), content hash and parsed data. While the file's
+# mtime and size match, importing the engine reads neither the file nor json.
+DEFINITIONS_MAGIC = b"MRDEFS01"
+# Compiled damage table cache: TABLE_MAGIC, 4-byte little-endian header
+# length, JSON header, then move_multiplier as doubles and damage and
+# crit_damage as 32-bit ints, all little-endian.
+TABLE_MAGIC = b"MRTABLE1"
+
+
+def _intern(ids, name):
+    if name not in ids:
+        ids[name] = len(ids)
+    return ids[name]
+
+
+class DamageTables:
+    # Flat lookup tables over interned ids:
+    #   move_multiplier[move * S + species]         type multiplier incl. dual types
+    #   damage[(attacker * M + move) * S + defender] calculate_damage result
+    #   crit_damage[...]                             same with CRIT_MULTIPLIER
+    # plus read-only per-species and per-move data (species_hp, move_power,
+    # move_pp, move_effect) for code that works on ids rather than Fighters.
+    # Plain lists keep scalar reads cheap; arrays() gives the NumPy views that
+    # matchup_sim reads every pair from.
+    #
+    # The three big tables grow with species² x moves. They come from the
+    # disk cache when one matches (`cached`), otherwise from `previous` with
+    # only the entries of the `changed` (move names, species names) worked out
+    # again, and are built from scratch when neither fits. `previous` only
+    # fits while the same moves and species are defined: the entries of a
+    # removed one would be left behind, and a new one has none to patch.
+    def __init__(self, version, previous=None, changed=None, cached=None):
+        self.version = version
+        for t in TYPES:
+            _intern(TYPE_IDS, t)
+        for name in MOVES:
+            _intern(MOVE_IDS, name)
+        self.species = {}
+        for species in ROSTER:
+            _intern(SPECIES_IDS, species[0])
+            self.species[species[0]] = species
+        self.type_count = len(TYPE_IDS)
+        self.move_count = M = len(MOVE_IDS)
+        self.species_count = S = len(SPECIES_IDS)
+
+        type_names = sorted(TYPE_IDS, key=TYPE_IDS.get)
+        self.multiplier = [[TYPE_EFFECTIVENESS.get(a, {}).get(d, 1.0) for d in type_names] for a in type_names]
+
+        self.moves = moves = [MOVES.get(name) for name in sorted(MOVE_IDS, key=MOVE_IDS.get)]
+        self.species_list = species = [self.species.get(name) for name in sorted(SPECIES_IDS, key=SPECIES_IDS.get)]
+        self.species_hp = [0 if sp is None else sp[2]["hp"] for sp in species]
+        self.move_power = [0 if move is None else move.power for move in moves]
+        self.move_pp = [0 if move is None else move.max_pp for move in moves]
+        self.move_effect = [0 if move is None else move.effect for move in moves]
+
+        if cached is not None:
+            self.move_multiplier, self.damage, self.crit_damage = cached
+        elif (previous is not None and changed is not None and previous.multiplier == self.multiplier
+              and [move is None for move in previous.moves] == [move is None for move in moves]
+              and [sp is None for sp in previous.species_list] == [sp is None for sp in species]):
+            self.move_multiplier = list(previous.move_multiplier)
+            self.damage = list(previous.damage)
+            self.crit_damage = list(previous.crit_damage)
+            move_names, species_names = changed
+            everyone = range(S)
+            for name in species_names:
+                if name in SPECIES_IDS:
+                    self.fill(range(M), [SPECIES_IDS[name]], everyone)
+                    self.fill(range(M), everyone, [SPECIES_IDS[name]])
+            self.fill([MOVE_IDS[name] for name in move_names if name in MOVE_IDS], everyone, everyone)
+        else:
+            self.move_multiplier = [1.0] * (M * S)
+            self.damage = [1] * (S * M * S)
+            self.crit_damage = [1] * (S * M * S)
+            self.fill(range(M), range(S), range(S))
+        self._arrays = None
+
+    def fill(self, move_ids, attacker_ids, defender_ids):
+        # Works out the entries for every combination of the given ids
+        M, S = self.move_count, self.species_count
+        species = self.species_list
+        for m in move_ids:
+            move = self.moves[m]
+            if move is None:
+                continue
+            row = TYPE_EFFECTIVENESS.get(move.type, {})
+            for d in defender_ids:
+                defender = species[d]
+                if defender is None:
+                    continue
+                multiplier = 1.0
+                for t in defender[1]:
+                    multiplier *= row.get(t, 1.0)
+                self.move_multiplier[m * S + d] = multiplier
+                for a in attacker_ids:
+                    attacker = species[a]
+                    if attacker is None:
+                        continue
+                    base = move.power + attacker[2]["attack"] - defender[2]["defense"]
+                    k = (a * M + m) * S + d
+                    self.damage[k] = max(1, int(base * multiplier))
+                    self.crit_damage[k] = max(1, int(base * multiplier * CRIT_MULTIPLIER))
+
+    def arrays(self):
+        if self._arrays is None:
+            import numpy as np
+            S, M, T = self.species_count, self.move_count, self.type_count
+            self._arrays = {
+                "multiplier": np.array(self.multiplier, np.float64).reshape(T, T),
+                "move_multiplier": np.array(self.move_multiplier, np.float64).reshape(M, S),
+                "damage": np.array(self.damage, np.int32).reshape(S, M, S),
+                "crit_damage": np.array(self.crit_damage, np.int32).reshape(S, M, S),
+                "species_hp": np.array(self.species_hp, np.int32),
+                "move_power": np.array(self.move_power, np.int32),
+                "move_pp": np.array(self.move_pp, np.int16),
+                "move_effect": np.array(self.move_effect, np.int8),
+            }
+        return self._arrays
+
+
+def table_cache_key():
+    # Tables depend on the definitions and on the id each name was given, so
+    # both go into the key. None when the definitions didn't come from a file.
+    if _source["hash"] is None:
+        return None
+    import hashlib
+    import json
+    layout = [sorted(ids, key=ids.get) for ids in (TYPE_IDS, MOVE_IDS, SPECIES_IDS)]
+    text = json.dumps([_source["hash"], layout, CRIT_MULTIPLIER])
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def read_table_cache(key, move_count, species_count, path=TABLE_CACHE_PATH):
+    # (move_multiplier, damage, crit_damage) lists, or None if stale or bad
+    import json
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if data[:len(TABLE_MAGIC)] != TABLE_MAGIC:
+        return None
+    start = len(TABLE_MAGIC) + 4
+    header_len = int.from_bytes(data[len(TABLE_MAGIC):start], "little")
+    try:
+        header = json.loads(data[start:start + header_len])
+    except ValueError:
+        return None
+    if header.get("key") != key or header.get("size") != [move_count, species_count]:
+        return None
+    offset = start + header_len
+    tables = []
+    for typecode, count in (("d", move_count * species_count), ("i", species_count * move_count * species_count),
+                            ("i", species_count * move_count * species_count)):
+        table = array(typecode)
+        end = offset + count * table.itemsize
+        if end > len(data):
+            return None
+        table.frombytes(data[offset:end])
+        if sys.byteorder == "big":
+            table.byteswap()
+        tables.append(table.tolist())
+        offset = end
+    return tuple(tables)
+
+
+def write_table_cache(key, tables, path=TABLE_CACHE_PATH):
+    import json
+    header = json.dumps({"key": key, "size": [tables.move_count, tables.species_count]}).encode()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Battle worker processes can build the same tables at once
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(TABLE_MAGIC)
+            f.write(len(header).to_bytes(4, "little"))
+            f.write(header)
+            for typecode, values in (("d", tables.move_multiplier), ("i", tables.damage), ("i", tables.crit_damage)):
+                table = array(typecode, values)
+                if sys.byteorder == "big":
+                    table.byteswap()
+                f.write(table.tobytes())
+        os.replace(tmp_path, path)
+    except OSError:
+        print("Warning: could not write the damage table cache.")
+
+
+def get_tables():
+    global _tables, _changed
+    if _tables is None or _tables.version != _definitions_version:
+        if _pending_cache is not None:
+            write_definitions_cache(*_pending_cache)
+        key = table_cache_key()
+        cached = None
+        if key is not None and (_tables is None or _changed is None):
+            cached = read_table_cache(key, len(MOVE_IDS), len(SPECIES_IDS))
+        tables = DamageTables(_definitions_version, _tables, _changed, cached)
+        if key is not None and cached is None:
+            write_table_cache(key, tables)
+        _tables = tables
+        _changed = (set(), set())
+    return _tables
+
+
+def parse_definitions(data, source="definitions"):
+    # Checks the parsed file and returns (types, moves, roster) in the forms
+    # TYPE_EFFECTIVENESS, MOVES and ROSTER use. Raises ValueError on mistakes.
+    try:
+        chart = data["types"]
+        types = list(chart)
+        effectiveness = {}
+        for t in types:
+            for other in chart[t]:
+                if other not in chart:
+                    raise ValueError(f"{source}: type {t} lists unknown type {other}")
+            effectiveness[t] = {other: float(chart[t].get(other, 1.0)) for other in types}
+        moves = {}
+        for name, move in data["moves"].items():
+            if move["type"] not in chart:
+                raise ValueError(f"{source}: move {name} has unknown type {move['type']}")
+            effect = move.get("effect")
+            if effect is not None and effect not in STATUS_BITS:
+                raise ValueError(f"{source}: move {name} has unknown effect {effect}")
+            moves[name] = Move(name, move["type"], int(move["power"]), int(move["pp"]), STATUS_BITS.get(effect, 0))
+        roster = []
+        for species in data["species"]:
+            name, stats = species["name"], species["stats"]
+            for t in species["types"]:
+                if t not in chart:
+                    raise ValueError(f"{source}: {name} has unknown type {t}")
+            for move in species["moves"]:
+                if move not in moves:
+                    raise ValueError(f"{source}: {name} has unknown move {move}")
+            if not 0 < len(species["moves"]) <= MAX_MOVES:
+                raise ValueError(f"{source}: {name} needs 1 to {MAX_MOVES} moves")
+            for stat in ("hp", "attack", "defense"):
+                if not isinstance(stats.get(stat), int):
+                    raise ValueError(f"{source}: {name} needs an integer {stat}")
+            roster.append((name, species["types"], stats, species["moves"]))
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"{source}: malformed definitions ({e!r})") from None
+    if len({species[0] for species in roster}) != len(roster):
+        raise ValueError(f"{source}: species names must be unique")
+    return types, effectiveness, moves, roster
+
+
+def apply_definitions(data, source="definitions", content_hash=None):
+    # Replaces every type, move and species with the ones in `data` and marks
+    # what changed for the next table build. Returns (changed move names,
+    # changed species names), both None when the type chart changed.
+    global _definitions_version, _changed
+    types, effectiveness, moves, roster = parse_definitions(data, source)
+    old = _source["data"]
+    if old is None or old["types"] != data["types"]:
+        move_names = species_names = None
+    else:
+        move_names = {name for name in set(old["moves"]) | set(data["moves"])
+                      if old["moves"].get(name) != data["moves"].get(name)}
+        old_species = {species["name"]: species for species in old["species"]}
+        new_species = {species["name"]: species for species in data["species"]}
+        species_names = {name for name in set(old_species) | set(new_species)
+                         if old_species.get(name) != new_species.get(name)}
+
+    TYPES[:] = types
+    TYPE_EFFECTIVENESS.clear()
+    TYPE_EFFECTIVENESS.update(effectiveness)
+    MOVES.clear()
+    MOVES.update(moves)
+    ROSTER[:] = roster
+    for t in types:
+        _intern(TYPE_IDS, t)
+    for name in moves:
+        _intern(MOVE_IDS, name)
+    for species in roster:
+        _intern(SPECIES_IDS, species[0])
+    _source["data"] = data
+    _source["hash"] = content_hash
+
+    _definitions_version += 1
+    if move_names is None:
+        _changed = None
+    elif _changed is not None:
+        _changed[0].update(move_names)
+        _changed[1].update(species_names)
+    return move_names, species_names
+
+
+def read_definitions(path, cache_path=DEFINITIONS_CACHE_PATH, write_cache=True):
+    # (parsed data, content hash, [mtime, size]) for a definitions file. The
+    # file is only parsed again when its content hash isn't the cached one.
+    # With write_cache False a stale cache is only written by get_tables().
+    global _pending_cache
+    st = os.stat(path)
+    stat = [st.st_mtime_ns, st.st_size]
+    cached = None
+    try:
+        with open(cache_path, "rb") as f:
+            if f.read(len(DEFINITIONS_MAGIC)) == DEFINITIONS_MAGIC:
+                cached = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        cached = None
+    if cached is not None and cached.get("path") == path and cached.get("stat") == stat:
+        return cached["data"], cached["hash"], stat
+
+    import hashlib
+    import json
+    with open(path, "rb") as f:
+        content = f.read()
+    content_hash = hashlib.sha256(content).hexdigest()
+    if cached is not None and cached.get("hash") == content_hash:
+        data = cached["data"]
+    else:
+        data = json.loads(content)
+    entry = {"path": path, "stat": stat, "hash": content_hash, "data": data}
+    if write_cache:
+        write_definitions_cache(entry, cache_path)
+    else:
+        _pending_cache = (entry, cache_path)
+    return data, content_hash, stat
+
+
+def write_definitions_cache(entry, cache_path=DEFINITIONS_CACHE_PATH):
+    global _pending_cache
+    # Anything still pending is older than this entry
+    _pending_cache = None
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(DEFINITIONS_MAGIC)
+            marshal.dump(entry, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        print("Warning: could not write the definitions cache.")
+
+
+def species_definitions(names):
+    # The current definitions cut down to the named species: the type chart,
+    # their entries and their moves, in the definitions file format
+    data = _source["data"]
+    species = [entry for entry in data["species"] if entry["name"] in names]
+    used = {move for entry in species for move in entry["moves"]}
+    return {"types": data["types"], "moves": {name: move for name, move in data["moves"].items() if name in used},
+            "species": species}
+
+
+def load_definitions(path=DATA_PATH, write_cache=True):
+    # Loads the definitions file and makes it the one reload_definitions()
+    # watches. Returns what changed, like apply_definitions.
+    data, content_hash, stat = read_definitions(path, write_cache=write_cache)
+    changed = apply_definitions(data, path, content_hash)
+    _source["path"] = path
+    _source["stat"] = stat
+    return changed
+
+
+def reload_definitions():
+    # Loads the definitions file again if it changed on disk since the last
+    # load. Returns (move names, species names) that changed (None for all),
+    # or False when nothing did. A bad file raises ValueError and leaves the
+    # current definitions in place until the file changes again. Fighters
+    # built before a reload keep their old stats, make new ones after.
+    path = _source["path"]
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if [st.st_mtime_ns, st.st_size] == _source["stat"]:
+        return False
+    _source["stat"] = [st.st_mtime_ns, st.st_size]
+    data, content_hash, stat = read_definitions(path)
+    _source["stat"] = stat
+    if content_hash == _source["hash"]:
+        return False
+    return apply_definitions(data, path, content_hash)
+
+
+class Fighter:
+    def __init__(self, name, types, stats, move_names):
+        self.name = name
+        self.types = types
+        self.max_hp = stats["hp"]
+        self.hp = stats["hp"]
+        self.attack_stat = stats["attack"]
+        self.defense = stats["defense"]
+        self.speed = stats.get("speed", 50)
+        self.statuses = []
+        self.moves = []
+        for move_name in move_names:
+            original_move = MOVES[move_name]
+            move = Move(original_move.name, original_move.type, original_move.power, original_move.max_pp,
+                        original_move.effect)
+            move.id = MOVE_IDS.get(move_name)
+            self.moves.append(move)
+        # Only fighters that match their roster entry can use the species
+        # tables. They keep the tables they were built with, so after the
+        # definitions change a fighter built before still hits with the
+        # stats it has; a pair built with different tables uses the formula.
+        tables = get_tables()
+        self.species_id = SPECIES_IDS[name] if tables.species.get(name) == (name, types, stats, move_names) else None
+        self.tables = tables if self.species_id is not None else None
+        for move in self.moves:
+            move.tables = self.tables
+
+    def reset(self):
+        self.hp = self.max_hp
+        self.statuses = []
+        for move in self.moves:
+            move.pp = move.max_pp
+
+    def attack(self, move_index, target, rng=random):
+        move = self.moves[move_index]
+        if move.pp <= 0:
+            return f"{self.name} tried to use {move.name} but it's out of PP!", [("no_pp", self.name, move.name)]
+        if "Paralyzed" in self.statuses and rng.random() < PARALYSIS_CHANCE:
+            return f"{self.name} is paralyzed and couldn't move!", [("paralyzed", self.name)]
+        if "Confused" in self.statuses and rng.random() < CONFUSION_CHANCE:
+            self.hp = max(0, self.hp - CONFUSION_DAMAGE)
+            return f"{self.name} is confused and hurt itself!", [("confused", self.name, CONFUSION_DAMAGE)]
+        move.pp -= 1
+        multiplier = type_multiplier(move, target)
+        is_critical = rng.random() < CRIT_CHANCE
+        crit_multiplier = CRIT_MULTIPLIER if is_critical else 1.0
+
+        if move.power >= 0:
+            damage = calculate_damage(self, move, target, crit_multiplier)
+        else:
+            damage = 0
+
+        events = [("move", self.name, move.name, move.type)]
+        log = self.use_move(move, target, damage, is_critical, multiplier, events)
+        return log, events
+
+    def use_move(self, move, target, damage, is_critical, multiplier, events):
+        log = f"{self.name} used {move.name}!"
+
+        if move.power > 0:
+            target.hp = max(0, target.hp - damage)
+            events.append(("damage", target.name, damage, is_critical, multiplier))
+            log += f" It dealt {damage} damage."
+        elif move.power < 0:
+            heal_amount = min(abs(move.power), self.max_hp - self.hp)
+            self.hp += heal_amount
+            events.append(("heal", self.name, heal_amount))
+            log += f" {self.name} recovered for {heal_amount} HP."
+
+        if is_critical:
+            log += " A critical hit!"
+        if multiplier > 1:
+            log += " It's super effective!"
+        elif multiplier < 1:
+            log += " It's not very effective."
+
+        if move.effect:
+            status = STATUS_NAMES[move.effect]
+            if status not in target.statuses:
+                target.statuses.append(status)
+                events.append(("status", target.name, status))
+                log += f" {target.name} {STATUS_MESSAGES[status]}"
+
+        if target.hp <= 0:
+            events.append(("faint", target.name))
+            log += f" {target.name} fainted!"
+
+        return log
+
+
+def status_bits(fighter):
+    bits = 0
+    for status in fighter.statuses:
+        bits |= STATUS_BITS.get(status, 0)
+    return bits
+
+
+# BattleState layout: one block per side, then the round counters
+MAX_MOVES = 4
+SPECIES, HP, STATUS, PP = 0, 1, 2, 3
+SIDE_SIZE = PP + MAX_MOVES
+TURN = 2 * SIDE_SIZE
+FLAGS = TURN + 1
+STATE_SIZE = FLAGS + 1
+NO_SPECIES = 0xFFFF
+
+# FLAGS bits
+PLAYER_STALLED = 1
+OVER = 2
+PLAYER_WON = 4
+OPPONENT_WON = 8
+
+
+class BattleState(array):
+    # Everything that changes during a battle, as STATE_SIZE unsigned shorts:
+    #   [species, hp, status bits, pp x MAX_MOVES] for the player, the same
+    #   for the opponent, then the turn count and FLAGS.
+    # Species and move data stay in the shared tables (get_tables()), so a
+    # state is 32 bytes of payload, copies with one memcpy, hashes by value
+    # and packs to bytes as is. Don't mutate a state while it is a dict key.
+    # It is what snapshots, replays and the battle server carry. cpu_ai and
+    # exact_solver search on flat tuples instead: an array subclass is no
+    # smaller than their tuples, and building one per node cost cpu_ai about
+    # 30% of its nodes per second.
+    __slots__ = ()
+
+    def __new__(cls, values=None):
+        return array.__new__(cls, "H", bytes(2 * STATE_SIZE) if values is None else values)
+
+    @classmethod
+    def from_fighters(cls, player, opponent, turn=0, flags=0):
+        state = cls()
+        for side, fighter in ((PLAYER, player), (OPPONENT, opponent)):
+            if len(fighter.moves) > MAX_MOVES:
+                raise ValueError(f"{fighter.name} has more than {MAX_MOVES} moves")
+            base = side * SIDE_SIZE
+            state[base + SPECIES] = NO_SPECIES if fighter.species_id is None else fighter.species_id
+            state[base + HP] = fighter.hp
+            state[base + STATUS] = status_bits(fighter)
+            for slot, move in enumerate(fighter.moves):
+                state[base + PP + slot] = move.pp
+        state[TURN] = turn
+        state[FLAGS] = flags
+        return state
+
+    def apply(self, player, opponent):
+        # Writes hp, statuses and PP back onto the two fighters
+        for side, fighter in ((PLAYER, player), (OPPONENT, opponent)):
+            base = side * SIDE_SIZE
+            species = NO_SPECIES if fighter.species_id is None else fighter.species_id
+            if self[base + SPECIES] != species:
+                raise ValueError(f"state is for a different species than {fighter.name}")
+            fighter.hp = self[base + HP]
+            bits = self[base + STATUS]
+            fighter.statuses = [name for bit, name in STATUS_NAMES.items() if bits & bit]
+            for slot, move in enumerate(fighter.moves):
+                move.pp = self[base + PP + slot]
+
+    def hp(self, side):
+        return self[side * SIDE_SIZE + HP]
+
+    def status(self, side):
+        return self[side * SIDE_SIZE + STATUS]
+
+    def pp(self, side, slot):
+        return self[side * SIDE_SIZE + PP + slot]
+
+    def copy(self):
+        return array.__new__(BattleState, "H", self)
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        # array's own would return a plain array
+        return self.copy()
+
+    def __hash__(self):
+        return hash(self.tobytes())
+
+    def pack(self):
+        # Little-endian bytes, the same on every machine
+        if sys.byteorder == "big":
+            state = self.copy()
+            state.byteswap()
+            return state.tobytes()
+        return self.tobytes()
+
+    @classmethod
+    def unpack(cls, data):
+        if len(data) != 2 * STATE_SIZE:
+            raise ValueError(f"expected {2 * STATE_SIZE} bytes, got {len(data)}")
+        state = array.__new__(cls, "H", data)
+        if sys.byteorder == "big":
+            state.byteswap()
+        return state
+
+
+def make_fighter(name, cls=Fighter):
+    for species in ROSTER:
+        if species[0] == name:
+            return cls(*species)
+    raise KeyError(name)
+
+
+def make_roster(cls=Fighter):
+    return [cls(*species) for species in ROSTER]
+
+
+def choose_best_move(opponent, player):
+    best_move_idx = 0
+    max_damage = 0
+    for i, move in enumerate(opponent.moves):
+        damage = calculate_damage(opponent, move, player)
+        if damage > max_damage:
+            max_damage = damage
+            best_move_idx = i
+    return best_move_idx
+
+def type_multiplier(move, defender):
+    tables = move.tables
+    if tables is not None and tables is defender.tables:
+        return tables.move_multiplier[move.id * tables.species_count + defender.species_id]
+    multiplier = 1.0
+    for t in defender.types:
+        multiplier *= TYPE_EFFECTIVENESS.get(move.type, {}).get(t, 1.0)
+    return multiplier
+
+def calculate_damage(attacker, move, defender, crit_multiplier=1.0):
+    tables = attacker.tables
+    if tables is not None and tables is defender.tables and tables is move.tables:
+        k = (attacker.species_id * tables.move_count + move.id) * tables.species_count + defender.species_id
+        if crit_multiplier == 1.0:
+            return tables.damage[k]
+        if crit_multiplier == CRIT_MULTIPLIER:
+            return tables.crit_damage[k]
+    damage = max(1, int((move.power + attacker.attack_stat - defender.defense) * type_multiplier(move, defender) * crit_multiplier))
+    return damage
+
+
+class Battle:
+    # A round is the player's action followed by the opponent's. The battle
+    # ends when the opponent faints after the player's action, or when either
+    # side is down after the opponent's. A round where neither side has PP
+    # left for its move, or hitting max_turns, ends in a draw.
+    def __init__(self, player, opponent, rng=None, max_turns=MAX_TURNS):
+        self.player = player
+        self.opponent = opponent
+        self.rng = rng if rng is not None else random.Random()
+        self.max_turns = max_turns
+        self.turn = 0
+        self.over = False
+        self.winner = None
+        self.log = ["Battle Start!"]
+        # Every move index passed to take_turn, in order, for replays
+        self.choices = []
+        self._player_stalled = False
+        player.reset()
+        opponent.reset()
+
+    def take_turn(self, side, move_index):
+        if side == PLAYER:
+            attacker, defender = self.player, self.opponent
+        else:
+            attacker, defender = self.opponent, self.player
+        self.choices.append(move_index)
+        log, events = attacker.attack(move_index, defender, self.rng)
+        self.log.append(log)
+        stalled = events[0][0] == "no_pp"
+        if side == PLAYER:
+            self._player_stalled = stalled
+            if self.opponent.hp <= 0:
+                self._finish(events)
+        else:
+            self.turn += 1
+            if self.player.hp <= 0 or self.opponent.hp <= 0:
+                self._finish(events)
+            elif (stalled and self._player_stalled) or self.turn >= self.max_turns:
+                self._finish(events, draw=True)
+        return events
+
+    def play_round(self, player_move, opponent_policy=None):
+        events = self.take_turn(PLAYER, player_move)
+        if not self.over:
+            policy = opponent_policy or choose_best_move
+            events += self.take_turn(OPPONENT, policy(self.opponent, self.player))
+        return events
+
+    def snapshot(self):
+        flags = PLAYER_STALLED if self._player_stalled else 0
+        if self.over:
+            flags |= OVER
+            if self.winner is self.player:
+                flags |= PLAYER_WON
+            elif self.winner is self.opponent:
+                flags |= OPPONENT_WON
+        return BattleState.from_fighters(self.player, self.opponent, self.turn, flags)
+
+    def restore(self, state):
+        # Puts the fighters and counters back as they were at snapshot(). The
+        # log and the rng are left alone.
+        state.apply(self.player, self.opponent)
+        flags = state[FLAGS]
+        self.turn = state[TURN]
+        self._player_stalled = bool(flags & PLAYER_STALLED)
+        self.over = bool(flags & OVER)
+        self.winner = self.player if flags & PLAYER_WON else self.opponent if flags & OPPONENT_WON else None
+
+    def _finish(self, events, draw=False):
+        self.over = True
+        if not draw:
+            self.winner = self.player if self.player.hp > 0 else self.opponent
+        events.append(("end", self.winner.name if self.winner else None))
+
+
+def simulate(player, opponent, rng=None, player_policy=choose_best_move, opponent_policy=choose_best_move, max_turns=MAX_TURNS):
+    battle = Battle(player, opponent, rng, max_turns)
+    while not battle.over:
+        battle.take_turn(PLAYER, player_policy(player, opponent))
+        if not battle.over:
+            battle.take_turn(OPPONENT, opponent_policy(opponent, player))
+    return battle
+
+
+# The cache write, if any, waits for the first get_tables()
+load_definitions(write_cache=False)
+
+
+if __name__ == "__main__":
+    import time
+    roster = make_roster()
+    rng = random.Random(0)
+    count = 0
+    start = time.perf_counter()
+    for player in roster:
+        for opponent in make_roster():
+            for _ in range(200):
+                simulate(player, opponent, rng)
+                count += 1
+    elapsed = time.perf_counter() - start
+    print(f"{count} battles in {elapsed:.2f}s ({count / elapsed * 60:,.0f} per minute)")
@@ -0,0 +1,542 @@
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import signal
+import struct
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from battle_engine import (ROSTER, PLAYER, OPPONENT, FLAGS, OVER, SIDE_SIZE, SPECIES, NO_SPECIES, Battle, BattleState,
+                           Fighter, apply_definitions, choose_best_move, make_fighter, species_definitions)
+from cpu_ai import DIFFICULTY_NAMES, CpuPlayer
+from replay import Replay, new_seed, session_path, write_replays
+
+# Headless battle server. Every session is a battle_engine Battle on one
+# asyncio loop, so thousands of them cost a few KB each and no threads.
+# Clients start sessions against the CPU or get matched with another client
+# for PvP, then submit one move per round. Greedy CPU moves are picked inline
+# (microseconds); the search difficulties run on a process pool so a slow
+# search never holds up the other sessions.
+#
+#   python src/battle_server.py --port 7878 --workers 4
+#   python src/battle_server.py --unix /tmp/monsoons.sock --replays
+#
+# Framing: every message is FRAME (kind, body length) followed by the body.
+#
+#   client -> server
+#     NEW    tag u32, species u8, opponent u8, ai u8    opponent is a roster
+#            index, RANDOM, or MATCH to wait for another client (ai ignored)
+#     MOVE   session u32, move index u8
+#     LEAVE  session u32
+#   server -> client
+#     SESSION  tag u32, session u32, side u8, player species u8,
+#              opponent species u8, then the packed BattleState (32 bytes)
+#     TURN     session u32, player move u8, opponent move u8 (NO_MOVE if the
+#              battle ended first), then the packed BattleState
+#     ERROR    ref u32 (the tag for NEW, else the session), kind u8 of the
+#              message it answers, code u8, then a UTF-8 message
+#
+# A round is the player's move then the opponent's, as in Battle. In PvP the
+# round is played once both sides have submitted and both get the TURN. A
+# session ends when its TURN has OVER in the state flags, when a side leaves
+# or disconnects (the other side gets OPPONENT_LEFT), or after
+# SESSION_TIMEOUT seconds without a move.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7878
+SESSION_TIMEOUT = 300.0
+SWEEP_INTERVAL = 5.0
+REPLAY_BATCH = 256
+# Stop reading from a client while this much is waiting to be sent to it
+HIGH_WATER = 64 * 1024
+MAX_BODY = 1024
+
+FRAME = struct.Struct("<BH")
+NEW = struct.Struct("<IBBB")
+MOVE = struct.Struct("<IB")
+LEAVE = struct.Struct("<I")
+SESSION = struct.Struct("<IIBBB")
+TURN = struct.Struct("<IBB")
+ERROR = struct.Struct("<IBB")
+
+# Message kinds
+NEW_KIND, MOVE_KIND, LEAVE_KIND = 1, 2, 3
+SESSION_KIND, TURN_KIND, ERROR_KIND = 0x81, 0x82, 0xFF
+
+RANDOM = 0xFE
+MATCH = 0xFF
+NO_MOVE = 0xFF
+AI_POLICIES = ["greedy"] + DIFFICULTY_NAMES
+
+# Error codes
+BAD_MESSAGE = 1
+NO_SESSION = 2
+BAD_MOVE = 3
+NOT_YOUR_TURN = 4
+OPPONENT_LEFT = 5
+TIMED_OUT = 6
+ERROR_NAMES = {BAD_MESSAGE: "bad message", NO_SESSION: "no session", BAD_MOVE: "bad move",
+               NOT_YOUR_TURN: "not your turn", OPPONENT_LEFT: "opponent left", TIMED_OUT: "timed out"}
+
+
+def frame(kind, body):
+    return FRAME.pack(kind, len(body)) + body
+
+
+async def read_frame(reader):
+    # Returns (kind, body), or raises IncompleteReadError at end of stream
+    kind, length = FRAME.unpack(await reader.readexactly(FRAME.size))
+    if length > MAX_BODY:
+        raise ValueError(f"frame of {length} bytes")
+    return kind, await reader.readexactly(length)
+
+
+# Process pool side of the CPU turns. Each worker keeps a CpuPlayer per
+# difficulty and a fighter pair per matchup, so a session's searches keep
+# hitting the same transposition table from one turn to the next. Workers
+# load the definitions file when they start, which may have changed since
+# the server did, so each search carries its session's own definitions.
+_cpu_players = {}
+_matchups = {}
+
+
+def init_worker():
+    # Ctrl-C goes to the server, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def choose_cpu_move(difficulty, definitions, names, packed_state):
+    # definitions is the session's species_definitions() as JSON and names
+    # its (player, opponent) species. They are only applied when this
+    # worker's own definitions differ.
+    state = BattleState.unpack(packed_state)
+    fighters = _matchups.get((definitions, names))
+    if fighters is None:
+        data = json.loads(definitions)
+        if species_definitions(names) != data:
+            apply_definitions(data, "battle server")
+        fighters = _matchups[definitions, names] = (make_fighter(names[0]), make_fighter(names[1]))
+    player, cpu = fighters
+    # The state's species are the server's interned ids, not this worker's
+    for side, fighter in ((PLAYER, player), (OPPONENT, cpu)):
+        state[side * SIDE_SIZE + SPECIES] = NO_SPECIES if fighter.species_id is None else fighter.species_id
+    state.apply(player, cpu)
+    if difficulty not in _cpu_players:
+        _cpu_players[difficulty] = CpuPlayer(difficulty)
+    return _cpu_players[difficulty].choose_move(cpu, player)
+
+
+class Connection:
+    def __init__(self, writer):
+        self.writer = writer
+        # session id -> side this client plays
+        self.sessions = {}
+        self.closed = False
+
+    def send(self, data):
+        if not self.closed:
+            self.writer.write(data)
+
+    def error(self, ref, kind, code, message=""):
+        self.send(frame(ERROR_KIND, ERROR.pack(ref, kind, code) + (message or ERROR_NAMES[code]).encode()))
+
+
+class Session:
+    __slots__ = ("id", "battle", "seed", "species", "definitions", "ai", "seats", "pending", "busy", "last_move")
+
+    def __init__(self, session_id, species, ai, seats):
+        self.id = session_id
+        self.seed = new_seed()
+        self.species = species
+        self.battle = Battle(Fighter(*ROSTER[species[0]]), Fighter(*ROSTER[species[1]]), random.Random(self.seed))
+        # Policy name of the CPU side, None for PvP
+        self.ai = ai
+        # What the searches build the fighters from, for the search policies
+        self.definitions = None
+        if ai not in (None, "greedy"):
+            names = (self.battle.player.name, self.battle.opponent.name)
+            self.definitions = json.dumps(species_definitions(names), sort_keys=True)
+        # Connection per side, None for the CPU
+        self.seats = seats
+        self.pending = [None, None]
+        # A CPU search for this session is running on the pool
+        self.busy = False
+        self.last_move = time.monotonic()
+
+
+class BattleServer:
+    def __init__(self, workers=None, session_timeout=SESSION_TIMEOUT, replay_path=None):
+        self.workers = workers or os.cpu_count()
+        self.session_timeout = session_timeout
+        self.replay_path = replay_path
+        self.replays = []
+        self.pool = None
+        self.sessions = {}
+        # Connection -> the task handling it
+        self.connections = {}
+        self.ids = itertools.count(1)
+        # (connection, tag, species) waiting for a PvP opponent
+        self.waiting = deque()
+        # Running CPU searches; the loop itself only keeps weak references
+        self.searches = set()
+        self.stats = Counter()
+        self.rng = random.Random()
+
+    def start_pool(self):
+        if self.pool is None:
+            # Not forked: a forked worker would inherit every client socket
+            # open at the time and keep it open after the server closed it
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self.pool = ProcessPoolExecutor(self.workers, multiprocessing.get_context(method), initializer=init_worker)
+        return self.pool
+
+    async def warm_pool(self):
+        # Starts every worker up front so the first searches don't wait for
+        # it. Each call holds its worker for a moment, so the pool starts a
+        # new one for the next.
+        loop = asyncio.get_running_loop()
+        pool = self.start_pool()
+        await asyncio.gather(*(loop.run_in_executor(pool, time.sleep, 0.05) for _ in range(self.workers)))
+
+    async def handle(self, reader, writer):
+        connection = Connection(writer)
+        self.connections[connection] = asyncio.current_task()
+        self.stats["connections"] += 1
+        try:
+            while True:
+                kind, body = await read_frame(reader)
+                self.dispatch(connection, kind, body)
+                if writer.transport.get_write_buffer_size() > HIGH_WATER:
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            del self.connections[connection]
+            self.disconnect(connection)
+            writer.close()
+
+    def dispatch(self, connection, kind, body):
+        try:
+            if kind == NEW_KIND:
+                self.new_session(connection, *NEW.unpack(body))
+            elif kind == MOVE_KIND:
+                self.submit_move(connection, *MOVE.unpack(body))
+            elif kind == LEAVE_KIND:
+                session_id, = LEAVE.unpack(body)
+                if session_id in connection.sessions:
+                    self.close_session(self.sessions[session_id], OPPONENT_LEFT, connection)
+            else:
+                connection.error(0, kind, BAD_MESSAGE, f"unknown message kind {kind}")
+        except struct.error:
+            connection.error(0, kind, BAD_MESSAGE, f"bad length {len(body)} for message kind {kind}")
+
+    def new_session(self, connection, tag, species, opponent, ai):
+        if species >= len(ROSTER) or (opponent >= len(ROSTER) and opponent not in (RANDOM, MATCH)):
+            connection.error(tag, NEW_KIND, BAD_MESSAGE, "no such species")
+            return
+        if opponent == MATCH:
+            self.match(connection, tag, species)
+            return
+        if ai >= len(AI_POLICIES):
+            connection.error(tag, NEW_KIND, BAD_MESSAGE, "no such AI")
+            return
+        if opponent == RANDOM:
+            opponent = self.rng.randrange(len(ROSTER))
+        self.start_session((species, opponent), AI_POLICIES[ai], [(connection, tag), None])
+
+    def match(self, connection, tag, species):
+        # Pairs with the longest waiting client on another connection (both
+        # sides on one connection would make MOVE ambiguous)
+        index = 0
+        while index < len(self.waiting):
+            other, other_tag, other_species = self.waiting[index]
+            if other.closed:
+                del self.waiting[index]
+            elif other is connection:
+                index += 1
+            else:
+                del self.waiting[index]
+                self.start_session((other_species, species), None, [(other, other_tag), (connection, tag)])
+                return
+        self.waiting.append((connection, tag, species))
+
+    def start_session(self, species, ai, seats):
+        session = Session(next(self.ids) & 0xFFFFFFFF, species, ai, [seat and seat[0] for seat in seats])
+        self.sessions[session.id] = session
+        self.stats["sessions"] += 1
+        state = session.battle.snapshot().pack()
+        for side, seat in enumerate(seats):
+            if seat is not None:
+                connection, tag = seat
+                connection.sessions[session.id] = side
+                connection.send(frame(SESSION_KIND, SESSION.pack(tag, session.id, side, *species) + state))
+
+    def submit_move(self, connection, session_id, move_index):
+        side = connection.sessions.get(session_id)
+        if side is None:
+            connection.error(session_id, MOVE_KIND, NO_SESSION)
+            return
+        session = self.sessions[session_id]
+        if session.busy or session.pending[side] is not None:
+            connection.error(session_id, MOVE_KIND, NOT_YOUR_TURN, "move already submitted")
+            return
+        fighter = session.battle.player if side == PLAYER else session.battle.opponent
+        if move_index >= len(fighter.moves):
+            connection.error(session_id, MOVE_KIND, BAD_MOVE, f"{fighter.name} has {len(fighter.moves)} moves")
+            return
+        session.pending[side] = move_index
+        session.last_move = time.monotonic()
+        if session.ai is None:
+            if None not in session.pending:
+                self.play_round(session, *session.pending)
+        elif session.ai == "greedy":
+            self.play_round(session, move_index, None)
+        else:
+            session.busy = True
+            task = asyncio.create_task(self.search_round(session, move_index))
+            self.searches.add(task)
+            task.add_done_callback(self.searches.discard)
+
+    def play_round(self, session, player_move, opponent_move):
+        # opponent_move None has the greedy CPU pick it
+        battle = session.battle
+        battle.take_turn(PLAYER, player_move)
+        if battle.over:
+            opponent_move = NO_MOVE
+        else:
+            if opponent_move is None:
+                opponent_move = choose_best_move(battle.opponent, battle.player)
+            battle.take_turn(OPPONENT, opponent_move)
+        self.end_round(session, player_move, opponent_move)
+
+    async def search_round(self, session, player_move):
+        battle = session.battle
+        try:
+            battle.take_turn(PLAYER, player_move)
+            opponent_move = NO_MOVE
+            if not battle.over:
+                loop = asyncio.get_running_loop()
+                names = (battle.player.name, battle.opponent.name)
+                try:
+                    opponent_move = await loop.run_in_executor(self.start_pool(), choose_cpu_move, session.ai,
+                                                               session.definitions, names, battle.snapshot().pack())
+                except Exception:
+                    # A failed search or a broken pool: keep the session going
+                    # on the greedy pick rather than drop it
+                    self.stats["search errors"] += 1
+                    opponent_move = choose_best_move(battle.opponent, battle.player)
+                if session.id not in self.sessions:
+                    return
+                battle.take_turn(OPPONENT, opponent_move)
+        finally:
+            # Otherwise sweep() would never let the session time out
+            session.busy = False
+        self.end_round(session, player_move, opponent_move)
+
+    def end_round(self, session, player_move, opponent_move):
+        self.stats["turns"] += 1
+        session.pending = [None, None]
+        state = session.battle.snapshot()
+        message = frame(TURN_KIND, TURN.pack(session.id, player_move, opponent_move) + state.pack())
+        for connection in session.seats:
+            if connection is not None:
+                connection.send(message)
+        if state[FLAGS] & OVER:
+            self.stats["finished"] += 1
+            self.close_session(session)
+
+    def close_session(self, session, notify=None, leaving=None):
+        # notify: error code sent to the seated clients other than `leaving`
+        if self.sessions.pop(session.id, None) is None:
+            return
+        for connection in session.seats:
+            if connection is None or connection.sessions.pop(session.id, None) is None:
+                continue
+            if notify and connection is not leaving:
+                connection.error(session.id, MOVE_KIND, notify)
+        if self.replay_path and session.battle.choices:
+            self.replays.append(Replay.from_battle(session.battle, session.seed, *session.species))
+            if len(self.replays) >= REPLAY_BATCH:
+                self.flush_replays()
+
+    def disconnect(self, connection):
+        connection.closed = True
+        for session_id in list(connection.sessions):
+            self.close_session(self.sessions[session_id], OPPONENT_LEFT, connection)
+
+    def flush_replays(self):
+        if self.replays:
+            write_replays(self.replay_path, self.replays)
+            self.replays = []
+
+    async def sweep(self, stats_interval=None):
+        # Drops idle sessions, and prints a status line every stats_interval
+        last_stats = time.monotonic()
+        last_turns = 0
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            now = time.monotonic()
+            for session in [s for s in self.sessions.values() if now - s.last_move > self.session_timeout]:
+                if not session.busy:
+                    self.close_session(session, TIMED_OUT)
+                    self.stats["timed out"] += 1
+            if stats_interval and now - last_stats >= stats_interval:
+                turns = self.stats["turns"]
+                print(f"{len(self.sessions):,} sessions open, {self.stats['finished']:,} finished, "
+                      f"{(turns - last_turns) / (now - last_stats):,.0f} turns/s")
+                last_stats, last_turns = now, turns
+
+    async def close_connections(self):
+        # Closing the sockets ends each handler's read, so they finish
+        # normally instead of being cancelled when the loop stops
+        handlers = list(self.connections.values())
+        for connection in self.connections:
+            connection.writer.close()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    def shutdown(self):
+        self.flush_replays()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+
+async def serve(server, host=DEFAULT_HOST, port=DEFAULT_PORT, unix=None, stats_interval=None):
+    await server.warm_pool()
+    if unix:
+        listener = await asyncio.start_unix_server(server.handle, unix)
+        where = unix
+    else:
+        listener = await asyncio.start_server(server.handle, host, port)
+        where = f"{host}:{port}"
+    print(f"Serving {len(ROSTER)} Monsoons on {where}")
+    sweeper = asyncio.create_task(server.sweep(stats_interval))
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        sweeper.cancel()
+        await server.close_connections()
+
+
+class ServerError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class BattleClient:
+    # One connection to a BattleServer. Any number of sessions can share it;
+    # the replies are matched up by tag and session id.
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.tags = itertools.count(1)
+        self.starting = {}
+        self.turns = {}
+        self.errors = {}
+        self.connected = True
+        self.receiver = asyncio.create_task(self.receive())
+
+    @classmethod
+    async def connect(cls, host=DEFAULT_HOST, port=DEFAULT_PORT, unix=None):
+        if unix:
+            reader, writer = await asyncio.open_unix_connection(unix)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def new_session(self, species, opponent=RANDOM, ai="greedy"):
+        # Returns (session id, side, player species, opponent species, state).
+        # With opponent=MATCH this waits for another client to match with.
+        if not self.connected:
+            raise ConnectionError("not connected to the server")
+        tag = next(self.tags) & 0xFFFFFFFF
+        future = self.starting[tag] = asyncio.get_running_loop().create_future()
+        self.writer.write(frame(NEW_KIND, NEW.pack(tag, species, opponent, AI_POLICIES.index(ai))))
+        return await future
+
+    async def move(self, session_id, move_index):
+        # Returns (player move, opponent move, state) once the round is played
+        if session_id in self.errors:
+            raise self.errors.pop(session_id)
+        if not self.connected:
+            raise ConnectionError("not connected to the server")
+        if session_id in self.turns:
+            raise ServerError(NOT_YOUR_TURN, "move already submitted")
+        future = self.turns[session_id] = asyncio.get_running_loop().create_future()
+        self.writer.write(frame(MOVE_KIND, MOVE.pack(session_id, move_index)))
+        return await future
+
+    def leave(self, session_id):
+        self.writer.write(frame(LEAVE_KIND, LEAVE.pack(session_id)))
+
+    async def receive(self):
+        try:
+            while True:
+                kind, body = await read_frame(self.reader)
+                if kind == SESSION_KIND:
+                    tag, session_id, side, player, opponent = SESSION.unpack_from(body)
+                    future = self.starting.pop(tag, None)
+                    if future is not None and not future.done():
+                        future.set_result((session_id, side, player, opponent,
+                                           BattleState.unpack(body[SESSION.size:])))
+                elif kind == TURN_KIND:
+                    session_id, player_move, opponent_move = TURN.unpack_from(body)
+                    future = self.turns.pop(session_id, None)
+                    if future is not None and not future.done():
+                        future.set_result((player_move, opponent_move, BattleState.unpack(body[TURN.size:])))
+                elif kind == ERROR_KIND:
+                    ref, answers, code = ERROR.unpack_from(body)
+                    error = ServerError(code, body[ERROR.size:].decode(errors="replace"))
+                    future = (self.starting if answers == NEW_KIND else self.turns).pop(ref, None)
+                    if future is not None and not future.done():
+                        future.set_exception(error)
+                    elif answers != NEW_KIND:
+                        # Raised by the session's next move()
+                        self.errors[ref] = error
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.connected = False
+            for future in list(self.starting.values()) + list(self.turns.values()):
+                if not future.done():
+                    future.set_exception(ConnectionError("server closed the connection"))
+
+    async def close(self):
+        self.receiver.cancel()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless battle server for PvP and CPU sessions.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes for the CPU searches")
+    parser.add_argument("--timeout", type=float, default=SESSION_TIMEOUT, help="seconds before an idle session ends")
+    parser.add_argument("--replays", action="store_true", help="save finished battles to replays/")
+    parser.add_argument("--stats", type=float, default=None, metavar="SECONDS", help="print a status line this often")
+    args = parser.parse_args()
+
+    server = BattleServer(args.workers, args.timeout, session_path() if args.replays else None)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix, args.stats))
+    except KeyboardInterrupt:
+        print(f"Stopped after {server.stats['sessions']:,} sessions and {server.stats['turns']:,} turns")
+    finally:
+        server.shutdown()
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import gc
+import time
+from array import array
+
+from battle_engine import (CRIT_CHANCE, CRIT_MULTIPLIER, PARALYSIS_CHANCE, CONFUSION_CHANCE, CONFUSION_DAMAGE,
+                           PARALYZED, CONFUSED, PLAYER, OPPONENT, choose_best_move, calculate_damage,
+                           status_bits)
+
+# Expectiminimax CPU. The CPU maximizes, the other side is assumed to
+# minimize, and crits, paralysis skips and confusion self-hits are chance
+# nodes. The CPU plays the OPPONENT seat unless given `side`; either way the
+# PLAYER seat acts first in a round, like in Battle. Search runs on compact
+# tuple states in seat order:
+#   (player hp, opponent hp, player pp tuple, opponent pp tuple,
+#    player status, opponent status)
+# Iterative deepening stops at the difficulty's depth or when its time budget
+# runs out, and returns the best move of the deepest finished iteration.
+
+# difficulty: (max depth in half turns, time budget in seconds)
+DIFFICULTIES = {
+    "easy": (1, 0.002),
+    "normal": (3, 0.006),
+    "hard": (12, 0.012),
+}
+DIFFICULTY_NAMES = list(DIFFICULTIES)
+
+# Transposition table: flat arrays indexed by the low bits of the state hash,
+# verified against the full 64-bit hash. Entries are overwritten in place and
+# tagged with a generation, so there is nothing for the GC to walk and a new
+# matchup never has to free a big table mid-frame.
+TABLE_BITS = 16
+TABLE_SIZE = 1 << TABLE_BITS
+TABLE_MASK = TABLE_SIZE - 1
+WIN = 1.0
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class MoveInfo:
+    def __init__(self, attacker, move, defender):
+        self.power = move.power
+        self.damage = calculate_damage(attacker, move, defender)
+        self.crit_damage = calculate_damage(attacker, move, defender, CRIT_MULTIPLIER)
+        self.inflicts = move.effect
+
+
+def battle_state(player, opponent):
+    return (player.hp, opponent.hp, tuple(m.pp for m in player.moves), tuple(m.pp for m in opponent.moves),
+            status_bits(player), status_bits(opponent))
+
+
+class CpuPlayer:
+    def __init__(self, difficulty="normal", time_budget=None, side=OPPONENT):
+        # Pass time_budget=math.inf for a fixed-depth, reproducible search
+        self.difficulty = difficulty
+        self.max_depth, self.time_budget = DIFFICULTIES[difficulty]
+        if time_budget is not None:
+            self.time_budget = time_budget
+        self.side = side
+        self.table_keys = array("q", bytes(8 * TABLE_SIZE))
+        self.table_values = array("d", bytes(8 * TABLE_SIZE))
+        self.table_depths = array("h", bytes(2 * TABLE_SIZE))
+        self.table_generations = array("l", bytes(array("l").itemsize * TABLE_SIZE))
+        self.generation = 0
+        self.matchup = None
+        self.nodes = 0
+        self.depth_reached = 0
+
+    def reset(self):
+        # Forgets everything searched so far (bumping the generation retires
+        # every table entry), so the next battle plays out the same whatever
+        # this player searched before it
+        self.generation += 1
+        self.matchup = None
+
+    def __call__(self, cpu, player):
+        return self.choose_move(cpu, player)
+
+    def choose_move(self, cpu, player):
+        # `cpu` is the fighter in this player's seat, `player` the other one
+        deadline = time.perf_counter() + self.time_budget
+        seats = (player, cpu) if self.side == OPPONENT else (cpu, player)
+        if self.matchup != seats:
+            self.matchup = seats
+            self.generation += 1
+            self.moves = (
+                [MoveInfo(seats[PLAYER], m, seats[OPPONENT]) for m in seats[PLAYER].moves],
+                [MoveInfo(seats[OPPONENT], m, seats[PLAYER]) for m in seats[OPPONENT].moves],
+            )
+            self.max_hp = (seats[PLAYER].max_hp, seats[OPPONENT].max_hp)
+
+        state = battle_state(*seats)
+        legal = self.legal_moves(self.side, state)
+        best = choose_best_move(cpu, player)
+        if best not in legal:
+            best = legal[0]
+        if len(legal) == 1:
+            return best
+
+        self.nodes = 0
+        self.depth_reached = 0
+        # The search only makes acyclic tuples, so a collector pass mid-search
+        # would just blow the time budget
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for depth in range(1, self.max_depth + 1):
+                try:
+                    best = self.search_root(state, legal, depth, deadline, best)
+                except SearchTimeout:
+                    break
+                self.depth_reached = depth
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return best
+
+    def search_root(self, state, legal, depth, deadline, previous_best):
+        self.deadline = deadline
+        # Previous best first so ties keep it
+        ordered = [previous_best] + [i for i in legal if i != previous_best]
+        best, best_value = previous_best, None
+        for idx in ordered:
+            value = self.expected(state, self.side, idx, depth)
+            if best_value is None or value > best_value:
+                best, best_value = idx, value
+        return best
+
+    def legal_moves(self, side, state):
+        pp = state[2 + side]
+        legal = [i for i, p in enumerate(pp) if p > 0]
+        return legal or [0]
+
+    def value(self, state, side, depth):
+        key = hash((state, side))
+        slot = key & TABLE_MASK
+        if (self.table_generations[slot] == self.generation and self.table_keys[slot] == key
+                and self.table_depths[slot] >= depth):
+            return self.table_values[slot]
+        if depth == 0:
+            return self.evaluate(state)
+        self.nodes += 1
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        values = [self.expected(state, side, idx, depth) for idx in self.legal_moves(side, state)]
+        result = max(values) if side == self.side else min(values)
+        self.table_generations[slot] = self.generation
+        self.table_keys[slot] = key
+        self.table_depths[slot] = depth
+        self.table_values[slot] = result
+        return result
+
+    def expected(self, state, side, idx, depth):
+        total = 0.0
+        for p, after in self.outcomes(state, side, idx):
+            # Same rules as Battle: the player's action only ends the battle
+            # when the opponent faints, and after the opponent's the player
+            # wins if still standing
+            if side == PLAYER:
+                if after[1] > 0:
+                    total += p * self.value(after, OPPONENT, depth - 1)
+                    continue
+                winner = PLAYER
+            elif after[0] > 0 and after[1] > 0:
+                total += p * self.value(after, PLAYER, depth - 1)
+                continue
+            else:
+                winner = PLAYER if after[0] > 0 else OPPONENT
+            sign = 1 if winner == self.side else -1
+            total += p * sign * (WIN + depth * 0.001)
+        return total
+
+    def outcomes(self, state, side, idx):
+        hp = [state[0], state[1]]
+        pp = [state[2], state[3]]
+        status = [state[4], state[5]]
+        other = 1 - side
+        if pp[side][idx] <= 0:
+            return [(1.0, state)]
+
+        result = []
+        rest = 1.0
+        if status[side] & PARALYZED:
+            result.append((rest * PARALYSIS_CHANCE, state))
+            rest *= 1 - PARALYSIS_CHANCE
+        if status[side] & CONFUSED:
+            hurt = hp[:]
+            hurt[side] = max(0, hurt[side] - CONFUSION_DAMAGE)
+            result.append((rest * CONFUSION_CHANCE, (hurt[0], hurt[1], pp[0], pp[1], status[0], status[1])))
+            rest *= 1 - CONFUSION_CHANCE
+
+        info = self.moves[side][idx]
+        used = list(pp[side])
+        used[idx] -= 1
+        pp[side] = tuple(used)
+        status[other] |= info.inflicts
+        rolls = [(CRIT_CHANCE, info.crit_damage), (1 - CRIT_CHANCE, info.damage)] if info.power > 0 else [(1.0, 0)]
+        for chance, damage in rolls:
+            after = hp[:]
+            if info.power > 0:
+                after[other] = max(0, after[other] - damage)
+            elif info.power < 0:
+                after[side] += min(-info.power, self.max_hp[side] - after[side])
+            result.append((rest * chance, (after[0], after[1], pp[0], pp[1], status[0], status[1])))
+        return result
+
+    def evaluate(self, state):
+        # CPU point of view, kept inside (-1, 1) so it never beats a real win
+        me, them = self.side, 1 - self.side
+        score = state[me] / self.max_hp[me] - state[them] / self.max_hp[them]
+        if state[4 + them] & PARALYZED:
+            score += 0.1
+        if state[4 + them] & CONFUSED:
+            score += 0.1
+        if state[4 + me] & PARALYZED:
+            score -= 0.1
+        if state[4 + me] & CONFUSED:
+            score -= 0.1
+        return score * 0.8
@@ -0,0 +1,160 @@
+import argparse
+import sys
+import time
+from collections import OrderedDict
+
+from battle_engine import (CRIT_CHANCE, CRIT_MULTIPLIER, PARALYSIS_CHANCE, CONFUSION_CHANCE, CONFUSION_DAMAGE,
+                           PARALYZED, CONFUSED, make_roster, choose_best_move, calculate_damage)
+
+# Exact matchup solver. The battle is a Markov chain over
+#   (player hp, opponent hp, player pp, opponent pp, player status, opponent status)
+# taken at the start of each round, so turn order is always "player to move"
+# and never needs to be part of the key. choose_best_move only looks at stats,
+# so each side always picks the same move and only that move's PP matters.
+#
+# A round can come back to the same state (paralysis skips, out of PP). Those
+# self-loops are folded in algebraically: V = (sum of other outcomes) / (1 - p_loop).
+#
+# Rounds are counted the way Battle.turn counts them: a round only counts
+# once the opponent has acted, so a player KO before the opponent's action
+# ends the battle without counting that round.
+
+DEFAULT_MEMO_SIZE = 500_000
+
+
+class Side:
+    def __init__(self, attacker, defender):
+        idx = choose_best_move(attacker, defender)
+        move = attacker.moves[idx]
+        self.move_index = idx
+        self.power = move.power
+        self.damage = calculate_damage(attacker, move, defender)
+        self.crit_damage = calculate_damage(attacker, move, defender, CRIT_MULTIPLIER)
+        self.inflicts = move.effect
+        self.max_hp = attacker.max_hp
+        self.max_pp = move.max_pp
+
+
+class MatchupSolver:
+    def __init__(self, player, opponent, memo_size=DEFAULT_MEMO_SIZE):
+        self.sides = (Side(player, opponent), Side(opponent, player))
+        self.memo = OrderedDict()
+        self.memo_size = memo_size
+        self.evictions = 0
+        self.states_solved = 0
+
+    def start_state(self):
+        a, b = self.sides
+        return (a.max_hp, b.max_hp, a.max_pp, b.max_pp, 0, 0)
+
+    def action_outcomes(self, side, state):
+        # [(probability, next_state, out_of_pp)] for one half turn of `side`.
+        info = self.sides[side]
+        hp = list(state[0:2])
+        pp = list(state[2:4])
+        status = list(state[4:6])
+        other = 1 - side
+        if pp[side] <= 0:
+            return [(1.0, state, True)]
+
+        outcomes = []
+        rest = 1.0
+        if status[side] & PARALYZED:
+            outcomes.append((rest * PARALYSIS_CHANCE, state, False))
+            rest *= 1 - PARALYSIS_CHANCE
+        if status[side] & CONFUSED:
+            hurt = hp[:]
+            hurt[side] = max(0, hurt[side] - CONFUSION_DAMAGE)
+            outcomes.append((rest * CONFUSION_CHANCE, (hurt[0], hurt[1], pp[0], pp[1], status[0], status[1]), False))
+            rest *= 1 - CONFUSION_CHANCE
+
+        pp[side] -= 1
+        status[other] |= info.inflicts
+        if info.power > 0:
+            rolls = [(CRIT_CHANCE, info.crit_damage), (1 - CRIT_CHANCE, info.damage)]
+        else:
+            rolls = [(1.0, 0)]
+        for chance, damage in rolls:
+            after = hp[:]
+            if info.power > 0:
+                after[other] = max(0, after[other] - damage)
+            elif info.power < 0:
+                after[side] += min(-info.power, info.max_hp - after[side])
+            outcomes.append((rest * chance, (after[0], after[1], pp[0], pp[1], status[0], status[1]), False))
+        return outcomes
+
+    def solve(self, state=None):
+        # Returns (player win prob, opponent win prob, expected rounds).
+        if state is None:
+            state = self.start_state()
+        memo = self.memo
+        if state in memo:
+            memo.move_to_end(state)
+            return memo[state]
+
+        win = lose = length = 0.0
+        loop = 0.0
+        # Probability the battle ends before the opponent acts this round
+        early = 0.0
+        for p_a, after_a, stalled_a in self.action_outcomes(0, state):
+            if after_a[1] <= 0:
+                win += p_a
+                early += p_a
+                continue
+            for p_b, after_b, stalled_b in self.action_outcomes(1, after_a):
+                p = p_a * p_b
+                if after_b[0] <= 0 or after_b[1] <= 0:
+                    if after_b[0] > 0:
+                        win += p
+                    else:
+                        lose += p
+                elif stalled_a and stalled_b:
+                    pass
+                elif after_b == state:
+                    loop += p
+                else:
+                    w, l, n = self.solve(after_b)
+                    win += p * w
+                    lose += p * l
+                    length += p * n
+
+        scale = 1.0 / (1.0 - loop)
+        value = (win * scale, lose * scale, (1.0 - early + length) * scale)
+        memo[state] = value
+        self.states_solved += 1
+        if len(memo) > self.memo_size:
+            memo.popitem(last=False)
+            self.evictions += 1
+        return value
+
+
+def solve_matrix(roster=None, memo_size=DEFAULT_MEMO_SIZE):
+    roster = roster or make_roster()
+    results = {}
+    for player in roster:
+        for opponent in roster:
+            solver = MatchupSolver(player, opponent, memo_size)
+            results[player.name, opponent.name] = solver.solve()
+    return [m.name for m in roster], results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exact win probability and expected length for every Monsoon pair.")
+    parser.add_argument("--memo-size", type=int, default=DEFAULT_MEMO_SIZE, help="max memoized states per matchup")
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(20000)
+    start = time.perf_counter()
+    names, results = solve_matrix(memo_size=args.memo_size)
+    elapsed = time.perf_counter() - start
+
+    print("Player win probability / expected rounds (rows = player, columns = opponent)")
+    print(" " * 12 + "".join(f"{name[:12]:>14}" for name in names))
+    for a in names:
+        cells = "".join(f"{results[a, b][0]:.4f}/{results[a, b][2]:.1f}".rjust(14) for b in names)
+        print(f"{a:<12}{cells}")
+    print(f"Solved {len(names) ** 2} matchups in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import csv
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+import pygame
+
+from text_cache import render_text
+
+# Per-frame phase timings for the game loops. Each loop calls begin_frame()
+# once per pass and wraps its work in `with profiler.phase(name)`. Phases can
+# nest (the engine step and AI run inside the animation update) and time is
+# exclusive: a nested phase pauses its parent. Frame time runs from one
+# begin_frame to the next, so it includes the clock's sleep; "work" is the sum
+# of the phases. The last `capacity` frames are kept for the overlay and for
+# export.
+#
+# F3 toggles the overlay, F4 writes the kept samples to profiles/ as CSV and
+# JSON.
+
+PHASES = ["events", "update", "engine", "ai", "draw", "flip"]
+PROFILE_FOLDER = "profiles"
+SAMPLE_CAPACITY = 3600
+OVERLAY_REFRESH = 0.5
+OVERLAY_FONT = (None, 20, False)
+OVERLAY_RECT = pygame.Rect(0, 0, 290, 20 * (len(PHASES) + 3) + 8)
+OVERLAY_KEY = pygame.K_F3
+EXPORT_KEY = pygame.K_F4
+
+
+def percentile(values, p):
+    # Nearest rank on an already sorted list
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+class Phase:
+    __slots__ = ("profiler", "index")
+
+    def __init__(self, profiler, index):
+        self.profiler = profiler
+        self.index = index
+
+    def __enter__(self):
+        self.profiler.push(self.index)
+
+    def __exit__(self, *exc):
+        self.profiler.pop()
+
+
+class FrameProfiler:
+    def __init__(self, capacity=SAMPLE_CAPACITY, clock=time.perf_counter_ns):
+        self.clock = clock
+        # (frame, scene, frame ns, ns per phase...)
+        self.samples = deque(maxlen=capacity)
+        self.phases = {name: Phase(self, i) for i, name in enumerate(PHASES)}
+        self.totals = [0] * len(PHASES)
+        self.stack = []
+        self.mark = 0
+        self.frame = 0
+        self.frame_start = None
+        self.scene = None
+        self.show_overlay = False
+        self.overlay = None
+        self.overlay_time = 0.0
+
+    def begin_frame(self, scene):
+        now = self.clock()
+        if self.frame_start is not None:
+            self.samples.append((self.frame, self.scene, now - self.frame_start, *self.totals))
+            self.frame += 1
+        self.frame_start = now
+        self.scene = scene
+        self.totals = [0] * len(PHASES)
+        self.stack.clear()
+
+    def phase(self, name):
+        return self.phases[name]
+
+    def push(self, index):
+        now = self.clock()
+        if self.stack:
+            self.totals[self.stack[-1]] += now - self.mark
+        self.stack.append(index)
+        self.mark = now
+
+    def pop(self):
+        now = self.clock()
+        self.totals[self.stack.pop()] += now - self.mark
+        self.mark = now
+
+    def summary(self):
+        # {"frame": (p50, p95, p99), "work": ..., phase: ...} in milliseconds
+        columns = {"frame": [s[2] for s in self.samples], "work": [sum(s[3:]) for s in self.samples]}
+        for i, name in enumerate(PHASES):
+            columns[name] = [s[3 + i] for s in self.samples]
+        result = {}
+        for name, values in columns.items():
+            values.sort()
+            result[name] = tuple(percentile(values, p) / 1e6 for p in (50, 95, 99))
+        return result
+
+    def handle_event(self, event):
+        # True if the overlay was switched on or off, so the caller can redraw
+        if event.type != pygame.KEYDOWN:
+            return False
+        if event.key == OVERLAY_KEY:
+            self.show_overlay = not self.show_overlay
+            self.overlay = None
+            return True
+        if event.key == EXPORT_KEY:
+            self.export()
+        return False
+
+    def draw_overlay(self, screen):
+        # Returns the rect drawn, or None when the overlay is off
+        if not self.show_overlay:
+            return None
+        now = time.monotonic()
+        if self.overlay is None or now - self.overlay_time >= OVERLAY_REFRESH:
+            self.overlay = self.render_overlay()
+            self.overlay_time = now
+        screen.blit(self.overlay, OVERLAY_RECT)
+        return OVERLAY_RECT
+
+    def render_overlay(self):
+        surface = pygame.Surface(OVERLAY_RECT.size)
+        surface.fill((20, 20, 20))
+        summary = self.summary()
+        lines = [f"{len(self.samples)} frames   p50 / p95 / p99 ms"]
+        for name in ["frame", "work"] + PHASES:
+            p50, p95, p99 = summary[name]
+            lines.append(f"{name:<8}{p50:7.2f}{p95:7.2f}{p99:7.2f}")
+        for i, line in enumerate(lines):
+            surface.blit(render_text(OVERLAY_FONT, line, (0, 255, 0)), (6, 4 + i * 20))
+        return surface
+
+    def rows(self):
+        for frame, scene, frame_ns, *phase_ns in self.samples:
+            yield [frame, scene, round(frame_ns / 1e6, 4)] + [round(ns / 1e6, 4) for ns in phase_ns]
+
+    def export(self, folder=PROFILE_FOLDER):
+        # Writes frames-<time>.csv and .json, returns their paths
+        os.makedirs(folder, exist_ok=True)
+        base = os.path.join(folder, "frames-" + datetime.now().strftime("%Y%m%d-%H%M%S"))
+        header = ["frame", "scene", "frame_ms"] + [f"{name}_ms" for name in PHASES]
+        rows = list(self.rows())
+        with open(base + ".csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        with open(base + ".json", "w") as f:
+            json.dump({"phases": PHASES, "summary_ms": self.summary(),
+                       "samples": [dict(zip(header, row)) for row in rows]}, f)
+        print(f"Frame profile written to {base}.csv and {base}.json")
+        return base + ".csv", base + ".json"
+
+
+profiler = FrameProfiler()
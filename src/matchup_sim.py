@@ -0,0 +1,225 @@
+import argparse
+import time
+
+import numpy as np
+
+from battle_engine import (MAX_TURNS, MAX_MOVES, CRIT_CHANCE, CRIT_MULTIPLIER, PARALYSIS_CHANCE,
+                           CONFUSION_CHANCE, CONFUSION_DAMAGE, PARALYZED, CONFUSED, make_roster, choose_best_move, calculate_damage)
+
+# Monte Carlo matchup simulator. Every (player, opponent) pair of the roster
+# gets N battles and all of them step together: HP, PP and statuses are
+# arrays with one lane per battle, and each half turn is a handful of masked
+# array operations following Fighter.attack / Battle.take_turn.
+#
+# Both sides use choose_best_move. It only looks at stats and types, so the
+# move each side picks is fixed per pair and can be looked up ahead of time,
+# straight from the NumPy views of the engine's damage tables.
+
+Z_95 = 1.959964
+
+
+def build_pair_tables(roster):
+    # Per pair and side: chosen move slot, power, normal/critical damage and
+    # status effect. Indexed as [side, pair] with pair = a * len(roster) + b.
+    tables = roster[0].tables
+    if tables is not None and all(m.tables is tables for m in roster):
+        return pair_tables_from_arrays(roster, tables)
+    return pair_tables_from_fighters(roster)
+
+
+def pair_tables_from_fighters(roster):
+    # build_pair_tables one pair at a time, for fighters that don't share
+    # the engine's tables
+    count = len(roster)
+    shape = (2, count * count)
+    tables = {
+        "move": np.zeros(shape, np.int64),
+        "power": np.zeros(shape, np.int32),
+        "damage": np.zeros(shape, np.int32),
+        "crit_damage": np.zeros(shape, np.int32),
+        "effect": np.zeros(shape, np.int8),
+        "max_hp": np.zeros(shape, np.int32),
+        "max_pp": np.zeros((2, count * count, MAX_MOVES), np.int16),
+    }
+    for a, player in enumerate(roster):
+        for b, opponent in enumerate(roster):
+            pair = a * count + b
+            for side, (attacker, defender) in enumerate([(player, opponent), (opponent, player)]):
+                idx = choose_best_move(attacker, defender)
+                move = attacker.moves[idx]
+                tables["move"][side, pair] = idx
+                tables["power"][side, pair] = move.power
+                tables["damage"][side, pair] = calculate_damage(attacker, move, defender)
+                tables["crit_damage"][side, pair] = calculate_damage(attacker, move, defender, CRIT_MULTIPLIER)
+                tables["effect"][side, pair] = move.effect
+                tables["max_hp"][side, pair] = attacker.max_hp
+                for slot, m in enumerate(attacker.moves):
+                    tables["max_pp"][side, pair, slot] = m.max_pp
+    return tables
+
+
+def pair_tables_from_arrays(roster, tables):
+    # build_pair_tables for a roster whose fighters all use `tables`: every
+    # pair is read out of the precompiled damage tables at once
+    arrays = tables.arrays()
+    count = len(roster)
+    species = np.array([m.species_id for m in roster])
+    # Move id per (fighter, slot), padded with move 0 and masked out
+    slots = np.zeros((count, MAX_MOVES), np.int64)
+    has_move = np.zeros((count, MAX_MOVES), bool)
+    for i, m in enumerate(roster):
+        slots[i, :len(m.moves)] = [move.id for move in m.moves]
+        has_move[i, :len(m.moves)] = True
+
+    # [attacker, slot, defender]; choose_best_move keeps the first best slot
+    # and damage is never below 1, so argmax over masked damage matches it
+    damage = arrays["damage"][species[:, None, None], slots[:, :, None], species[None, None, :]]
+    crit_damage = arrays["crit_damage"][species[:, None, None], slots[:, :, None], species[None, None, :]]
+    damage = np.where(has_move[:, :, None], damage, 0)
+    chosen = damage.argmax(axis=1)
+    attacker = np.arange(count)[:, None]
+    defender = np.arange(count)[None, :]
+    move_id = slots[attacker, chosen]
+    per_side = {
+        "move": chosen,
+        "power": arrays["move_power"][move_id],
+        "damage": damage[attacker, chosen, defender],
+        "crit_damage": crit_damage[attacker, chosen, defender],
+        "effect": arrays["move_effect"][move_id],
+        "max_hp": np.broadcast_to(arrays["species_hp"][species][:, None], (count, count)),
+    }
+    # Side 0 attacks as a against b, side 1 as b against a
+    result = {name: np.stack([values.ravel(), values.T.ravel()]) for name, values in per_side.items()}
+    max_pp = np.where(has_move, arrays["move_pp"][slots], 0)
+    result["max_pp"] = np.stack([np.repeat(max_pp, count, axis=0), np.tile(max_pp, (count, 1))])
+    return result
+
+
+class LockstepBattles:
+    def __init__(self, tables, pairs, rng, max_turns=MAX_TURNS):
+        self.tables = tables
+        self.pairs = pairs
+        self.rng = rng
+        self.max_turns = max_turns
+        lanes = len(pairs)
+        self.hp = tables["max_hp"][:, pairs].copy()
+        self.pp = tables["max_pp"][:, pairs].copy()
+        self.paralyzed = np.zeros((2, lanes), bool)
+        self.confused = np.zeros((2, lanes), bool)
+        self.turns = np.zeros(lanes, np.int32)
+        # 0 = player won, 1 = opponent won, -1 = draw
+        self.winner = np.full(lanes, -1, np.int8)
+
+    def act(self, side, lanes):
+        # One half turn for `side` in the given lanes; returns the no-PP mask.
+        t = self.tables
+        other = 1 - side
+        pair = self.pairs[lanes]
+        move = t["move"][side, pair]
+        rolls = self.rng.random((3, len(lanes)), dtype=np.float32)
+
+        no_pp = self.pp[side, lanes, move] <= 0
+        skipped = ~no_pp & self.paralyzed[side, lanes] & (rolls[0] < PARALYSIS_CHANCE)
+        hurt = ~no_pp & ~skipped & self.confused[side, lanes] & (rolls[1] < CONFUSION_CHANCE)
+        acts = ~(no_pp | skipped | hurt)
+
+        hurt_lanes = lanes[hurt]
+        self.hp[side, hurt_lanes] = np.maximum(0, self.hp[side, hurt_lanes] - CONFUSION_DAMAGE)
+
+        act_lanes = lanes[acts]
+        pair = pair[acts]
+        self.pp[side, act_lanes, move[acts]] -= 1
+        power = t["power"][side, pair]
+        damage = np.where(rolls[2, acts] < CRIT_CHANCE, t["crit_damage"][side, pair], t["damage"][side, pair])
+        damage = np.where(power > 0, damage, 0)
+        self.hp[other, act_lanes] = np.maximum(0, self.hp[other, act_lanes] - damage)
+        heal = np.where(power < 0, np.minimum(-power, t["max_hp"][side, pair] - self.hp[side, act_lanes]), 0)
+        self.hp[side, act_lanes] += heal
+
+        effect = t["effect"][side, pair]
+        self.confused[other, act_lanes] |= effect == CONFUSED
+        self.paralyzed[other, act_lanes] |= effect == PARALYZED
+        return no_pp
+
+    def run(self):
+        active = np.arange(len(self.pairs))
+        while len(active):
+            player_stalled = self.act(0, active)
+            ko = self.hp[1, active] <= 0
+            self.winner[active[ko]] = 0
+            active = active[~ko]
+            player_stalled = player_stalled[~ko]
+
+            opponent_stalled = self.act(1, active)
+            self.turns[active] += 1
+            player_hp = self.hp[0, active]
+            ended = (player_hp <= 0) | (self.hp[1, active] <= 0)
+            self.winner[active[ended]] = np.where(player_hp[ended] > 0, 0, 1)
+            drawn = ~ended & ((player_stalled & opponent_stalled) | (self.turns[active] >= self.max_turns))
+            active = active[~(ended | drawn)]
+        return self.winner, self.turns
+
+
+def simulate_matrix(n, seed=None, batch=1_000_000, roster=None):
+    roster = roster or make_roster()
+    count = len(roster)
+    tables = build_pair_tables(roster)
+    rng = np.random.default_rng(seed)
+    wins = np.zeros(count * count, np.int64)
+    draws = np.zeros(count * count, np.int64)
+    turns = np.zeros(count * count, np.int64)
+    per_batch = max(1, batch // (count * count))
+    remaining = n
+    while remaining > 0:
+        chunk = min(per_batch, remaining)
+        pairs = np.repeat(np.arange(count * count), chunk)
+        winner, turn_count = LockstepBattles(tables, pairs, rng).run()
+        wins += np.bincount(pairs, weights=winner == 0, minlength=count * count).astype(np.int64)
+        draws += np.bincount(pairs, weights=winner == -1, minlength=count * count).astype(np.int64)
+        turns += np.bincount(pairs, weights=turn_count, minlength=count * count).astype(np.int64)
+        remaining -= chunk
+    shape = (count, count)
+    return {
+        "names": [m.name for m in roster],
+        "n": n,
+        "wins": wins.reshape(shape),
+        "draws": draws.reshape(shape),
+        "avg_turns": (turns / n).reshape(shape),
+    }
+
+
+def wilson_interval(successes, n, z=Z_95):
+    p = successes / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return p, center - half, center + half
+
+
+def print_matrix(result):
+    names = result["names"]
+    rate, low, high = wilson_interval(result["wins"], result["n"])
+    print(f"Player win rate (rows) vs opponent (columns), {result['n']} battles per pair, 95% CI half-width")
+    print(" " * 12 + "".join(f"{name[:12]:>14}" for name in names))
+    for i, name in enumerate(names):
+        cells = "".join(f"{rate[i, j]:.3f}±{(high[i, j] - low[i, j]) / 2:.3f}".rjust(14) for j in range(len(names)))
+        print(f"{name:<12}{cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo win-rate matrix for every Monsoon pair.")
+    parser.add_argument("-n", "--battles", type=int, default=10000, help="battles per pair")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--batch", type=int, default=1_000_000, help="max battles held in memory at once")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = simulate_matrix(args.battles, args.seed, args.batch)
+    elapsed = time.perf_counter() - start
+    print_matrix(result)
+    total = args.battles * len(result["names"]) ** 2
+    print(f"{total:,} battles in {elapsed:.2f}s ({total / elapsed:,.0f} battles/s)")
+
+
+if __name__ == "__main__":
+    main()
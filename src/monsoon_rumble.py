@@ -1,8 +1,21 @@
 import pygame
 import random
-import os
-
-pygame.init()
+import math
+import time
+from battle_engine import MOVES, ROSTER, PLAYER, OPPONENT, Fighter, Battle, reload_definitions
+from cpu_ai import CpuPlayer, DIFFICULTY_NAMES
+from tournament import Scoreboard
+from text_cache import render_text
+from animation import Timeline, Sequence, Parallel, Call, Wait, Tween, Shake
+from sprite_atlas import get_atlas
+from replay import Replay, new_seed, session_path, write_replays
+from frame_profiler import profiler
+from scene_manager import Scene, SceneManager
+from audio import sounds, cries, audio, PRIORITY_MOVE, PRIORITY_FAINT, PRIORITY_CRY
+
+# Nothing is initialized at import: the display opens in main(), the mixer on
+# the first sound and fonts on the first text, so tools can import this module
+# for its data without paying for video, audio or disk I/O.
 
 # Constants
 SCREEN_WIDTH, SCREEN_HEIGHT = 800, 800
@@ -13,14 +26,16 @@ SPRITE_SCALE_FACTOR = 3
 MOVE_PANEL_COLOR = (220, 220, 220)
 TEXT_BOX_COLOR = (240, 240, 240)
 
-# Global dictionaries for sounds
-sounds = {}
-cries = {}
+# Fonts as (name, size, bold) for text_cache
+HP_FONT = (None, 18, False)
+LOG_FONT = (None, 24, False)
+MOVE_FONT = (None, 28, False)
+RESULT_FONT = (None, 48, False)
+TITLE_FONT = ("arial", 64, True)
+BUTTON_FONT = ("arial", 36, False)
+HEADING_FONT = ("arial", 36, True)
 
 # Helper functions
-def wait(time_in_ms):
-    pygame.time.wait(time_in_ms)
-
 def draw_health_bar(screen, monster, x, y):
     width = 200
     height = 20
@@ -36,66 +51,11 @@ def draw_health_bar(screen, monster, x, y):
     health_color = (0, 255, 0) if health_ratio > 0.5 else (255, 255, 0) if health_ratio > 0.2 else (255, 0, 0)
     pygame.draw.rect(screen, health_color, (x, y, health_width, height))
     # Draw text
-    font = pygame.font.SysFont(None, 18)
     health_text = f"{int(monster.display_hp)}/{int(monster.max_hp)}"
-    text_surface = font.render(health_text, True, (0, 0, 0))
+    text_surface = render_text(HP_FONT, health_text, (0, 0, 0))
     text_rect = text_surface.get_rect(center=(x + width//2, y + height//2))
     screen.blit(text_surface, text_rect)
 
-def animate_hp(monster, target_hp):
-    steps = 20
-    current_hp = int(monster.display_hp)
-    target_hp = int(target_hp)
-    delta = (current_hp - target_hp) / steps
-    for _ in range(steps):
-        current_hp = max(target_hp, current_hp - delta)
-        monster.display_hp = current_hp
-        yield
-
-def load_move_sounds():
-    folder = "assets/sounds"
-    if not os.path.exists(folder):
-        print("Warning: sounds folder not found.")
-        return
-    for fname in os.listdir(folder):
-        if fname.endswith(".wav"):
-            name = os.path.splitext(fname)[0].replace("_", " ").title()
-            try:
-                sounds[name] = pygame.mixer.Sound(os.path.join(folder, fname))
-            except:
-                print(f"Failed to load sound: {fname}")
-    for s in sounds.values():
-        s.set_volume(0.3)
-
-def load_cries():
-    folder = "assets/cries"
-    if not os.path.exists(folder):
-        return
-    for fname in os.listdir(folder):
-        if fname.endswith(".wav"):
-            name = os.path.splitext(fname)[0].capitalize()
-            try:
-                cry = pygame.mixer.Sound(os.path.join(folder, fname))
-                cry.set_volume(0.18)
-                cries[name] = cry
-            except:
-                print(f"Failed to load cry: {fname}")
-
-# Load sounds and cries
-load_move_sounds()
-load_cries()
-
-# Types and effectiveness
-TYPES = ["Fire", "Water", "Plant", "Normal", "Wind", "Electric", "Psychic", "Earth"]
-TYPE_EFFECTIVENESS = {t: {op: 1.0 for op in TYPES} for t in TYPES}
-TYPE_EFFECTIVENESS["Fire"].update({"Plant": 2.0, "Normal": 2.0, "Earth": 0.5, "Wind": 0.5})
-TYPE_EFFECTIVENESS["Water"].update({"Fire": 2.0, "Earth": 2.0, "Plant": 0.5, "Electric": 0.5})
-TYPE_EFFECTIVENESS["Plant"].update({"Water": 2.0, "Earth": 2.0, "Fire": 0.5, "Wind": 0.5})
-TYPE_EFFECTIVENESS["Wind"].update({"Fire": 2.0, "Plant": 2.0, "Earth": 0.5})
-TYPE_EFFECTIVENESS["Electric"].update({"Water": 2.0, "Wind": 2.0, "Earth": 0.5})
-TYPE_EFFECTIVENESS["Psychic"].update({"Psychic": 0.5})
-TYPE_EFFECTIVENESS["Earth"].update({"Fire": 2.0, "Electric": 2.0, "Water": 0.5, "Plant": 0.5})
-
 # Type colors
 TYPE_COLORS = {
     "Fire": (255, 80, 80),
@@ -108,49 +68,35 @@ TYPE_COLORS = {
     "Earth": (170, 120, 60)
 }
 
+_placeholders = {}
+
+def placeholder_sprite(name, size, color):
+    # Solid stand-in for missing sprite files, shared by every Monsoon
+    if name not in _placeholders:
+        sprite = pygame.Surface(size)
+        sprite.fill(color)
+        _placeholders[name] = sprite
+    return _placeholders[name]
+
 # Classes
-class Move:
-    def __init__(self, name, type, power, pp):
-        self.name = name
-        self.type = type
-        self.power = power
-        self.max_pp = pp
-        self.pp = pp
-
-class Monsoons:
+class Monsoons(Fighter):
     def __init__(self, name, types, stats, move_names):
-        self.name = name
-        self.types = types
-        self.max_hp = stats["hp"]
-        self.hp = stats["hp"]
+        super().__init__(name, types, stats, move_names)
         self.display_hp = self.hp
-        self.attack_stat = stats["attack"]
-        self.defense = stats["defense"]
-        self.speed = stats.get("speed", 50)
-        self.statuses = []
-        self.moves = []
         self.offset = [0, 0]
-        # Load sprite
-        try:
-            self.sprite = pygame.image.load("assets/monsoon.png").convert_alpha()
-        except:
-            self.sprite = pygame.Surface((64, 64))
-            self.sprite.fill((100, 100, 255))
-        # Load front and back sprites
-        try:
-            front = pygame.image.load(f"assets/sprites/{name.lower()}_front.png").convert_alpha()
-            back = pygame.image.load(f"assets/sprites/{name.lower()}_back.png").convert_alpha()
-        except:
-            front = pygame.Surface((50, 50))
-            front.fill((255, 0, 0))
-            back = pygame.Surface((50, 50))
-            back.fill((0, 0, 255))
-        self.front_sprite = pygame.transform.scale(front, (front.get_width() * SPRITE_SCALE_FACTOR, front.get_height() * SPRITE_SCALE_FACTOR))
-        self.back_sprite = pygame.transform.scale(back, (back.get_width() * SPRITE_SCALE_FACTOR, back.get_height() * SPRITE_SCALE_FACTOR))
-        # Load moves
-        for move_name in move_names:
-            original_move = MOVES[move_name]
-            self.moves.append(Move(original_move.name, original_move.type, original_move.power, original_move.max_pp))
+        self.alpha = 255
+        # Sprites come from the shared atlas, every instance uses the same surfaces
+        atlas = get_atlas()
+        self.sprite = placeholder_sprite("monsoon", (64, 64), (100, 100, 255))
+        self.front_sprite = atlas.get(f"{name.lower()}_front") or placeholder_sprite("front", (50 * SPRITE_SCALE_FACTOR, 50 * SPRITE_SCALE_FACTOR), (255, 0, 0))
+        self.back_sprite = atlas.get(f"{name.lower()}_back") or placeholder_sprite("back", (50 * SPRITE_SCALE_FACTOR, 50 * SPRITE_SCALE_FACTOR), (0, 0, 255))
+        self.button_sprite = atlas.get(f"{name.lower()}_front", "button") or pygame.transform.scale(self.front_sprite, (150, 150))
+
+    def reset(self):
+        super().reset()
+        self.display_hp = self.max_hp
+        self.offset = [0, 0]
+        self.alpha = 255
 
     def draw(self, screen):
         faded_sprite = self.sprite.copy()
@@ -167,399 +113,529 @@ class Monsoons:
         pass
 
     def play_cry(self):
-        if self.name in cries:
-            cries[self.name].play()
-
-    def attack(self, move_index, target):
-        move = self.moves[move_index]
-        if move.pp <= 0:
-            return f"{self.name} tried to use {move.name} but it's out of PP!", None, None, None
-        if "Paralyzed" in self.statuses and random.random() < 0.25:
-            return f"{self.name} is paralyzed and couldn't move!", None, None, None
-        if "Confused" in self.statuses and random.random() < 0.5:
-            self.hp = max(0, self.hp - 10)
-            return f"{self.name} is confused and hurt itself!", None, None, None
-        move.pp -= 1
-        multiplier = 1.0
-        for t in target.types:
-            multiplier *= TYPE_EFFECTIVENESS.get(move.type, {}).get(t, 1.0)
-        is_critical = random.random() < 0.1
-        crit_multiplier = 1.5 if is_critical else 1.0
-
-        if move.power >= 0:
-            damage = max(1, int((move.power + self.attack_stat - target.defense) * multiplier * crit_multiplier))
-        else:
-            damage = 0
-
-        sound_to_play = move.name if move.name in sounds else None
+        audio.play(cries, self.name, PRIORITY_CRY)
+
+def play_event_sounds(events):
+    for event in events:
+        if event[0] == "move":
+            audio.play(sounds, event[2], PRIORITY_MOVE)
+        elif event[0] == "faint":
+            audio.play(sounds, "faint", PRIORITY_FAINT)
+
+# Animation timings in seconds
+SHAKE_TIME = 0.25
+HP_DRAIN_TIME = 0.6
+CRY_DELAY = 1.0
+FADE_TIME = 0.5
+
+def hp_drain(monster):
+    return Tween(HP_DRAIN_TIME, lambda value: setattr(monster, "display_hp", value), lambda: monster.display_hp, lambda: monster.hp)
+
+def intro_sequence(player, opponent):
+    return Sequence(Call(player.play_cry), Wait(CRY_DELAY), Call(opponent.play_cry), Wait(CRY_DELAY))
+
+# Move effects, one particle burst per move by type: count, speed range
+# (px/s), direction and spread in degrees (90 is up, None aims from the
+# attacker at the defender), life range (s), gravity (px/s², negative rises),
+# spawn jitter (px) and where the burst starts ("source" or "target").
+MOVE_EMITTERS = {
+    "Electric": {"count": 1500, "speed": (150, 600), "angle": 90, "spread": 360, "life": (0.15, 0.45),
+                 "gravity": 0, "jitter": 12, "origin": "target"},
+    "Fire": {"count": 2000, "speed": (40, 180), "angle": 90, "spread": 70, "life": (0.4, 1.0),
+             "gravity": -150, "jitter": 30, "origin": "target"},
+    "Plant": {"count": 1200, "speed": (60, 240), "angle": 90, "spread": 160, "life": (0.5, 1.0),
+              "gravity": 260, "jitter": 20, "origin": "target"},
+    "Water": {"count": 2000, "speed": (400, 650), "angle": None, "spread": 20, "life": (0.6, 0.9),
+              "gravity": 300, "jitter": 6, "origin": "source"},
+    "Wind": {"count": 1500, "speed": (450, 750), "angle": None, "spread": 30, "life": (0.5, 0.8),
+             "gravity": 0, "jitter": 10, "origin": "source"},
+    "Psychic": {"count": 1200, "speed": (160, 175), "angle": 0, "spread": 360, "life": (0.6, 0.7),
+                "gravity": 0, "jitter": 0, "origin": "target"},
+    "Earth": {"count": 1500, "speed": (150, 400), "angle": 90, "spread": 100, "life": (0.5, 1.0),
+              "gravity": 900, "jitter": 40, "origin": "target"},
+    "Normal": {"count": 400, "speed": (50, 200), "angle": 90, "spread": 360, "life": (0.2, 0.5),
+               "gravity": 0, "jitter": 10, "origin": "target"},
+}
+# Healing moves sparkle on the user whatever their type
+HEAL_EMITTER = {"count": 800, "speed": (30, 90), "angle": 90, "spread": 40, "life": (0.5, 1.0),
+                "gravity": -60, "jitter": 35, "origin": "source", "color": (120, 230, 120)}
+
+_particles = None
+
+def get_particles():
+    # The particle pool is built on first use, importing this module doesn't
+    # pull in NumPy
+    global _particles
+    if _particles is None:
+        from particles import ParticleSystem
+        _particles = ParticleSystem((0, 0, SCREEN_WIDTH, TEXT_BOX_RECT.top), fade_to=BG_COLOR)
+    return _particles
+
+def sprite_center(battle, side):
+    if side == PLAYER:
+        sprite, pos = battle.player.back_sprite, PLAYER_SPRITE_POS
+    else:
+        sprite, pos = battle.opponent.front_sprite, OPPONENT_SPRITE_POS
+    return pos[0] + sprite.get_width() / 2, pos[1] + sprite.get_height() / 2
 
-        cry_to_play = self.name if self.name in cries else None
+def emit_move_effect(battle, side, events):
+    used = next((event for event in events if event[0] == "move"), None)
+    if used is None:
+        return
+    move = MOVES[used[2]]
+    emitter = HEAL_EMITTER if move.power < 0 else MOVE_EMITTERS.get(move.type, MOVE_EMITTERS["Normal"])
+    source, target = sprite_center(battle, side), sprite_center(battle, 1 - side)
+    angle = emitter["angle"]
+    if angle is None:
+        angle = math.degrees(math.atan2(source[1] - target[1], target[0] - source[0]))
+    get_particles().emit(target if emitter["origin"] == "target" else source, emitter["count"], emitter["speed"],
+                         angle, emitter["spread"], emitter["life"], emitter["gravity"], emitter["jitter"],
+                         emitter.get("color", TYPE_COLORS.get(move.type, (200, 200, 200))))
+
+def attack_sequence(battle, side, move_idx):
+    with profiler.phase("engine"):
+        events = battle.take_turn(side, move_idx)
+    play_event_sounds(events)
+    emit_move_effect(battle, side, events)
+    defender = battle.opponent if side == PLAYER else battle.player
+    return Sequence(Shake(defender.offset, SHAKE_TIME), Parallel(hp_drain(battle.player), hp_drain(battle.opponent)))
+
+def faint_fade(battle):
+    if battle.winner is None:
+        return None
+    loser = battle.opponent if battle.winner is battle.player else battle.player
+    return Tween(FADE_TIME, lambda value: setattr(loser, "alpha", int(value)), 255, 0)
+
+def turn_sequence(battle, cpu, move_idx, ui):
+    player, opponent = battle.player, battle.opponent
+
+    def opponent_turn():
+        if battle.over:
+            return None
+        # Move buttons are hidden while the CPU attacks
+        ui["show_moves"] = False
+        with profiler.phase("ai"):
+            move = cpu.choose_move(opponent, player)
+        return Sequence(Call(attack_sequence, battle, OPPONENT, move),
+                        Call(ui.__setitem__, "show_moves", True))
+
+    def battle_end():
+        return faint_fade(battle) if battle.over else None
+
+    return Sequence(Call(attack_sequence, battle, PLAYER, move_idx), Call(opponent_turn), Call(battle_end))
+
+# Battle screen layout
+OPPONENT_SPRITE_POS = (500, 80)
+OPPONENT_HP_POS = (500, 60)
+PLAYER_SPRITE_POS = (100, 250)
+PLAYER_HP_POS = (100, 230)
+TEXT_BOX_RECT = pygame.Rect(50, 460, 700, 60)
+MOVE_PANEL_RECT = pygame.Rect(50, 520, 700, 140)
+HEALTH_BAR_SIZE = (204, 24)
+
+def faded(mon, sprite):
+    alpha = getattr(mon, "alpha", 255)
+    if alpha >= 255:
+        return sprite
+    sprite = sprite.copy()
+    sprite.set_alpha(alpha)
+    return sprite
+
+def draw_battle_background(screen):
+    screen.fill(BG_COLOR)
+    pygame.draw.rect(screen, TEXT_BOX_COLOR, TEXT_BOX_RECT)
+    pygame.draw.rect(screen, MOVE_PANEL_COLOR, MOVE_PANEL_RECT)
 
-        faint_sound = "faint" if target.hp - damage <= 0 and "faint" in sounds else None
+def draw_battle_log(screen, battle_log):
+    if battle_log:
+        lines = battle_log[-2:]  
+        for i, line in enumerate(lines):
+            text = render_text(LOG_FONT, line, (0, 0, 0))
+            screen.blit(text, (60, 465 + i * 20))  
 
-        log = self.use_move(move, target, damage, is_critical, multiplier, sounds)
+def move_button_label(player, idx):
+    move = player.moves[idx]
+    color = TYPE_COLORS.get(move.type, (200, 200, 200)) if player.hp > 0 else (180, 180, 180)
+    return f"{move.name} ({move.pp}/{move.max_pp})", color
 
-        return log, sound_to_play, cry_to_play, faint_sound
-    
-    def use_move(self, move, target, damage, is_critical, multiplier, sounds):
-        log = f"{self.name} used {move.name}!"
-
-        if move.power > 0:
-            target.hp = max(0, target.hp - damage)
-            log += f" It dealt {damage} damage."
-        elif move.power < 0:
-            heal_amount = min(abs(move.power), self.max_hp - self.hp)
-            self.hp += heal_amount
-            log += f" {self.name} recovered for {heal_amount} HP."
-
-        if is_critical:
-            log += " A critical hit!"
-        if multiplier > 1:
-            log += " It's super effective!"
-        elif multiplier < 1:
-            log += " It's not very effective."
-
-        if move.name == "Confuse Ray" and "Confused" not in target.statuses:
-            target.statuses.append("Confused")
-            log += f" {target.name} became confused!"
-        elif move.name == "Thunder Wave" and "Paralyzed" not in target.statuses:
-            target.statuses.append("Paralyzed")
-            log += f" {target.name} is paralyzed!"
-
-        if target.hp <= 0:
-            if "faint" in sounds:
-                sounds["faint"].play()
-            log += f" {target.name} fainted!"
-
-        return log
-
-def choose_best_move(opponent, player):
-    best_move_idx = 0
-    max_damage = 0
-    for i, move in enumerate(opponent.moves):
-        damage = calculate_damage(opponent, move, player)
-        if damage > max_damage:
-            max_damage = damage
-            best_move_idx = i
-    return best_move_idx
-
-def calculate_damage(attacker, move, defender):
-    multiplier = 1.0
-    for t in defender.types:
-        multiplier *= TYPE_EFFECTIVENESS.get(move.type, {}).get(t, 1.0)
-    damage = max(1, int((move.power + attacker.attack_stat - defender.defense) * multiplier))
-    return damage
-
-def show_main_menu(screen):
-    font_title = pygame.font.SysFont("arial", 64, bold=True)
-    font_button = pygame.font.SysFont("arial", 36)
-    title_text = font_title.render("Monsoon Rumble", True, (50, 50, 150))
-    title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, 150))
-    button_rect = pygame.Rect(SCREEN_WIDTH // 2 - 150, 300, 300, 60)
-    waiting = True
-    while waiting:
-        screen.fill((30, 30, 30))
-        screen.blit(title_text, title_rect)
-        mouse_pos = pygame.mouse.get_pos()
-        if button_rect.collidepoint(mouse_pos):
-            pygame.draw.rect(screen, (70, 130, 180), button_rect)
-        else:
-            pygame.draw.rect(screen, (100, 100, 200), button_rect)
-        button_text = font_button.render("Start Battle", True, (255, 255, 255))
-        btn_rect = button_text.get_rect(center=button_rect.center)
-        screen.blit(button_text, btn_rect)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if button_rect.collidepoint(event.pos):
-                    waiting = False
-        pygame.display.flip()
-        pygame.time.Clock().tick(60)
-
-def animate_hp(monster, target_hp):
-    steps = 20
-    delta = (monster.display_hp - target_hp) / steps
-    for _ in range(steps):
-        monster.display_hp = max(target_hp, monster.display_hp - delta)
-        yield
-
-def play_battle_animation(screen, attacker, defender, battle_log, move_buttons):
-    for _ in range(5):
-        defender.offset = [random.randint(-5, 5), random.randint(-5, 5)]
-        draw_battle_ui(screen, attacker, defender, battle_log, move_buttons)
-        pygame.display.flip()
-        pygame.time.wait(50)
-    defender.offset = [0, 0]
+def draw_move_button(screen, player, rect, idx):
+    move_text, color = move_button_label(player, idx)
+    pygame.draw.rect(screen, color, rect)
+    text = render_text(MOVE_FONT, move_text, (0, 0, 0))
+    screen.blit(text, (rect.x + 10, rect.y + 5))
 
 def draw_battle_ui(screen, player, opponent, battle_log, move_buttons):
-    screen.fill(BG_COLOR)
+    draw_battle_background(screen)
 
     # Opponents sprite
-    screen.blit(opponent.front_sprite, (500 + opponent.offset[0], 80 + opponent.offset[1]))
-    draw_health_bar(screen, opponent, 500, 60)
+    screen.blit(faded(opponent, opponent.front_sprite), (OPPONENT_SPRITE_POS[0] + opponent.offset[0], OPPONENT_SPRITE_POS[1] + opponent.offset[1]))
+    draw_health_bar(screen, opponent, *OPPONENT_HP_POS)
 
     # Players sprite
-    screen.blit(player.back_sprite, (100 + player.offset[0], 250 + player.offset[1]))
-    draw_health_bar(screen, player, 100, 230)
+    screen.blit(faded(player, player.back_sprite), (PLAYER_SPRITE_POS[0] + player.offset[0], PLAYER_SPRITE_POS[1] + player.offset[1]))
+    draw_health_bar(screen, player, *PLAYER_HP_POS)
 
     # Draw text box
-    pygame.draw.rect(screen, TEXT_BOX_COLOR, (50, 460, 700, 60)) 
-    font = pygame.font.SysFont(None, 24)
-    if battle_log:
-        lines = battle_log[-2:]  
-        for i, line in enumerate(lines):
-            text = font.render(line, True, (0, 0, 0))
-            screen.blit(text, (60, 465 + i * 20))  
+    draw_battle_log(screen, battle_log)
 
     # Draw move panel
-    pygame.draw.rect(screen, MOVE_PANEL_COLOR, (50, 520, 700, 140)) 
-    font = pygame.font.SysFont(None, 28)
     for rect, idx in move_buttons:
-        move = player.moves[idx]
-        color = TYPE_COLORS.get(move.type, (200, 200, 200)) if player.hp > 0 else (180, 180, 180)
-        pygame.draw.rect(screen, color, rect)
-        move_text = f"{move.name} ({move.pp}/{move.max_pp})"
-        text = font.render(move_text, True, (0, 0, 0))
-        screen.blit(text, (rect.x + 10, rect.y + 5))
-
-wins = 0
-losses = 0
-
-MOVES = {
-    "Tackle": Move("Tackle", "Normal", 40, 35),
-    "Ember": Move("Ember", "Fire", 50, 25),
-    "Water Gun": Move("Water Gun", "Water", 40, 25),
-    "Gust": Move("Gust", "Wind", 40, 25),
-    "Vine Whip": Move("Vine Whip", "Plant", 45, 25),
-    "Confuse Ray": Move("Confuse Ray", "Psychic", 40, 20),
-    "Shock": Move("Shock", "Electric", 45, 25),
-    "Quake": Move("Quake", "Earth", 50, 20),
-    "Thunder Wave": Move("Thunder Wave", "Electric", 0, 25),
-    "Recover": Move("Recover", "Normal", -40, 5),
-    "Heal Pulse": Move("Heal Pulse", "Psychic", -30, 5),
-}
-
-
-
-def show_restart_button(screen, result_text):
-    font_button = pygame.font.SysFont("arial", 36)
-    restart_button_rect = pygame.Rect(SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT // 2 + 100, 300, 60)
-    restart_button_text = font_button.render("Restart", True, (255, 255, 255))
+        draw_move_button(screen, player, rect, idx)
+
+def battle_move_buttons(player):
+    move_buttons = []
+    for i, move in enumerate(player.moves):
+        x = 70 + (i % 2) * 350
+        y = 550 + (i // 2) * 60
+        move_buttons.append((pygame.Rect(x, y, 300, 30), i))
+    return move_buttons
+
+class BattleRenderer:
+    # Retained-mode version of draw_battle_ui. The static background is a
+    # cached layer; every frame each element reports (rect, key) and only
+    # elements whose key changed are redrawn, clipped to their old and new
+    # rects, and pushed with display.update(rects). An unchanged frame costs
+    # a few tuple compares and no blits.
+    def __init__(self, screen):
+        self.screen = screen
+        self.background = pygame.Surface(screen.get_size()).convert()
+        draw_battle_background(self.background)
+        self.elements = {}
+        self.full_redraw = True
+
+    def invalidate(self):
+        self.full_redraw = True
+
+    def collect(self, player, opponent, battle_log, move_buttons, effects=None):
+        elements = {}
+        for name, mon, sprite, pos, hp_pos in [("opponent", opponent, opponent.front_sprite, OPPONENT_SPRITE_POS, OPPONENT_HP_POS),
+                                                ("player", player, player.back_sprite, PLAYER_SPRITE_POS, PLAYER_HP_POS)]:
+            offset = (mon.offset[0], mon.offset[1])
+            rect = sprite.get_rect(topleft=(pos[0] + offset[0], pos[1] + offset[1]))
+            elements[name + "_sprite"] = (rect, (id(sprite), offset, getattr(mon, "alpha", 255)))
+            hp_rect = pygame.Rect(hp_pos[0] - 2, hp_pos[1] - 2, *HEALTH_BAR_SIZE)
+            elements[name + "_hp"] = (hp_rect, (int(mon.display_hp), int(200 * mon.display_hp / mon.max_hp), mon.max_hp))
+        elements["log"] = (TEXT_BOX_RECT, tuple(battle_log[-2:]))
+        for rect, idx in move_buttons:
+            elements["move", idx] = (pygame.Rect(rect), (idx, move_button_label(player, idx)))
+        if effects is not None and effects.active:
+            # Particles move every update, so their area is dirty every frame
+            elements["effects"] = (effects.bounds(), effects.frame)
+        return elements
+
+    def draw(self, player, opponent, battle_log, move_buttons, update=True, effects=None):
+        # effects is a ParticleSystem drawn on top of everything else
+        elements = self.collect(player, opponent, battle_log, move_buttons, effects)
+        if self.full_redraw:
+            dirty = [self.screen.get_rect()]
+            self.full_redraw = False
+        else:
+            dirty = []
+            for name, (rect, key) in elements.items():
+                old = self.elements.get(name)
+                if old is None:
+                    dirty.append(rect)
+                elif old[1] != key or old[0] != rect:
+                    dirty.append(old[0].union(rect))
+            for name, (rect, key) in self.elements.items():
+                if name not in elements:
+                    dirty.append(rect)
+        self.elements = elements
+        if not dirty:
+            return []
+
+        screen = self.screen
+        for area in dirty:
+            screen.set_clip(area)
+            screen.blit(self.background, area, area)
+            screen.blit(faded(opponent, opponent.front_sprite), elements["opponent_sprite"][0])
+            draw_health_bar(screen, opponent, *OPPONENT_HP_POS)
+            screen.blit(faded(player, player.back_sprite), elements["player_sprite"][0])
+            draw_health_bar(screen, player, *PLAYER_HP_POS)
+            if area.colliderect(TEXT_BOX_RECT):
+                draw_battle_log(screen, battle_log)
+            for rect, idx in move_buttons:
+                if area.colliderect(rect):
+                    draw_move_button(screen, player, rect, idx)
+        screen.set_clip(None)
+        if "effects" in elements:
+            effects.draw(screen)
+        if update:
+            pygame.display.update(dirty)
+        return dirty
+
+
+# Screens, run by one SceneManager. Text that never changes is rendered when a
+# scene is built, and the menu screens only redraw when the hover state or a
+# setting changes.
+
+BUTTON_COLOR = (100, 100, 200)
+BUTTON_HOVER_COLOR = (70, 130, 180)
+MENU_BG_COLOR = (30, 30, 30)
+# How often the menu screens look for an edited definitions file, in seconds
+RELOAD_INTERVAL = 1.0
+
+class Game:
+    # What the scenes share for the whole session
+    def __init__(self, screen):
+        self.screen = screen
+        self.all_monsoons = [Monsoons(*species) for species in ROSTER]
+        self.player = None
+        self.cpu = None
+        self.scoreboard = Scoreboard()
+        self.renderer = BattleRenderer(screen)
+        # Every finished battle is appended to this session's replay file
+        self.replay_path = session_path()
+        self.next_reload_check = 0.0
+
+    def reload_definitions(self):
+        # True when data/monsoons.json changed on disk and the roster was
+        # rebuilt from it. Only the menu screens call this, so a battle keeps
+        # the definitions it started with.
+        now = time.monotonic()
+        if now < self.next_reload_check:
+            return False
+        self.next_reload_check = now + RELOAD_INTERVAL
+        try:
+            changed = reload_definitions()
+        except (OSError, ValueError) as e:
+            print(f"Warning: definitions not reloaded: {e}")
+            return False
+        if changed is False:
+            return False
+        move_names, species_names = changed
+        if move_names is None:
+            print("Reloaded definitions: type chart changed")
+        else:
+            print(f"Reloaded definitions: {', '.join(sorted(move_names | species_names)) or 'no changes'}")
+        self.all_monsoons = [Monsoons(*species) for species in ROSTER]
+        if self.player is not None:
+            self.player = next((m for m in self.all_monsoons if m.name == self.player.name), None)
+        return True
+
+def draw_button(screen, rect, label, hovered):
+    pygame.draw.rect(screen, BUTTON_HOVER_COLOR if hovered else BUTTON_COLOR, rect)
+    screen.blit(label, label.get_rect(center=rect.center))
+
+class HoverScene(Scene):
+    # Screen of buttons that only redraws when the hovered button changes
+    def __init__(self, game):
+        super().__init__()
+        self.game = game
+        self.button_rects = []
+        self.hovered = None
+
+    def enter(self, manager):
+        super().enter(manager)
+        self.hovered = self.button_at(pygame.mouse.get_pos())
+
+    def button_at(self, pos):
+        for i, rect in enumerate(self.button_rects):
+            if rect.collidepoint(pos):
+                return i
+        return None
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEMOTION:
+            hovered = self.button_at(event.pos)
+            if hovered != self.hovered:
+                self.hovered = hovered
+                self.dirty = True
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            clicked = self.button_at(event.pos)
+            if clicked is not None:
+                self.click(clicked)
+
+    def click(self, index):
+        pass
 
-    while True:
-        screen.fill((30, 30, 30))
-        # Display result
-        font_result = pygame.font.SysFont(None, 48)
-        result_surface = font_result.render(result_text, True, (255, 0, 0))
-        result_rect = result_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-        screen.blit(result_surface, result_rect)
+    def update(self, dt):
+        if self.game.reload_definitions():
+            self.definitions_changed()
 
-        # Draw the Restart button
-        mouse_pos = pygame.mouse.get_pos()
-        if restart_button_rect.collidepoint(mouse_pos):
-            pygame.draw.rect(screen, (70, 130, 180), restart_button_rect)
-        else:
-            pygame.draw.rect(screen, (100, 100, 200), restart_button_rect)
-        btn_rect = restart_button_text.get_rect(center=restart_button_rect.center)
-        screen.blit(restart_button_text, btn_rect)
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if restart_button_rect.collidepoint(event.pos):
-                    return True 
-
-        pygame.display.flip()
-        pygame.time.Clock().tick(FPS)
-
-
-
-def show_monsoon_selection_screen(screen, all_monsoons):
-    font = pygame.font.SysFont("arial", 36, bold=True)
-    button_width = 150
-    button_height = 150 
-    buttons = []
-    button_rects = []
-
-    for i, monsoon in enumerate(all_monsoons):
-        # Scale the sprite for the button
-        sprite = monsoon.front_sprite
-        sprite = pygame.transform.scale(sprite, (button_width, button_height))
-
-        # Create clickable area based on the sprite's position
-        button_rect = pygame.Rect(150 + (i % 3) * (button_width + 50), 100 + (i // 3) * (button_height + 50), button_width, button_height)
-        buttons.append(sprite)
-        button_rects.append(button_rect)
-
-    selected_monsoon = None
-    waiting = True
-    while waiting:
-        screen.fill((30, 30, 30))
-
-        # Draw each sprite as a button
-        for i, button_rect in enumerate(button_rects):
-            screen.blit(buttons[i], button_rect.topleft) 
-
-        # Display instructions
-        instructions_text = font.render("Click a sprite to select your Monsoon!", True, (255, 255, 255))
-        instructions_rect = instructions_text.get_rect(center=(SCREEN_WIDTH // 2, 50))
-        screen.blit(instructions_text, instructions_rect)
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = pygame.mouse.get_pos()
-                for i, button_rect in enumerate(button_rects):
-                    if button_rect.collidepoint(mouse_pos):
-                        selected_monsoon = all_monsoons[i]
-                        waiting = False 
-
-        pygame.display.flip()
-        pygame.time.Clock().tick(FPS)
-
-    return selected_monsoon 
+    def definitions_changed(self):
+        self.dirty = True
 
+class SelectionScene(HoverScene):
+    name = "selection"
 
-def main():
+    def __init__(self, game):
+        super().__init__(game)
+        button_width = 150
+        button_height = 150
+        for i, monsoon in enumerate(game.all_monsoons):
+            self.button_rects.append(pygame.Rect(150 + (i % 3) * (button_width + 50), 100 + (i // 3) * (button_height + 50),
+                                                 button_width, button_height))
+        self.instructions = render_text(HEADING_FONT, "Click a sprite to select your Monsoon!", (255, 255, 255))
 
-    global wins, losses
+    def click(self, index):
+        self.game.player = self.game.all_monsoons[index]
+        print(f"Selected Monsoon: {self.game.player.name}")
+        self.manager.replace(MenuScene(self.game))
 
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    pygame.display.set_caption("Monsoon Rumble")
-    clock = pygame.time.Clock()
-
-    all_monsoons = [
-
-        Monsoons("Voltail", ["Electric"], {"hp": 80, "attack": 130, "defense": 60, "speed": 200}, ["Shock", "Tackle", "Recover"]),
-        Monsoons("Burnrat", ["Fire"], {"hp": 150, "attack": 75, "defense": 75, "speed": 100}, ["Ember", "Tackle", "Recover"]),
-        Monsoons("Thyladon", ["Plant"], {"hp": 120, "attack": 120, "defense": 80, "speed": 95}, ["Vine Whip", "Tackle", "Recover"]),
-        Monsoons("Pseye", ["Psychic"], {"hp": 90, "attack": 115, "defense": 70, "speed": 150}, ["Confuse Ray", "Tackle", "Heal Pulse"]),
-        Monsoons("Flydo", ["Wind"], {"hp": 130, "attack": 60, "defense": 95, "speed": 155}, ["Gust", "Tackle", "Recover"]),
-        Monsoons("Drillizard", ["Earth"], {"hp": 150, "attack": 130, "defense": 650, "speed": 45}, ["Quake", "Tackle", "Heal Pulse"]),
-        Monsoons("Clawdon", ["Normal"], {"hp": 170, "attack": 90, "defense": 80, "speed": 120}, ["Tackle", "Ember", "Recover"]),
-        Monsoons("Baitinphish", ["Water"], {"hp": 350, "attack": 50, "defense": 100, "speed": 30}, ["Water Gun", "Tackle", "Recover"]),
-        Monsoons("Cataboo", ["Psychic"], {"hp": 120, "attack": 140, "defense": 50, "speed": 110}, ["Confuse Ray", "Gust", "Heal Pulse"]),
-    ]
-
-    selected_monsoon = show_monsoon_selection_screen(screen, all_monsoons)
-    if selected_monsoon:
-        print(f"Selected Monsoon: {selected_monsoon.name}")
-    else:
-        print("No Monsoon selected.")
-        return
-   
-    # Show main menu
-    show_main_menu(screen)
+    def definitions_changed(self):
+        # The roster may have grown or shrunk, so lay the buttons out again
+        self.manager.replace(SelectionScene(self.game))
 
-    # Main game loop
-    while True:
-        player = selected_monsoon 
-        opponent = random.choice([m for m in all_monsoons if m != player])
+    def draw(self, screen):
+        screen.fill(MENU_BG_COLOR)
+        # Pre-scaled button sprites from the atlas
+        for monsoon, rect in zip(self.game.all_monsoons, self.button_rects):
+            screen.blit(monsoon.button_sprite, rect.topleft)
+        screen.blit(self.instructions, self.instructions.get_rect(center=(SCREEN_WIDTH // 2, 50)))
+        return [screen.get_rect()]
+
+class MenuScene(HoverScene):
+    name = "menu"
+
+    def __init__(self, game, difficulty="normal"):
+        super().__init__(game)
+        self.difficulty = difficulty
+        self.title = render_text(TITLE_FONT, "Monsoon Rumble", (50, 50, 150))
+        self.button_rects = [pygame.Rect(SCREEN_WIDTH // 2 - 150, 300, 300, 60),
+                             pygame.Rect(SCREEN_WIDTH // 2 - 150, 380, 300, 60)]
+        self.start_label = render_text(BUTTON_FONT, "Start Battle", (255, 255, 255))
+
+    def click(self, index):
+        if index == 0:
+            self.game.cpu = CpuPlayer(self.difficulty)
+            self.manager.replace(BattleScene(self.game))
+        else:
+            # Cycle through the CPU difficulty levels
+            i = DIFFICULTY_NAMES.index(self.difficulty)
+            self.difficulty = DIFFICULTY_NAMES[(i + 1) % len(DIFFICULTY_NAMES)]
+            self.dirty = True
+
+    def definitions_changed(self):
+        if self.game.player is None:
+            # The selected Monsoon was removed
+            self.manager.replace(SelectionScene(self.game))
+        else:
+            self.dirty = True
 
-        for mon in [player, opponent]:
-            mon.hp = mon.max_hp
-            mon.display_hp = mon.max_hp
-            mon.offset = [0, 0]
-            for move in mon.moves:
-                move.pp = move.max_pp
-
-        battle_log = ["Battle Start!"]
-        player.play_cry()
-        pygame.time.wait(1000)
-        opponent.play_cry()
-        pygame.time.wait(1000)
-
-        # Battle loop
-        while player.hp > 0 and opponent.hp > 0:
-            move_buttons = []
-            for i, move in enumerate(player.moves):
-                x = 70 + (i % 2) * 350
-                y = 550 + (i // 2) * 60
-                move_buttons.append((pygame.Rect(x, y, 300, 30), i))
-            selected_move = None
-
-            # Waits for player move
-            while selected_move is None:
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        return
-                    if event.type == pygame.MOUSEBUTTONDOWN:
-                        for rect, idx in move_buttons:
-                            if rect.collidepoint(event.pos) and player.moves[idx].pp > 0:
-                                selected_move = idx
-
-                draw_battle_ui(screen, player, opponent, battle_log, move_buttons)
-                pygame.display.flip()
-                clock.tick(FPS)
-
-            # Player attack
-            log, sound_name, cry_name, faint_sound = player.attack(selected_move, opponent)
-            battle_log.append(log)
-            # Play sound
-            if sound_name:
-                sounds[sound_name].play()
-            # Animates attack
-            play_battle_animation(screen, player, opponent, battle_log, move_buttons)
-
-            # Animates HP bar
-            if opponent.hp < opponent.display_hp:
-                for _ in animate_hp(opponent, opponent.hp):
-                    draw_battle_ui(screen, player, opponent, battle_log, move_buttons)
-                    pygame.display.flip()
-                    pygame.time.wait(30)
-
-            # Check if opponent fainted
-            if opponent.hp <= 0:
-                break
-
-            # Opponent move
-            opp_move_idx = choose_best_move(opponent, player)
-            log, sound_name, cry_name, faint_sound = opponent.attack(opp_move_idx, player)
-            battle_log.append(log)
-            if sound_name:
-                sounds[sound_name].play()
-            play_battle_animation(screen, opponent, player, battle_log, [])
-
-            # Animates HP bar
-            if player.hp < player.display_hp:
-                for _ in animate_hp(player, player.hp):
-                    draw_battle_ui(screen, player, opponent, battle_log, move_buttons)
-                    pygame.display.flip()
-                    pygame.time.wait(30)
-
-            if player.hp <= 0:
-                break
-
-        # Show result
+    def draw(self, screen):
+        screen.fill(MENU_BG_COLOR)
+        screen.blit(self.title, self.title.get_rect(center=(SCREEN_WIDTH // 2, 150)))
+        difficulty_label = render_text(BUTTON_FONT, f"CPU: {self.difficulty.title()}", (255, 255, 255))
+        for i, (rect, label) in enumerate(zip(self.button_rects, [self.start_label, difficulty_label])):
+            draw_button(screen, rect, label, i == self.hovered)
+        return [screen.get_rect()]
+
+class BattleScene(Scene):
+    name = "battle"
+
+    def __init__(self, game):
+        super().__init__()
+        self.game = game
+        player = game.player
+        self.opponent = random.choice([m for m in game.all_monsoons if m != player])
+        self.seed = new_seed()
+        self.battle = Battle(player, self.opponent, random.Random(self.seed))
+        self.move_buttons = battle_move_buttons(player)
+        self.ui = {"show_moves": True}
+        self.timeline = Timeline()
+        self.timeline.play(intro_sequence(player, self.opponent))
+        self.particles = get_particles()
+        self.particles.clear()
+
+    @property
+    def animating(self):
+        return self.timeline.active or self.particles.active
+
+    def invalidate(self):
+        super().invalidate()
+        self.game.renderer.invalidate()
+
+    def enter(self, manager):
+        super().enter(manager)
+        self.game.renderer.invalidate()
+
+    def handle_event(self, event):
+        battle = self.battle
+        if event.type == pygame.MOUSEBUTTONDOWN and not self.timeline.active and not battle.over:
+            for rect, idx in self.move_buttons:
+                if rect.collidepoint(event.pos) and battle.player.moves[idx].pp > 0:
+                    self.timeline.play(turn_sequence(battle, self.game.cpu, idx, self.ui))
+                    break
+
+    def update(self, dt):
+        self.timeline.update(dt)
+        self.particles.update(dt)
+        audio.end_frame()
+        if self.battle.over and not self.animating:
+            self.finish()
+
+    def finish(self):
+        game, battle = self.game, self.battle
+        player, opponent = battle.player, battle.opponent
         for mon in [player, opponent]:
             mon.display_hp = mon.hp
-        draw_battle_ui(screen, player, opponent, battle_log, move_buttons)
-        pygame.display.flip()
+
+        replay = Replay.from_battle(battle, self.seed, game.all_monsoons.index(player), game.all_monsoons.index(opponent))
+        try:
+            write_replays(game.replay_path, [replay])
+        except OSError:
+            print("Warning: could not save the battle replay.")
 
         # Determines the result
-        if player.hp > 0:
+        game.scoreboard.record(player.name, opponent.name, battle.winner.name if battle.winner else None, battle.turn)
+        if battle.winner is player:
             result_text = "You Win!"
-            wins += 1
+        elif battle.winner is None:
+            result_text = "Draw!"
         else:
             result_text = "You Lose!"
-            losses += 1
+        self.manager.replace(ResultScene(game, result_text))
 
-        # Shows result and restart option
-        if show_restart_button(screen, result_text):
-            continue
+    def draw(self, screen):
+        battle = self.battle
+        return self.game.renderer.draw(battle.player, battle.opponent, battle.log,
+                                       self.move_buttons if self.ui["show_moves"] else [], update=False,
+                                       effects=self.particles)
+
+class ResultScene(HoverScene):
+    name = "result"
+
+    def __init__(self, game, result_text):
+        super().__init__(game)
+        self.result = render_text(RESULT_FONT, result_text, (255, 0, 0))
+        self.button_rects = [pygame.Rect(SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT // 2 + 100, 300, 60)]
+        self.restart_label = render_text(BUTTON_FONT, "Restart", (255, 255, 255))
+
+    def click(self, index):
+        self.manager.replace(BattleScene(self.game))
+
+    def definitions_changed(self):
+        if self.game.player is None:
+            # The selected Monsoon was removed, so there's nothing to restart
+            self.manager.replace(SelectionScene(self.game))
         else:
-            break
+            self.dirty = True
+
+    def draw(self, screen):
+        screen.fill(MENU_BG_COLOR)
+        screen.blit(self.result, self.result.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)))
+        draw_button(screen, self.button_rects[0], self.restart_label, self.hovered == 0)
+        return [screen.get_rect()]
+
 
+def init_display():
+    pygame.display.init()
+    # Load the sound list up front so a missing folder warns at startup
+    sounds.paths()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Monsoon Rumble")
+    return screen
+
+
+def main():
+    screen = init_display()
+    manager = SceneManager(screen, FPS)
+    manager.push(SelectionScene(Game(screen)))
+    manager.run()
     pygame.quit()
 
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
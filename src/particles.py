@@ -0,0 +1,211 @@
+import numpy as np
+import pygame
+
+# Particle effects for moves. Every particle lives in one fixed-capacity pool
+# of NumPy arrays, alive ones packed at the front: update() integrates and
+# culls all of them with in-place array ops into preallocated scratch buffers,
+# and draw() writes them straight into the surface's pixels through a
+# surfarray view. On a 32-bit surface nothing a frame allocates grows with the
+# particle count: what it does make is small and fixed, the array views, the
+# pixels2d view and bounds()'s Rect. Other pixel formats fall back to
+# filling rects from Python lists, which does allocate per particle. emit()
+# allocates its random draws, once per burst.
+#
+# Every particle in the pool is inside `area`: emit() culls a burst as soon as
+# it is placed and update() after every move, so draw() never writes outside
+# the surface, even on a frame that ran with dt 0.
+#
+# Particles are 2x2 pixels and fade toward `fade_to` (the background they are
+# drawn on) over their life, using a palette of SHADES colors per emitter
+# color mapped to the surface's pixel format once.
+
+MAX_PARTICLES = 8192
+SHADES = 8
+PARTICLE_SIZE = 2
+
+
+class ParticleSystem:
+    def __init__(self, area, capacity=MAX_PARTICLES, fade_to=(0, 0, 0), seed=None):
+        self.capacity = capacity
+        self.area = pygame.Rect(area)
+        self.fade_to = fade_to
+        self.rng = np.random.default_rng(seed)
+        self.count = 0
+        # Bumped on every update, so renderers can tell a frame moved them
+        self.frame = 0
+
+        self.pos = np.zeros((capacity, 2), np.float32)
+        self.vel = np.zeros((capacity, 2), np.float32)
+        self.life = np.zeros(capacity, np.float32)
+        self.inv_life = np.zeros(capacity, np.float32)
+        self.gravity = np.zeros(capacity, np.float32)
+        # Index of the particle's first palette shade
+        self.palette = np.zeros(capacity, np.intp)
+
+        # One spare row past the end for compact() to drop particles into
+        self.scratch2 = np.zeros((capacity + 1, 2), np.float32)
+        self.scratch1 = np.zeros(capacity + 1, np.float32)
+        self.scratch_index = np.zeros(capacity + 1, np.intp)
+        self.slots = np.zeros(capacity, np.intp)
+        self.keep = np.zeros(capacity, bool)
+        self.test = np.zeros(capacity, bool)
+        self.x = np.zeros(capacity, np.intp)
+        self.y = np.zeros(capacity, np.intp)
+        self.pixels = np.zeros(capacity, np.uint32)
+
+        self.colors = {}
+        self.mapped = None
+        self.mapped_format = None
+
+    @property
+    def active(self):
+        return self.count > 0
+
+    def seed(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def clear(self):
+        self.count = 0
+
+    def palette_index(self, color):
+        color = tuple(color[:3])
+        if color not in self.colors:
+            self.colors[color] = len(self.colors) * SHADES
+            self.mapped = None
+        return self.colors[color]
+
+    def emit(self, pos, count, speed, angle, spread, life, gravity=0.0, jitter=0.0, color=(255, 255, 255)):
+        # A burst of up to `count` particles at pos. speed and life are
+        # (min, max) ranges; angle and spread are in degrees with 90 pointing
+        # up the screen; gravity is in pixels/s² (negative floats upward).
+        # Returns how many fit in the pool; the ones that land outside the
+        # area are dropped straight away.
+        count = min(count, self.capacity - self.count)
+        if count <= 0:
+            return 0
+        start, end = self.count, self.count + count
+        rng = self.rng
+        angles = np.radians(angle + (rng.random(count) - 0.5) * spread)
+        speeds = rng.uniform(speed[0], speed[1], count)
+        self.pos[start:end, 0] = pos[0] + rng.normal(0.0, jitter, count) if jitter else pos[0]
+        self.pos[start:end, 1] = pos[1] + rng.normal(0.0, jitter, count) if jitter else pos[1]
+        self.vel[start:end, 0] = np.cos(angles) * speeds
+        self.vel[start:end, 1] = -np.sin(angles) * speeds
+        lives = rng.uniform(life[0], life[1], count)
+        self.life[start:end] = lives
+        self.inv_life[start:end] = 1.0 / lives
+        self.gravity[start:end] = gravity
+        self.palette[start:end] = self.palette_index(color)
+        self.count = end
+        self.cull(end)
+        return count
+
+    def update(self, dt):
+        n = self.count
+        if not n or not dt:
+            return
+        pos, vel, step = self.pos[:n], self.vel[:n], self.scratch1[:n]
+        np.multiply(self.gravity[:n], dt, out=step)
+        vel[:, 1] += step
+        np.multiply(vel, dt, out=self.scratch2[:n])
+        pos += self.scratch2[:n]
+        self.life[:n] -= dt
+        self.cull(n)
+        self.frame += 1
+
+    def cull(self, n):
+        # Keeps the particles that are alive and far enough inside the area
+        # for a whole particle
+        pos = self.pos[:n]
+        keep, test = self.keep[:n], self.test[:n]
+        area = self.area
+        np.greater(self.life[:n], 0.0, out=keep)
+        np.greater_equal(pos[:, 0], area.left, out=test)
+        keep &= test
+        np.less(pos[:, 0], area.right - PARTICLE_SIZE, out=test)
+        keep &= test
+        np.greater_equal(pos[:, 1], area.top, out=test)
+        keep &= test
+        np.less(pos[:, 1], area.bottom - PARTICLE_SIZE, out=test)
+        keep &= test
+        self.compact(n)
+
+    def compact(self, n):
+        # Moves the kept particles to the front, in order. Each kept particle's
+        # new slot is a running count of the kept ones; dropped particles are
+        # all scattered into the spare slot at n. (np.compress and boolean
+        # indexing would allocate index arrays every frame.)
+        keep = self.keep[:n]
+        slots = self.slots[:n]
+        slots[:] = keep
+        np.cumsum(slots, out=slots)
+        kept = int(slots[-1])
+        if kept < n:
+            slots -= 1
+            np.logical_not(keep, out=self.test[:n])
+            np.copyto(slots, n, where=self.test[:n])
+            for array, scratch in ((self.pos, self.scratch2), (self.vel, self.scratch2), (self.life, self.scratch1),
+                                   (self.inv_life, self.scratch1), (self.gravity, self.scratch1),
+                                   (self.palette, self.scratch_index)):
+                scratch[slots] = array[:n]
+                array[:kept] = scratch[:kept]
+        self.count = kept
+
+    def bounds(self):
+        # Rect covering every live particle, or None
+        n = self.count
+        if not n:
+            return None
+        pos = self.pos[:n]
+        left, top = int(pos[:, 0].min()), int(pos[:, 1].min())
+        right, bottom = int(pos[:, 0].max()), int(pos[:, 1].max())
+        return pygame.Rect(left, top, right - left + PARTICLE_SIZE, bottom - top + PARTICLE_SIZE)
+
+    def map_palette(self, surface):
+        key = (surface.get_bitsize(), surface.get_masks())
+        if self.mapped is not None and self.mapped_format == key:
+            return self.mapped
+        mapped = np.zeros(max(1, len(self.colors)) * SHADES, np.uint32)
+        for color, first in self.colors.items():
+            for shade in range(SHADES):
+                t = shade / (SHADES - 1)
+                mixed = tuple(int(f + (c - f) * t) for c, f in zip(color, self.fade_to))
+                mapped[first + shade] = surface.map_rgb(mixed)
+        self.mapped, self.mapped_format = mapped, key
+        return mapped
+
+    def draw(self, surface):
+        n = self.count
+        if not n:
+            return
+        width, height = surface.get_size()
+        area = self.area
+        if area.left < 0 or area.top < 0 or area.right > width or area.bottom > height:
+            raise ValueError(f"particle area {tuple(area)} doesn't fit a {width}x{height} surface")
+        palette = self.map_palette(surface)
+        # Shade from the fraction of life left: brightest at birth
+        shade = self.scratch1[:n]
+        np.multiply(self.life[:n], self.inv_life[:n], out=shade)
+        shade *= SHADES - 1
+        index = self.scratch_index[:n]
+        index[:] = shade
+        index += self.palette[:n]
+        pixels = self.pixels[:n]
+        np.take(palette, index, out=pixels, mode="clip")
+        x, y = self.x[:n], self.y[:n]
+        x[:] = self.pos[:n, 0]
+        y[:] = self.pos[:n, 1]
+
+        if surface.get_bytesize() != 4:
+            # pixels2d needs 32-bit pixels; other formats take the slow path
+            for px, py, pixel in zip(x.tolist(), y.tolist(), pixels.tolist()):
+                surface.fill(pixel, (px, py, PARTICLE_SIZE, PARTICLE_SIZE))
+            return
+        view = pygame.surfarray.pixels2d(surface)
+        for dx in range(PARTICLE_SIZE):
+            for dy in range(PARTICLE_SIZE):
+                view[x, y] = pixels
+                y += 1
+            y -= PARTICLE_SIZE
+            x += 1
+        del view
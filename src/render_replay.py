@@ -0,0 +1,201 @@
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Offline rendering of a recorded battle to an image sequence, with the same
+# animations as the game. Nothing waits on the clock: every frame advances the
+# timeline by exactly 1/fps. The animation only depends on the replay (random
+# and the particle rng are seeded with the replay seed), so worker
+# processes can each take a frame range: they step the timeline up to their
+# first frame without drawing and render from there on SDL's dummy driver.
+#
+# Frames are drawn by BattleRenderer (the dirty-rect form of draw_battle_ui)
+# and read through a surfarray view into one reused NumPy buffer. The default
+# ppm output is that buffer written as is; png goes through pygame's encoder
+# and is several times slower. A frame with nothing dirty is hard-linked to
+# the previous file instead of being copied and written again.
+#
+#   python src/render_replay.py replays/FILE.mrr [INDEX] -o frames --workers 8
+
+FPS = 60
+THINK_TIME = 0.5
+END_HOLD = 1.0
+FORMATS = ["ppm", "png"]
+
+_worker = None
+
+
+class RecordedChoices:
+    # Stands in for the CPU in turn_sequence, returning the recorded moves
+    def __init__(self, choices):
+        self.choices = iter(choices[1::2])
+
+    def choose_move(self, cpu, player):
+        return next(self.choices)
+
+
+class ReplayAnimation:
+    def __init__(self, replay, roster, fps=FPS):
+        from monsoon_rumble import intro_sequence, turn_sequence, get_particles
+        from animation import Timeline, Sequence, Call, Wait
+        from replay import start_battle
+
+        self.battle = battle = start_battle(replay, roster)
+        self.ui = ui = {"show_moves": True}
+        cpu = RecordedChoices(replay.choices)
+        rounds = [Sequence(Wait(THINK_TIME), Call(turn_sequence, battle, cpu, move, ui)) for move in replay.choices[0::2]]
+        self.timeline = Timeline()
+        self.dt = 1 / fps
+        self.hold = round(END_HOLD * fps)
+        self.frame = 0
+        random.seed(replay.seed)
+        self.particles = get_particles()
+        self.particles.clear()
+        self.particles.seed(replay.seed)
+        self.timeline.play(Sequence(intro_sequence(battle.player, battle.opponent), *rounds))
+
+    @property
+    def done(self):
+        return not self.timeline.active and not self.particles.active and self.hold <= 0
+
+    def step(self):
+        if self.timeline.active or self.particles.active:
+            self.timeline.update(self.dt)
+            self.particles.update(self.dt)
+        else:
+            self.hold -= 1
+        self.frame += 1
+
+    def draw(self, renderer, move_buttons):
+        # Returns the dirty rects, empty when the frame didn't change
+        battle = self.battle
+        return renderer.draw(battle.player, battle.opponent, battle.log,
+                             move_buttons if self.ui["show_moves"] else [], update=False,
+                             effects=self.particles)
+
+
+def count_frames(replay, roster, fps=FPS):
+    animation = ReplayAnimation(replay, roster, fps)
+    while not animation.done:
+        animation.step()
+    return animation.frame
+
+
+def make_roster():
+    from battle_engine import ROSTER
+    from monsoon_rumble import Monsoons
+    return [Monsoons(*species) for species in ROSTER]
+
+
+def init_worker():
+    global _worker
+    if _worker is None:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        import numpy as np
+        import pygame
+        from audio import audio
+        from monsoon_rumble import SCREEN_WIDTH, SCREEN_HEIGHT
+        audio.muted = True
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+        screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        buffer = np.empty((SCREEN_HEIGHT, SCREEN_WIDTH, 3), np.uint8)
+        _worker = (screen, buffer, make_roster())
+    return _worker
+
+
+def save_frame(screen, buffer, path, fmt):
+    import pygame
+    if fmt == "png":
+        pygame.image.save(screen, path)
+        return
+    # pixels3d is (x, y, rgb) over the surface memory, transposed it walks rows.
+    # One plane at a time is several times faster than a strided 3-wide copy.
+    view = pygame.surfarray.pixels3d(screen).transpose(1, 0, 2)
+    for channel in range(3):
+        buffer[..., channel] = view[..., channel]
+    del view
+    with open(path, "wb") as f:
+        f.write(b"P6 %d %d 255\n" % (buffer.shape[1], buffer.shape[0]))
+        f.write(buffer.data)
+
+
+def render_range(task):
+    replay_path, index, first, last, out_dir, fmt, fps = task
+    from monsoon_rumble import BattleRenderer, battle_move_buttons
+    from replay import read_replays
+    screen, buffer, roster = init_worker()
+    replay = read_replays(replay_path)[index]
+    animation = ReplayAnimation(replay, roster, fps)
+    renderer = BattleRenderer(screen)
+    move_buttons = battle_move_buttons(animation.battle.player)
+    while animation.frame < first:
+        animation.step()
+    previous = None
+    for frame in range(first, last):
+        path = os.path.join(out_dir, f"frame_{frame:06d}.{fmt}")
+        if os.path.lexists(path):
+            os.remove(path)
+        dirty = animation.draw(renderer, move_buttons)
+        if dirty or not link_frame(previous, path):
+            save_frame(screen, buffer, path, fmt)
+        previous = path
+        animation.step()
+    return last - first
+
+
+def link_frame(previous, path):
+    if previous is None:
+        return False
+    try:
+        os.link(previous, path)
+    except OSError:
+        return False
+    return True
+
+
+def frame_ranges(total, parts):
+    size = -(-total // parts)
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+def render_replay(replay_path, index=0, out_dir="frames", workers=None, fmt="ppm", fps=FPS, progress=None):
+    from audio import audio
+    from replay import read_replays
+    audio.muted = True
+    total = count_frames(read_replays(replay_path)[index], make_roster(), fps)
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count()
+    # A few ranges per worker so a slow range doesn't leave the others idle
+    tasks = [(replay_path, index, first, last, out_dir, fmt, fps) for first, last in frame_ranges(total, workers * 4)]
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(render_range, task) for task in tasks]):
+            done += future.result()
+            if progress:
+                progress(done, total)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a recorded battle to an image sequence.")
+    parser.add_argument("file")
+    parser.add_argument("index", type=int, nargs="?", default=0)
+    parser.add_argument("-o", "--out", default="frames", help="output folder")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--format", choices=FORMATS, default="ppm")
+    parser.add_argument("--fps", type=int, default=FPS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    frames = render_replay(args.file, args.index, args.out, args.workers, args.format, args.fps)
+    elapsed = time.perf_counter() - start
+    length = frames / args.fps
+    print(f"{frames} frames ({length:.1f}s of battle) in {elapsed:.2f}s on {args.workers} workers, "
+          f"{length / elapsed:.1f}x real time")
+
+
+if __name__ == "__main__":
+    main()
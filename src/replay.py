@@ -0,0 +1,266 @@
+import argparse
+import glob
+import os
+import random
+import struct
+import sys
+import time
+from datetime import datetime
+
+from battle_engine import ROSTER, MAX_MOVES, PLAYER, OPPONENT, Battle, make_roster
+
+# Binary battle replays. A battle is fully determined by the rng seed, the two
+# roster indices and the move index passed to every take_turn call, so that
+# is all a replay stores:
+#
+#   file:   MAGIC, then records back to back
+#   record: RECORD header, then the choices packed four to a byte (2 bits each,
+#           player and opponent alternating, player first)
+#
+# The header also keeps the recorded result and turn count, so replays can be
+# re-run in bulk after a rule change and checked for outcomes that moved.
+# A typical battle is under 30 bytes.
+
+MAGIC = b"MRREPLY1"
+# seed, player index, opponent index, max turns, turns, result, choice count
+RECORD = struct.Struct("<QBBHHBH")
+REPLAY_FOLDER = "replays"
+SNAPSHOT_INTERVAL = 8
+DRAW = 2
+
+
+class Replay:
+    def __init__(self, seed, player, opponent, choices, max_turns, turns=0, result=DRAW):
+        self.seed = seed
+        self.player = player
+        self.opponent = opponent
+        self.choices = choices
+        self.max_turns = max_turns
+        self.turns = turns
+        # PLAYER, OPPONENT or DRAW
+        self.result = result
+
+    @classmethod
+    def from_battle(cls, battle, seed, player, opponent):
+        return cls(seed, player, opponent, list(battle.choices), battle.max_turns, battle.turn, battle_result(battle))
+
+    def pack(self):
+        packed = bytearray((len(self.choices) + 3) // 4)
+        for i, choice in enumerate(self.choices):
+            if not 0 <= choice < MAX_MOVES:
+                raise ValueError(f"move index {choice} doesn't fit in a replay")
+            packed[i >> 2] |= choice << ((i & 3) * 2)
+        header = RECORD.pack(self.seed, self.player, self.opponent, self.max_turns, self.turns, self.result,
+                             len(self.choices))
+        return header + bytes(packed)
+
+    @classmethod
+    def unpack_from(cls, data, offset=0):
+        # Returns (replay, offset just past it)
+        seed, player, opponent, max_turns, turns, result, count = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        size = (count + 3) // 4
+        if offset + size > len(data):
+            raise ValueError("truncated replay record")
+        packed = data[offset:offset + size]
+        choices = [(packed[i >> 2] >> ((i & 3) * 2)) & 3 for i in range(count)]
+        return cls(seed, player, opponent, choices, max_turns, turns, result), offset + size
+
+
+def battle_result(battle):
+    if battle.winner is None:
+        return DRAW
+    return PLAYER if battle.winner is battle.player else OPPONENT
+
+
+def new_seed():
+    return random.getrandbits(64)
+
+
+def write_replays(path, replays):
+    # Appends to path, starting a new file with MAGIC if needed
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "ab") as f:
+        if f.tell() == 0:
+            f.write(MAGIC)
+        for replay in replays:
+            f.write(replay.pack())
+
+
+def read_replays(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a replay file")
+    replays = []
+    offset = len(MAGIC)
+    while offset < len(data):
+        replay, offset = Replay.unpack_from(data, offset)
+        replays.append(replay)
+    return replays
+
+
+def session_path(folder=REPLAY_FOLDER):
+    return os.path.join(folder, datetime.now().strftime("%Y%m%d-%H%M%S") + ".mrr")
+
+
+def start_battle(replay, roster):
+    if max(replay.player, replay.opponent) >= len(roster):
+        raise ValueError("replay uses a roster index this roster doesn't have")
+    player, opponent = roster[replay.player], roster[replay.opponent]
+    if opponent is player:
+        # A mirror match (the battle server allows them) needs two fighters
+        opponent = type(player)(*ROSTER[replay.opponent])
+    return Battle(player, opponent, random.Random(replay.seed), replay.max_turns)
+
+
+def play_replay(replay, roster=None):
+    # Re-runs the whole battle headless and returns the finished Battle
+    battle = start_battle(replay, roster or make_roster())
+    for i, choice in enumerate(replay.choices):
+        if battle.over:
+            break
+        battle.take_turn(i & 1, choice)
+    return battle
+
+
+def check_replay(replay, roster=None):
+    # None if the replay still plays out as recorded, otherwise what changed
+    battle = play_replay(replay, roster)
+    if not battle.over:
+        return "battle no longer finishes"
+    if battle.choices != replay.choices:
+        return f"ended after {len(battle.choices)} of {len(replay.choices)} actions"
+    if battle_result(battle) != replay.result or battle.turn != replay.turns:
+        return (f"recorded result {replay.result} in {replay.turns} turns, "
+                f"now {battle_result(battle)} in {battle.turn} turns")
+    return None
+
+
+class ReplayCursor:
+    # Random access into one replay. The battle is played through once and a
+    # BattleState snapshot plus rng state is kept every `interval` actions;
+    # seek() restores the nearest one before the target and plays forward.
+    def __init__(self, replay, roster=None, interval=SNAPSHOT_INTERVAL):
+        self.replay = replay
+        self.interval = interval
+        self.battle = start_battle(replay, roster or make_roster())
+        self.snapshots = [self.save()]
+        for i, choice in enumerate(replay.choices):
+            if self.battle.over:
+                break
+            if i and i % interval == 0:
+                self.snapshots.append(self.save())
+            self.battle.take_turn(i & 1, choice)
+        self.length = len(self.battle.choices)
+        self.position = self.length
+        # Snapshots ahead of a backward seek need the log past that point
+        self.full_log = list(self.battle.log)
+
+    def save(self):
+        battle = self.battle
+        return battle.snapshot(), battle.rng.getstate(), len(battle.log), len(battle.choices)
+
+    def seek(self, position):
+        position = max(0, min(position, self.length))
+        if not (self.position <= position and position - self.position < self.interval):
+            state, rng_state, log_length, done = self.snapshots[min(position // self.interval, len(self.snapshots) - 1)]
+            battle = self.battle
+            battle.restore(state)
+            battle.rng.setstate(rng_state)
+            battle.log[:] = self.full_log[:log_length]
+            battle.choices[:] = self.replay.choices[:done]
+            self.position = done
+        while self.position < position:
+            self.battle.take_turn(self.position & 1, self.replay.choices[self.position])
+            self.position += 1
+        return self.battle
+
+
+def view_replay(replay, start=0):
+    # Shows the battle screen for one replay. Left/Right step one action,
+    # Page Up/Down ten, Home/End jump to the ends.
+    import pygame
+    from monsoon_rumble import Monsoons, BattleRenderer, init_display
+
+    screen = init_display()
+    roster = [Monsoons(*species) for species in ROSTER]
+    cursor = ReplayCursor(replay, roster)
+    renderer = BattleRenderer(screen)
+    steps = {pygame.K_LEFT: -1, pygame.K_RIGHT: 1, pygame.K_PAGEUP: -10, pygame.K_PAGEDOWN: 10}
+    position = start
+    while True:
+        battle = cursor.seek(position)
+        for mon in (battle.player, battle.opponent):
+            mon.display_hp = mon.hp
+            mon.alpha = 0 if battle.over and mon is not battle.winner and battle.winner is not None else 255
+        log = battle.log + [f"Action {cursor.position}/{cursor.length}"]
+        renderer.draw(battle.player, battle.opponent, log, [])
+
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+            break
+        if event.type == pygame.KEYDOWN:
+            if event.key in steps:
+                position = max(0, min(cursor.length, cursor.position + steps[event.key]))
+            elif event.key == pygame.K_HOME:
+                position = 0
+            elif event.key == pygame.K_END:
+                position = cursor.length
+        elif event.type == pygame.WINDOWEXPOSED:
+            renderer.invalidate()
+    pygame.quit()
+
+
+def expand(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.mrr"))))
+        else:
+            files.append(path)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect, verify and view recorded battles.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    show = commands.add_parser("show", help="print the battle log of one replay")
+    show.add_argument("file")
+    show.add_argument("index", type=int, nargs="?", default=0)
+    verify = commands.add_parser("verify", help="re-run replays headless and report outcomes that changed")
+    verify.add_argument("paths", nargs="*", default=[REPLAY_FOLDER], help="replay files or folders")
+    view = commands.add_parser("view", help="step through one replay on the battle screen")
+    view.add_argument("file")
+    view.add_argument("index", type=int, nargs="?", default=0)
+    view.add_argument("--action", type=int, default=0, help="action to start at")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        battle = play_replay(read_replays(args.file)[args.index])
+        for line in battle.log:
+            print(line)
+        print(f"Winner: {battle.winner.name if battle.winner else 'draw'} after {battle.turn} turns")
+    elif args.command == "verify":
+        roster = make_roster()
+        total = changed = 0
+        start = time.perf_counter()
+        for path in expand(args.paths):
+            for index, replay in enumerate(read_replays(path)):
+                total += 1
+                problem = check_replay(replay, roster)
+                if problem:
+                    changed += 1
+                    print(f"{path}[{index}]: {problem}")
+        elapsed = time.perf_counter() - start
+        rate = total / elapsed if elapsed else 0
+        print(f"{total:,} replays checked in {elapsed:.2f}s ({rate:,.0f}/s), {changed} changed")
+        sys.exit(1 if changed else 0)
+    else:
+        view_replay(read_replays(args.file)[args.index], args.action)
+
+
+if __name__ == "__main__":
+    main()
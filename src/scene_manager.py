@@ -0,0 +1,136 @@
+import pygame
+
+from frame_profiler import profiler
+
+# One loop and one clock for every screen. Screens are Scenes on a stack and
+# only the top one gets events, updates and draws. While the top scene is
+# animating the loop runs at the frame rate; otherwise it blocks in
+# pygame.event.wait until an event comes in or IDLE_TIMEOUT passes, and only
+# redraws when the scene marks itself dirty, so a screen nobody touches costs
+# next to nothing. Events polled after one that switched scenes go to the new
+# top scene, so a quick second click or a QUIT isn't lost.
+
+FPS = 60
+MAX_FRAME_TIME = 0.1
+IDLE_TIMEOUT = 0.25
+
+
+class Scene:
+    name = "scene"
+
+    def __init__(self):
+        self.manager = None
+        self.dirty = True
+
+    def enter(self, manager):
+        # Called when the scene becomes the top of the stack
+        self.manager = manager
+        self.dirty = True
+
+    @property
+    def animating(self):
+        return False
+
+    def handle_event(self, event):
+        pass
+
+    def invalidate(self):
+        # Everything has to be drawn again, e.g. after an overlay went away
+        self.dirty = True
+
+    def update(self, dt):
+        pass
+
+    def draw(self, screen):
+        # Returns the rects that changed
+        return [screen.get_rect()]
+
+
+class SceneManager:
+    def __init__(self, screen, fps=FPS, max_frame_time=MAX_FRAME_TIME, idle_timeout=IDLE_TIMEOUT):
+        self.screen = screen
+        self.fps = fps
+        self.max_frame_time = max_frame_time
+        self.idle_timeout = idle_timeout
+        self.clock = pygame.time.Clock()
+        self.stack = []
+        self.was_animating = False
+        # Events polled after one that switched scenes, for the new top scene
+        self.pending = []
+
+    @property
+    def top(self):
+        return self.stack[-1] if self.stack else None
+
+    def push(self, scene):
+        self.stack.append(scene)
+        scene.enter(self)
+
+    def pop(self):
+        scene = self.stack.pop()
+        if self.stack:
+            self.stack[-1].enter(self)
+        return scene
+
+    def replace(self, scene):
+        if self.stack:
+            self.stack.pop()
+        self.push(scene)
+
+    def quit(self):
+        self.stack.clear()
+
+    def poll(self, scene):
+        if self.pending:
+            events, self.pending = self.pending, []
+            return events + pygame.event.get()
+        if self.was_animating or scene.dirty:
+            return pygame.event.get()
+        event = pygame.event.wait(int(self.idle_timeout * 1000))
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    def run(self):
+        while self.stack:
+            scene = self.top
+            profiler.begin_frame(scene.name)
+            with profiler.phase("events"):
+                events = self.poll(scene)
+                for i, event in enumerate(events):
+                    if event.type == pygame.QUIT:
+                        self.quit()
+                        return
+                    if profiler.handle_event(event):
+                        scene.invalidate()
+                    scene.handle_event(event)
+                    if scene is not self.top:
+                        self.pending = events[i + 1:]
+                        break
+            if scene is not self.top:
+                continue
+
+            # Time spent blocked while idle isn't animation time
+            was_animating = self.was_animating
+            if was_animating:
+                dt = min(self.clock.tick(self.fps) / 1000, self.max_frame_time)
+            else:
+                self.clock.tick()
+                dt = 0.0
+            with profiler.phase("update"):
+                scene.update(dt)
+            if scene is not self.top:
+                continue
+            self.was_animating = scene.animating
+
+            with profiler.phase("draw"):
+                # The frame an animation ends on still has to be drawn
+                changed = scene.dirty or was_animating or self.was_animating
+                rects = scene.draw(self.screen) if changed else []
+                scene.dirty = False
+            with profiler.phase("flip"):
+                overlay = profiler.draw_overlay(self.screen)
+                if overlay:
+                    rects.append(overlay)
+                if rects:
+                    pygame.display.update(rects)
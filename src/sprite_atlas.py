@@ -0,0 +1,158 @@
+import json
+import mmap
+import os
+
+import pygame
+
+# All Monsoon sprites, pre-scaled to every size the game draws them at and
+# packed into one atlas. The decoded pixels are written to a raw cache file
+# (BGRA, the display's native order) and memory-mapped on later launches, so a
+# warm start does no PNG decoding or resampling. The cache is rebuilt when a
+# source PNG is added, removed, or its mtime/size changes, or the scales change.
+#
+# Cache layout: MAGIC, 4-byte little-endian header length, JSON header, pixels.
+
+# Paths are relative to the game folder, not the working directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SPRITE_FOLDER = os.path.join(ROOT, "assets", "sprites")
+CACHE_PATH = os.path.join(ROOT, "assets", ".cache", "sprite_atlas.bin")
+MAGIC = b"MRATLAS1"
+ATLAS_WIDTH = 1024
+PADDING = 1
+
+# variant name: scale factor (int) or fixed size (w, h), and which sprites use it
+VARIANTS = {
+    "battle": (3, ("front", "back")),
+    "button": ((150, 150), ("front",)),
+}
+
+_atlas = None
+
+
+class SpriteAtlas:
+    def __init__(self, surface, entries, buffer=None):
+        self.surface = surface
+        self.entries = entries
+        # Keeps the mmap alive for as long as the surface points into it
+        self.buffer = buffer
+        self._subsurfaces = {}
+
+    def get(self, name, variant="battle"):
+        key = f"{name}@{variant}"
+        sprite = self._subsurfaces.get(key)
+        if sprite is None and key in self.entries:
+            sprite = self.surface.subsurface(pygame.Rect(self.entries[key]))
+            self._subsurfaces[key] = sprite
+        return sprite
+
+
+def source_files(folder=SPRITE_FOLDER):
+    if not os.path.isdir(folder):
+        return {}
+    sources = {}
+    for fname in sorted(os.listdir(folder)):
+        if fname.endswith(".png"):
+            path = os.path.join(folder, fname)
+            st = os.stat(path)
+            sources[path] = [st.st_mtime_ns, st.st_size]
+    return sources
+
+
+def variant_config():
+    return {name: [list(size) if isinstance(size, tuple) else size, list(kinds)] for name, (size, kinds) in VARIANTS.items()}
+
+
+def build_atlas(sources, cache_path=CACHE_PATH):
+    images = []
+    for path in sources:
+        name = os.path.splitext(os.path.basename(path))[0]
+        kind = name.rsplit("_", 1)[-1]
+        image = pygame.image.load(path)
+        for variant, (size, kinds) in VARIANTS.items():
+            if kind not in kinds:
+                continue
+            if isinstance(size, tuple):
+                scaled = pygame.transform.scale(image, size)
+            else:
+                scaled = pygame.transform.scale(image, (image.get_width() * size, image.get_height() * size))
+            images.append((f"{name}@{variant}", scaled))
+
+    # Shelf packing, tallest first
+    images.sort(key=lambda item: item[1].get_height(), reverse=True)
+    entries = {}
+    x = y = shelf = 0
+    for key, image in images:
+        w, h = image.get_size()
+        if x + w > ATLAS_WIDTH:
+            x, y = 0, y + shelf + PADDING
+            shelf = 0
+        entries[key] = [x, y, w, h]
+        x += w + PADDING
+        shelf = max(shelf, h)
+    height = max(1, y + shelf)
+
+    atlas = pygame.Surface((ATLAS_WIDTH, height), pygame.SRCALPHA, 32)
+    for key, image in images:
+        atlas.blit(image, entries[key][:2])
+
+    header = json.dumps({"size": [ATLAS_WIDTH, height], "entries": entries, "sources": sources,
+                         "variants": variant_config()}).encode()
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # Two instances starting at once can both build the atlas
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(4, "little"))
+            f.write(header)
+            f.write(pygame.image.tobytes(atlas, "BGRA"))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        print("Warning: could not write sprite atlas cache.")
+    return SpriteAtlas(atlas, entries)
+
+
+def read_cache(cache_path, sources):
+    # Returns a SpriteAtlas over the mapped file, or None if it is stale or bad
+    try:
+        f = open(cache_path, "rb")
+    except OSError:
+        return None
+    with f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None
+    if mm[:len(MAGIC)] != MAGIC:
+        return None
+    start = len(MAGIC) + 4
+    header_len = int.from_bytes(mm[len(MAGIC):start], "little")
+    try:
+        header = json.loads(mm[start:start + header_len])
+    except ValueError:
+        return None
+    if header["sources"] != sources or header["variants"] != variant_config():
+        return None
+    width, height = header["size"]
+    pixels = memoryview(mm)[start + header_len:]
+    if len(pixels) != width * height * 4:
+        return None
+    surface = pygame.image.frombuffer(pixels, (width, height), "BGRA")
+    return SpriteAtlas(surface, header["entries"], mm)
+
+
+def load_atlas(cache_path=CACHE_PATH, folder=SPRITE_FOLDER):
+    sources = source_files(folder)
+    atlas = read_cache(cache_path, sources)
+    if atlas is None:
+        atlas = build_atlas(sources, cache_path)
+        # Use the mapped copy when the cache could be written
+        atlas = read_cache(cache_path, sources) or atlas
+    return atlas
+
+
+def get_atlas():
+    global _atlas
+    if _atlas is None:
+        _atlas = load_atlas()
+    return _atlas
@@ -0,0 +1,52 @@
+from collections import OrderedDict
+
+import pygame
+
+# Fonts are loaded once and kept for the life of the process. Rendered text
+# surfaces go through a size-bounded LRU keyed by (font, text, color), so the
+# same HP string or move label is only rasterized once.
+
+TEXT_CACHE_SIZE = 512
+
+_fonts = {}
+_text_cache = OrderedDict()
+stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def get_font(name, size, bold=False):
+    key = (name, size, bold)
+    font = _fonts.get(key)
+    if font is None:
+        # Font support starts on the first font, not at import
+        if not pygame.font.get_init():
+            pygame.font.init()
+        if name is None:
+            # Default font, no system font scan needed
+            font = pygame.font.Font(None, size)
+            font.set_bold(bold)
+        else:
+            font = pygame.font.SysFont(name, size, bold=bold)
+        _fonts[key] = font
+    return font
+
+
+def render_text(font_key, text, color, antialias=True):
+    # font_key is a (name, size, bold) tuple as taken by get_font
+    key = (font_key, text, color, antialias)
+    surface = _text_cache.get(key)
+    if surface is not None:
+        _text_cache.move_to_end(key)
+        stats["hits"] += 1
+        return surface
+    stats["misses"] += 1
+    surface = get_font(*font_key).render(text, antialias, color)
+    _text_cache[key] = surface
+    if len(_text_cache) > TEXT_CACHE_SIZE:
+        _text_cache.popitem(last=False)
+        stats["evictions"] += 1
+    return surface
+
+
+def clear():
+    _fonts.clear()
+    _text_cache.clear()
@@ -0,0 +1,173 @@
+import argparse
+import math
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from battle_engine import PLAYER, OPPONENT, Battle, make_roster, choose_best_move
+
+# Round-robin tournament: every Monsoon plays every other Monsoon from both
+# sides, `--battles` times per pairing. Pairings are split into chunks that
+# run on a process pool and stream back as Scoreboards. Every battle gets its
+# own seed from (base seed, player, opponent, index), so any single battle can
+# be replayed with --show.
+
+POLICIES = ["greedy", "easy", "normal", "hard"]
+
+
+class Scoreboard:
+    def __init__(self):
+        self.wins = Counter()
+        self.losses = Counter()
+        self.draws = Counter()
+        self.battles = Counter()
+        self.turns = Counter()
+        self.move_usage = Counter()
+
+    def record(self, player_name, opponent_name, winner_name, turns=0, move_usage=None):
+        for name in (player_name, opponent_name):
+            self.battles[name] += 1
+            self.turns[name] += turns
+        if winner_name is None:
+            self.draws[player_name] += 1
+            self.draws[opponent_name] += 1
+        else:
+            loser_name = opponent_name if winner_name == player_name else player_name
+            self.wins[winner_name] += 1
+            self.losses[loser_name] += 1
+        if move_usage:
+            self.move_usage.update(move_usage)
+
+    def merge(self, other):
+        for name in ("wins", "losses", "draws", "battles", "turns", "move_usage"):
+            getattr(self, name).update(getattr(other, name))
+
+    def win_rate(self, name):
+        return self.wins[name] / self.battles[name] if self.battles[name] else 0.0
+
+    def average_turns(self, name):
+        return self.turns[name] / self.battles[name] if self.battles[name] else 0.0
+
+
+def battle_seed(base_seed, a, b, index):
+    return ((base_seed * 1009 + a) * 1009 + b) * 10_000_019 + index
+
+
+def make_policy(name, side):
+    if name == "greedy":
+        return choose_best_move
+    from cpu_ai import CpuPlayer
+    # Fixed depth with no time budget, otherwise results depend on machine load
+    return CpuPlayer(name, time_budget=math.inf, side=side)
+
+
+def play_battle(player, opponent, rng, player_policy, opponent_policy):
+    # Search policies are reused across a chunk; starting each battle with an
+    # empty table keeps a battle reproducible from its seed alone
+    for policy in (player_policy, opponent_policy):
+        reset = getattr(policy, "reset", None)
+        if reset is not None:
+            reset()
+    battle = Battle(player, opponent, rng)
+    usage = Counter()
+    while not battle.over:
+        for side, attacker, defender, policy in ((PLAYER, player, opponent, player_policy),
+                                                 (OPPONENT, opponent, player, opponent_policy)):
+            events = battle.take_turn(side, policy(attacker, defender))
+            if events[0][0] == "move":
+                usage[attacker.name, events[0][2]] += 1
+            if battle.over:
+                break
+    return battle, usage
+
+
+_roster = None
+
+
+def run_chunk(task):
+    global _roster
+    a, b, base_seed, start, count, policy = task
+    if _roster is None:
+        _roster = make_roster()
+    player, opponent = _roster[a], _roster[b]
+    player_policy, opponent_policy = make_policy(policy, PLAYER), make_policy(policy, OPPONENT)
+    board = Scoreboard()
+    for index in range(start, start + count):
+        rng = random.Random(battle_seed(base_seed, a, b, index))
+        battle, usage = play_battle(player, opponent, rng, player_policy, opponent_policy)
+        winner = battle.winner.name if battle.winner else None
+        board.record(player.name, opponent.name, winner, battle.turn, usage)
+    return board
+
+
+def make_tasks(count, battles, base_seed, chunk_size, policy):
+    tasks = []
+    for a in range(count):
+        for b in range(count):
+            if a == b:
+                continue
+            for start in range(0, battles, chunk_size):
+                tasks.append((a, b, base_seed, start, min(chunk_size, battles - start), policy))
+    return tasks
+
+
+def run_tournament(battles, base_seed=0, workers=None, chunk_size=500, policy="greedy", progress=None):
+    names = [m.name for m in make_roster()]
+    tasks = make_tasks(len(names), battles, base_seed, chunk_size, policy)
+    board = Scoreboard()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_chunk, task) for task in tasks]
+        for done, future in enumerate(as_completed(futures), 1):
+            board.merge(future.result())
+            if progress:
+                progress(done, len(tasks))
+    return names, board
+
+
+def show_battle(a_name, b_name, index, base_seed, policy):
+    roster = make_roster()
+    names = [m.name for m in roster]
+    a, b = names.index(a_name), names.index(b_name)
+    rng = random.Random(battle_seed(base_seed, a, b, index))
+    battle, _ = play_battle(roster[a], roster[b], rng, make_policy(policy, PLAYER), make_policy(policy, OPPONENT))
+    for line in battle.log:
+        print(line)
+    print(f"Winner: {battle.winner.name if battle.winner else 'draw'} after {battle.turn} turns")
+
+
+def print_report(names, board):
+    print(f"{'Monsoon':<12}{'battles':>9}{'wins':>8}{'losses':>8}{'draws':>7}{'win %':>8}{'avg turns':>11}  top moves")
+    for name in sorted(names, key=board.win_rate, reverse=True):
+        moves = sorted(((count, move) for (who, move), count in board.move_usage.items() if who == name), reverse=True)
+        top = ", ".join(f"{move} {count}" for count, move in moves[:3])
+        print(f"{name:<12}{board.battles[name]:>9}{board.wins[name]:>8}{board.losses[name]:>8}{board.draws[name]:>7}"
+              f"{board.win_rate(name) * 100:>7.1f}%{board.average_turns(name):>11.2f}  {top}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-robin Monsoon tournament on a process pool.")
+    parser.add_argument("-n", "--battles", type=int, default=1000, help="battles per ordered pairing")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk", type=int, default=500, help="battles per task")
+    parser.add_argument("--policy", choices=POLICIES, default="greedy", help="move policy for both sides")
+    parser.add_argument("--show", nargs=3, metavar=("PLAYER", "OPPONENT", "INDEX"),
+                        help="replay one battle of the tournament and print its log")
+    args = parser.parse_args()
+
+    if args.show:
+        show_battle(args.show[0], args.show[1], int(args.show[2]), args.seed, args.policy)
+        return
+
+    start = time.perf_counter()
+    names, board = run_tournament(args.battles, args.seed, args.workers, args.chunk, args.policy)
+    elapsed = time.perf_counter() - start
+    print_report(names, board)
+    total = sum(board.battles.values()) // 2
+    print(f"{total:,} battles on {args.workers} workers in {elapsed:.2f}s ({total / elapsed:,.0f} battles/s)")
+
+
+if __name__ == "__main__":
+    main()
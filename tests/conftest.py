@@ -0,0 +1,18 @@
+import copy
+import os
+import sys
+
+import pytest
+
+# The game modules import each other by name from src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+@pytest.fixture
+def definitions():
+    # A copy of the data file's definitions for a test to edit and apply; the
+    # file's own are loaded again afterwards
+    from battle_engine import DATA_PATH, read_definitions, load_definitions
+    data, _, _ = read_definitions(DATA_PATH)
+    yield copy.deepcopy(data)
+    load_definitions()
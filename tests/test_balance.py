@@ -0,0 +1,79 @@
+import json
+
+from balance import Balancer, Objective, ParameterSpace
+
+BATTLES = 10
+
+
+class FakePool:
+    # Scores every candidate without simulating: the player always wins
+    # once for each point the vector sums to, mod BATTLES
+    def __init__(self, species):
+        self.species = species
+
+    def map(self, function, vectors):
+        results = []
+        for vector in vectors:
+            wins = [[sum(vector) % BATTLES] * self.species for _ in range(self.species)]
+            draws = [[0] * self.species for _ in range(self.species)]
+            results.append((wins, draws))
+        return results
+
+
+def make_balancer(definitions):
+    space = ParameterSpace(definitions)
+    pool = FakePool(len(definitions["species"]))
+    return Balancer(space, Objective(space, BATTLES), seed=0, pool=pool)
+
+
+def test_each_save_appends_only_the_new_results(definitions, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    balancer = make_balancer(definitions)
+    balancer.step()
+    balancer.save(path)
+    with open(path + ".cache") as f:
+        first = f.read()
+    balancer.step()
+    balancer.save(path)
+    with open(path + ".cache") as f:
+        log = f.read()
+
+    assert log.startswith(first)
+    assert len(log.splitlines()) == 1 + len(balancer.cache)
+    with open(path) as f:
+        assert "cache" not in json.load(f)
+
+
+def test_resume_picks_up_the_search_and_its_cache(definitions, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    balancer = make_balancer(definitions)
+    for _ in range(3):
+        balancer.step()
+        balancer.save(path)
+
+    resumed = make_balancer(definitions)
+    resumed.load(path)
+    assert resumed.cache == balancer.cache
+    assert (resumed.vector, resumed.steps, resumed.round) == (balancer.vector, balancer.steps, balancer.round)
+    # Everything the next round needs that was seen before comes from the cache
+    resumed.results(list(balancer.cache))
+    assert resumed.evaluations == balancer.evaluations
+
+
+def test_a_cut_short_log_is_rewritten_on_the_next_save(definitions, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    balancer = make_balancer(definitions)
+    balancer.step()
+    balancer.save(path)
+    with open(path + ".cache", "a") as f:
+        f.write('[[1, 2')
+
+    resumed = make_balancer(definitions)
+    resumed.load(path)
+    assert resumed.cache == balancer.cache
+    resumed.step()
+    resumed.save(path)
+    with open(path + ".cache") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 1 + len(resumed.cache)
+    assert all(json.loads(line) for line in lines)
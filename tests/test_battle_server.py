@@ -0,0 +1,67 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import battle_server
+from battle_engine import FLAGS, OVER, apply_definitions, choose_best_move, make_fighter, species_definitions
+from battle_server import BattleClient, BattleServer, choose_cpu_move
+
+
+def test_searches_use_the_sessions_definitions(definitions, monkeypatch):
+    # A worker that loaded an edited definitions file still searches with the
+    # fighters the session has
+    monkeypatch.setattr(battle_server, "_matchups", {})
+    monkeypatch.setattr(battle_server, "_cpu_players", {})
+    names = ("Voltail", "Burnrat")
+    session = json.dumps(species_definitions(names), sort_keys=True)
+    player, opponent = make_fighter(names[0]), make_fighter(names[1])
+    state = battle_server.Battle(player, opponent).snapshot().pack()
+
+    definitions["species"].reverse()
+    for species in definitions["species"]:
+        species["stats"]["attack"] += 7
+    apply_definitions(definitions, "edited")
+    assert make_fighter(names[0]).attack_stat == player.attack_stat + 7
+
+    move = choose_cpu_move("easy", session, names, state)
+    fighters = battle_server._matchups[session, names]
+    assert [f.attack_stat for f in fighters] == [player.attack_stat, opponent.attack_stat]
+    assert 0 <= move < len(fighters[1].moves)
+
+
+def failing_search(*args):
+    raise ValueError("state is for a different species")
+
+
+async def play_with_a_failing_search():
+    server = BattleServer(workers=1)
+    server.pool = ThreadPoolExecutor(1)
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    client = await BattleClient.connect("127.0.0.1", port)
+    try:
+        session_id, side, player, opponent, state = await client.new_session(0, 1, "easy")
+        session = server.sessions[session_id]
+        battle = session.battle
+        searches = 0
+        while not state[FLAGS] & OVER:
+            expected = choose_best_move(battle.opponent, battle.player)
+            # Voltail opens with Recover, so the first round always gets to the CPU
+            player_move, opponent_move, state = await client.move(session_id, 0 if searches else 2)
+            assert not session.busy
+            if opponent_move != battle_server.NO_MOVE:
+                assert opponent_move == expected
+                searches += 1
+        return server.stats, searches, session_id in server.sessions
+    finally:
+        await client.close()
+        listener.close()
+        server.shutdown()
+
+
+def test_a_failed_search_falls_back_to_the_greedy_move(monkeypatch):
+    monkeypatch.setattr(battle_server, "choose_cpu_move", failing_search)
+    # Before the fallback covered every error the first move never got a TURN
+    stats, searches, still_open = asyncio.run(asyncio.wait_for(play_with_a_failing_search(), 10))
+    assert searches and stats["search errors"] == searches
+    assert stats["finished"] == 1 and not still_open
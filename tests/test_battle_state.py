@@ -0,0 +1,45 @@
+import copy
+import random
+
+from battle_engine import OPPONENT, PLAYER, STATE_SIZE, Battle, BattleState, make_fighter
+
+
+def battle_in_progress():
+    battle = Battle(make_fighter("Baitinphish"), make_fighter("Clawdon"), random.Random(3))
+    for _ in range(3):
+        battle.play_round(0)
+    assert not battle.over
+    return battle
+
+
+def test_copies_stay_battle_states():
+    state = battle_in_progress().snapshot()
+    for duplicate in (state.copy(), copy.copy(state), copy.deepcopy(state)):
+        assert type(duplicate) is BattleState
+        assert duplicate == state and hash(duplicate) == hash(state)
+        duplicate[0] += 1
+        assert duplicate != state
+
+
+def test_pack_round_trip():
+    state = battle_in_progress().snapshot()
+    data = state.pack()
+    assert len(data) == 2 * STATE_SIZE
+    assert BattleState.unpack(data) == state
+
+
+def test_restore_puts_the_battle_back():
+    battle = battle_in_progress()
+    state = battle.snapshot()
+    hp = (battle.player.hp, battle.opponent.hp)
+    statuses = (list(battle.player.statuses), list(battle.opponent.statuses))
+    turn = battle.turn
+    while not battle.over:
+        battle.play_round(0)
+
+    battle.restore(state)
+    assert (battle.player.hp, battle.opponent.hp) == hp
+    assert (battle.player.statuses, battle.opponent.statuses) == statuses
+    assert battle.turn == turn and not battle.over and battle.winner is None
+    assert battle.snapshot() == state
+    assert state.hp(PLAYER) == hp[0] and state.hp(OPPONENT) == hp[1]
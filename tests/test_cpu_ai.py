@@ -0,0 +1,81 @@
+import math
+
+import pytest
+
+from battle_engine import CONFUSION_CHANCE, CONFUSION_DAMAGE, PLAYER, OPPONENT, make_fighter
+from cpu_ai import WIN, CpuPlayer, battle_state
+
+
+def healing_only(fighter):
+    # A confused fighter that can knock itself out and has nothing but its
+    # healing move left. Returns (move slot, hp after it self-hits, hp after
+    # it heals).
+    fighter.hp = CONFUSION_DAMAGE
+    fighter.statuses = ["Confused"]
+    for move in fighter.moves:
+        if move.power >= 0:
+            move.pp = 0
+    slot, move = next((i, move) for i, move in enumerate(fighter.moves) if move.power < 0)
+    return slot, 0, min(fighter.max_hp, fighter.hp - move.power)
+
+
+def states_after(healer, slot, hps, seats):
+    # battle_state for each hp the healer can end its action on
+    states = []
+    hp = healer.hp
+    for after in hps:
+        healer.hp = after
+        healer.moves[slot].pp -= after > 0
+        states.append(battle_state(*seats))
+        healer.moves[slot].pp += after > 0
+    healer.hp = hp
+    return states
+
+
+def test_player_seat_wins_when_the_opponent_knocks_itself_out():
+    # After the opponent's action the player wins if still standing, so the
+    # self-hit ends the battle right there
+    cpu_fighter, other = make_fighter("Cataboo"), make_fighter("Drillizard")
+    slot, *hps = healing_only(other)
+    cpu = CpuPlayer("hard", math.inf, side=PLAYER)
+    # Sets up the matchup, then forgets the searched values
+    cpu.choose_move(cpu_fighter, other)
+    cpu.reset()
+    knocked_out, healed = states_after(other, slot, hps, (cpu_fighter, other))
+    value = cpu.expected(battle_state(cpu_fighter, other), OPPONENT, slot, 1)
+    assert knocked_out[1] == 0
+    assert value == pytest.approx(CONFUSION_CHANCE * (WIN + 0.001) + (1 - CONFUSION_CHANCE) * cpu.evaluate(healed))
+
+
+def test_opponent_seat_still_has_to_act_after_a_player_self_knockout():
+    # A player who faints on their own action only loses once the opponent
+    # has acted, so the search carries on from the self-hit
+    cpu_fighter, other = make_fighter("Cataboo"), make_fighter("Drillizard")
+    slot, *hps = healing_only(other)
+    cpu = CpuPlayer("hard", math.inf, side=OPPONENT)
+    # Sets up the matchup, then forgets the searched values
+    cpu.choose_move(cpu_fighter, other)
+    cpu.reset()
+    knocked_out, healed = states_after(other, slot, hps, (other, cpu_fighter))
+    value = cpu.expected(battle_state(other, cpu_fighter), PLAYER, slot, 1)
+    assert knocked_out[0] == 0
+    assert value == pytest.approx(CONFUSION_CHANCE * cpu.evaluate(knocked_out)
+                                  + (1 - CONFUSION_CHANCE) * cpu.evaluate(healed))
+
+
+def test_either_seat_picks_a_usable_move():
+    for side in (PLAYER, OPPONENT):
+        cpu_fighter, other = make_fighter("Voltail"), make_fighter("Burnrat")
+        cpu_fighter.moves[0].pp = 0
+        choice = CpuPlayer("normal", math.inf, side=side).choose_move(cpu_fighter, other)
+        assert cpu_fighter.moves[choice].pp > 0
+
+
+def test_reset_makes_choices_reproducible():
+    cpu_fighter, other = make_fighter("Pseye"), make_fighter("Thyladon")
+    cpu = CpuPlayer("hard", math.inf)
+    first = cpu.choose_move(cpu_fighter, other)
+    nodes = cpu.nodes
+    cpu.reset()
+    assert cpu.choose_move(cpu_fighter, other) == first
+    assert cpu.nodes == nodes
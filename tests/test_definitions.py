@@ -0,0 +1,36 @@
+from battle_engine import DamageTables, apply_definitions, calculate_damage, get_tables, make_fighter, type_multiplier
+
+
+def species_entry(data, name):
+    return next(s for s in data["species"] if s["name"] == name)
+
+
+def test_fighters_keep_their_stats_after_an_edit(definitions):
+    old_attacker, old_defender = make_fighter("Cataboo"), make_fighter("Voltail")
+    move = old_attacker.moves[0]
+    before = calculate_damage(old_attacker, move, old_defender)
+    crit_before = calculate_damage(old_attacker, move, old_defender, 1.5)
+
+    species_entry(definitions, "Cataboo")["stats"]["attack"] = 1
+    definitions["moves"][move.name]["type"] = "Earth"
+    apply_definitions(definitions, "test")
+
+    assert calculate_damage(old_attacker, move, old_defender) == before
+    assert calculate_damage(old_attacker, move, old_defender, 1.5) == crit_before
+    assert type_multiplier(move, old_defender) == 1.0
+    attacker, defender = make_fighter("Cataboo"), make_fighter("Voltail")
+    assert calculate_damage(attacker, attacker.moves[0], defender) == 1
+    assert type_multiplier(attacker.moves[0], defender) == 2.0
+
+
+def test_tables_after_a_removal_match_a_full_build(definitions):
+    get_tables()
+    definitions["species"] = [s for s in definitions["species"] if s["name"] != "Voltail"]
+    species_entry(definitions, "Cataboo")["stats"]["attack"] += 5
+    apply_definitions(definitions, "test")
+
+    tables = get_tables()
+    full = DamageTables(tables.version)
+    assert tables.move_multiplier == full.move_multiplier
+    assert tables.damage == full.damage
+    assert tables.crit_damage == full.crit_damage
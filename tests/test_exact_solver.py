@@ -0,0 +1,30 @@
+import math
+import random
+
+import pytest
+
+from battle_engine import make_fighter, simulate
+from exact_solver import MatchupSolver
+
+BATTLES = 5000
+
+
+@pytest.mark.parametrize("player, opponent", [
+    ("Pseye", "Baitinphish"),
+    ("Voltail", "Thyladon"),
+    ("Cataboo", "Drillizard"),
+    ("Thyladon", "Pseye"),
+])
+def test_expected_length_counts_rounds_like_battle(player, opponent):
+    player, opponent = make_fighter(player), make_fighter(opponent)
+    win, _, length = MatchupSolver(player, opponent).solve()
+    rng = random.Random(0)
+    turns, wins = [], 0
+    for _ in range(BATTLES):
+        battle = simulate(player, opponent, rng)
+        turns.append(battle.turn)
+        wins += battle.winner is battle.player
+    mean = sum(turns) / BATTLES
+    error = math.sqrt(sum((t - mean) ** 2 for t in turns) / BATTLES / BATTLES)
+    assert abs(mean - length) < 4 * error + 0.02
+    assert abs(wins / BATTLES - win) < 4 * math.sqrt(win * (1 - win) / BATTLES) + 0.005
@@ -0,0 +1,35 @@
+import numpy as np
+
+from battle_engine import apply_definitions, make_fighter, make_roster
+from exact_solver import MatchupSolver
+from matchup_sim import build_pair_tables, pair_tables_from_fighters, simulate_matrix
+
+BATTLES = 4000
+
+
+def test_four_move_species(definitions):
+    # The chosen move is in the fourth slot
+    species = next(s for s in definitions["species"] if s["name"] == "Voltail")
+    species["moves"] = ["Tackle", "Recover", "Gust", "Shock"]
+    apply_definitions(definitions, "test")
+
+    result = simulate_matrix(BATTLES, seed=0)
+    names = result["names"]
+    a, b = names.index("Voltail"), names.index("Baitinphish")
+    win, _, length = MatchupSolver(make_fighter("Voltail"), make_fighter("Baitinphish")).solve()
+    assert abs(result["wins"][a, b] / BATTLES - win) < 0.03
+    assert abs(result["avg_turns"][a, b] - length) < 0.2
+
+
+def test_pair_tables_from_the_damage_tables(definitions):
+    # Mixed move counts, so padded slots are in play
+    species = next(s for s in definitions["species"] if s["name"] == "Voltail")
+    species["moves"] = ["Tackle", "Recover", "Gust", "Shock"]
+    apply_definitions(definitions, "test")
+
+    roster = make_roster()
+    expected = pair_tables_from_fighters(roster)
+    tables = build_pair_tables(roster)
+    assert tables.keys() == expected.keys()
+    for name, values in expected.items():
+        assert np.array_equal(tables[name], values), name
@@ -0,0 +1,49 @@
+import pygame
+import pytest
+
+from particles import PARTICLE_SIZE, ParticleSystem
+
+AREA = (0, 0, 40, 30)
+
+
+def inside(system):
+    pos = system.pos[:system.count]
+    return ((pos[:, 0] >= 0) & (pos[:, 0] < AREA[2] - PARTICLE_SIZE)
+            & (pos[:, 1] >= 0) & (pos[:, 1] < AREA[3] - PARTICLE_SIZE)).all()
+
+
+def test_a_burst_is_culled_as_it_is_emitted():
+    # Jitter scatters a burst at the edge well outside the area
+    system = ParticleSystem(AREA, capacity=500, seed=1)
+    fitted = system.emit((1, 1), 500, (10, 20), 90, 360, (0.5, 1.0), jitter=20.0)
+    assert fitted == 500
+    assert 0 < system.count < 500
+    assert inside(system)
+
+
+def test_a_frame_with_dt_zero_draws_inside_the_surface():
+    surface = pygame.Surface(AREA[2:], 0, 32)
+    system = ParticleSystem(AREA, seed=2)
+    system.emit((38, 28), 200, (10, 20), 90, 360, (0.5, 1.0), jitter=30.0)
+    system.update(0.0)
+    system.draw(surface)
+    assert inside(system)
+
+
+def test_update_moves_and_retires_particles():
+    system = ParticleSystem(AREA, seed=3)
+    system.emit((20, 15), 50, (10, 10), 0, 0, (0.1, 0.1))
+    frame = system.frame
+    system.update(0.05)
+    assert system.count == 50
+    assert (system.pos[:50, 0] > 20).all()
+    assert system.frame == frame + 1
+    system.update(0.1)
+    assert system.count == 0
+
+
+def test_draw_refuses_an_area_bigger_than_the_surface():
+    system = ParticleSystem((0, 0, 100, 100), seed=4)
+    system.emit((50, 50), 10, (1, 2), 90, 360, (1.0, 1.0))
+    with pytest.raises(ValueError):
+        system.draw(pygame.Surface((40, 30), 0, 32))
@@ -0,0 +1,45 @@
+import random
+
+from battle_engine import Battle, make_roster
+from replay import DRAW, Replay, ReplayCursor, check_replay, play_replay, read_replays, write_replays
+
+
+def recorded(seed, player, opponent):
+    roster = make_roster()
+    battle = Battle(roster[player], roster[opponent], random.Random(seed))
+    rng = random.Random(seed + 1)
+    while not battle.over:
+        battle.play_round(rng.randrange(len(battle.player.moves)))
+    return battle, Replay.from_battle(battle, seed, player, opponent)
+
+
+def test_replays_round_trip_through_a_file(tmp_path):
+    replays = [recorded(seed, seed % 3, 3 + seed % 4)[1] for seed in range(6)]
+    path = str(tmp_path / "session.mrr")
+    write_replays(path, replays[:2])
+    write_replays(path, replays[2:])
+    for original, loaded in zip(replays, read_replays(path)):
+        assert vars(loaded) == vars(original)
+
+
+def test_a_replay_plays_out_as_recorded():
+    battle, replay = recorded(11, 1, 4)
+    again = play_replay(replay)
+    assert again.log == battle.log
+    assert again.snapshot() == battle.snapshot()
+    assert check_replay(replay) is None
+
+    replay.result = DRAW if replay.result != DRAW else 0
+    assert check_replay(replay) is not None
+
+
+def test_seeking_matches_playing_forward():
+    _, replay = recorded(0, 1, 7)
+    cursor = ReplayCursor(replay, interval=3)
+    assert cursor.length == 12
+    states = []
+    for position in range(cursor.length + 1):
+        states.append(play_replay(Replay(replay.seed, replay.player, replay.opponent, replay.choices[:position],
+                                         replay.max_turns)).snapshot())
+    for position in (12, 0, 4, 2, 11, 5, 9):
+        assert cursor.seek(position).snapshot() == states[position]
@@ -0,0 +1,54 @@
+import os
+
+import pygame
+import pytest
+
+from scene_manager import Scene, SceneManager
+
+
+@pytest.fixture
+def screen():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    yield pygame.display.set_mode((64, 64))
+    pygame.display.quit()
+
+
+class Recorder(Scene):
+    def __init__(self, next_scene=None):
+        super().__init__()
+        self.clicks = []
+        self.next_scene = next_scene
+        self.frames = 0
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            self.clicks.append(event.pos)
+            if self.next_scene is not None:
+                self.manager.replace(self.next_scene)
+
+    def update(self, dt):
+        # Gives up rather than hang when an event went missing
+        self.frames += 1
+        if self.frames > 10:
+            self.manager.quit()
+
+
+def click(pos):
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1))
+
+
+def test_events_after_a_scene_switch_reach_the_new_scene(screen):
+    second = Recorder()
+    first = Recorder(next_scene=second)
+    manager = SceneManager(screen, idle_timeout=0.01)
+    manager.push(first)
+    pygame.event.clear()
+    click((1, 1))
+    click((2, 2))
+    pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    manager.run()
+    assert first.clicks == [(1, 1)]
+    assert second.clicks == [(2, 2)]
+    assert second.frames == 0
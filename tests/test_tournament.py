@@ -0,0 +1,31 @@
+import random
+
+from battle_engine import PLAYER, OPPONENT, make_roster
+from tournament import Scoreboard, battle_seed, make_policy, play_battle, run_chunk
+
+
+def board_counts(board):
+    return [dict(getattr(board, name)) for name in ("wins", "losses", "draws", "battles", "turns", "move_usage")]
+
+
+def test_chunks_add_up_to_the_whole_pairing():
+    whole = run_chunk((0, 1, 7, 0, 12, "greedy"))
+    parts = Scoreboard()
+    for start, count in ((0, 5), (5, 7)):
+        parts.merge(run_chunk((0, 1, 7, start, count, "greedy")))
+    assert board_counts(parts) == board_counts(whole)
+    assert sum(whole.battles.values()) == 2 * 12
+
+
+def test_reused_search_policies_play_like_fresh_ones():
+    # run_chunk keeps one policy per side for all its battles
+    roster = make_roster()
+    player, opponent = roster[2], roster[5]
+    reused = make_policy("normal", PLAYER), make_policy("normal", OPPONENT)
+    for index in range(4):
+        seed = battle_seed(0, 2, 5, index)
+        battle, usage = play_battle(player, opponent, random.Random(seed), *reused)
+        again, again_usage = play_battle(player, opponent, random.Random(seed),
+                                         make_policy("normal", PLAYER), make_policy("normal", OPPONENT))
+        assert battle.choices == again.choices
+        assert usage == again_usage